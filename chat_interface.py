@@ -5,7 +5,7 @@ IMPROVED: Logging, caching, rate limiting, error handling, timeouts
 """
 
 from fastapi import FastAPI, HTTPException, Request, status
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi.responses import HTMLResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
@@ -14,43 +14,30 @@ import os
 import json
 import hashlib
 import asyncio
-from functools import lru_cache
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
-from cachetools import TTLCache
+import time
+from typing import Optional, Dict, Any, List, Tuple
+from datetime import datetime
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from loguru import logger
 import traceback
+import pandas as pd
 from dotenv import load_dotenv
 
 # Load environment variables from .env file FIRST, before any other imports
 load_dotenv()
 
 # Now import SageAgent after .env is loaded
-from sage_agent_simple import SageAgent
+from sage_agent_simple import AsyncSageAgent, DeadlineExceeded
+from sage_singleflight import SingleFlight, StreamFlight
+from sage_warmup import CacheWarmer, QuestionTraffic, answer_token_cost, DEFAULT_WARMUP_CONCURRENCY, DEFAULT_WARMUP_TOKEN_BUDGET
+from sage_conversations import create_conversation_store
+from sage_cache import AnswerCache, StaleRevalidator, create_answer_cache, create_semantic_index, DEFAULT_MAX_REFRESHES
+from sage_retrieval import FACET_DIMENSIONS, ENTITY_FIELDS, TIME_FILTERS, RANKING_FEATURES
 
-# Storage for conversations
-CONVERSATIONS_FILE = "conversations.json"
-
-def load_conversations():
-    """Load all conversations from file"""
-    if os.path.exists(CONVERSATIONS_FILE):
-        try:
-            with open(CONVERSATIONS_FILE, 'r') as f:
-                return json.load(f)
-        except:
-            return {}
-    return {}
-
-def save_conversations(conversations):
-    """Save conversations to file"""
-    try:
-        with open(CONVERSATIONS_FILE, 'w') as f:
-            json.dump(conversations, f, indent=2)
-    except Exception as e:
-        logger.error(f"Error saving conversations: {str(e)}")
+# Storage for conversations (SQLite; an existing conversations.json is imported on first start)
+conversation_store = create_conversation_store()
 
 # Configure logging
 logger.add(
@@ -96,8 +83,41 @@ if os.getenv("TRUSTED_HOSTS"):
         allowed_hosts=os.getenv("TRUSTED_HOSTS").split(",")
     )
 
-# Cache for answers (TTL: 1 hour)
-answer_cache: TTLCache = TTLCache(maxsize=1000, ttl=3600)
+# Cache for answers (TTL: 1 hour by default; SQLite-backed so it survives restarts and is shared by workers)
+answer_cache: AnswerCache = create_answer_cache()
+# Second tier: paraphrases of a cached question are served its answer (SEMANTIC_CACHE_THRESHOLD)
+semantic_cache = create_semantic_index(answer_cache)
+# Expired answers inside ANSWER_CACHE_STALE_GRACE are served while a capped background task refreshes them
+revalidator = StaleRevalidator(max_concurrent=int(os.getenv("CACHE_MAX_REFRESHES", str(DEFAULT_MAX_REFRESHES))))
+
+# Identical questions already in flight share one agent call (keyed like the cache)
+answer_flights = SingleFlight()
+stream_flights = StreamFlight()
+
+# One deadline per request, shared by retrieval, context building and the model call
+REQUEST_TIMEOUT_SECONDS = float(os.getenv("REQUEST_TIMEOUT_SECONDS", "60"))
+# How often a waiting request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = 1.0
+
+class ClientDisconnected(Exception):
+    """The HTTP client went away before its answer was ready"""
+
+async def await_while_connected(request: Request, coro, deadline: float):
+    """Await coro, cancelling it if the deadline passes or the client disconnects"""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise DeadlineExceeded("Request deadline exceeded (timed out)")
+            done, _ = await asyncio.wait({task}, timeout=min(DISCONNECT_POLL_SECONDS, remaining))
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
 
 # Initialize agent
 data_path = os.getenv("DATA_PATH", "results/rpotential_filtered_focused_data.csv")
@@ -134,13 +154,50 @@ if not os.path.exists(data_path):
         raise FileNotFoundError(f"Data file not found. Please ensure results/rpotential_filtered_focused_data.csv exists or set DATA_PATH environment variable.")
 
 try:
-    agent = SageAgent(data_path=data_path, api_key=api_key)
+    agent = AsyncSageAgent(data_path=data_path, api_key=api_key)
     logger.info(f"✅ Agent initialized with {len(agent.df)} posts from {data_path}")
 except Exception as e:
     logger.error(f"❌ Failed to initialize agent: {str(e)}")
     logger.error(traceback.format_exc())
     raise
 
+# How often to check whether the CSV behind DATA_PATH changed (0 disables the check)
+DATASET_CHECK_SECONDS = float(os.getenv("DATASET_CHECK_SECONDS", "60"))
+
+def invalidate_stale_answers() -> int:
+    """Drop cached answers of any other dataset/prompt/model version; entries still valid are kept"""
+    removed = answer_cache.invalidate_other_versions(agent.cache_version)
+    if removed and semantic_cache is not None:
+        semantic_cache.discard(*removed)
+    logger.info(f"🧹 Invalidated {len(removed)} cached answers not computed under {agent.cache_version}")
+    return len(removed)
+
+# A restart may come with a new CSV (or prompt/model): drop the previous version's answers now,
+# not only after a reload, so they do not hold maxsize slots until LRU eviction reaches them
+try:
+    invalidate_stale_answers()
+except Exception as e:
+    logger.error(f"❌ Startup cache invalidation failed: {str(e)}")
+    logger.error(traceback.format_exc())
+
+async def watch_dataset():
+    """Reload the agent when its dataset changes on disk, then invalidate the old version's answers"""
+    while True:
+        await asyncio.sleep(DATASET_CHECK_SECONDS)
+        try:
+            # Reloading rebuilds the indexes: keep it off the event loop
+            reloaded = await asyncio.get_running_loop().run_in_executor(agent.executor, agent.reload_if_changed)
+            if reloaded:
+                invalidate_stale_answers()
+        except Exception as e:
+            logger.error(f"❌ Dataset check failed: {str(e)}")
+            logger.error(traceback.format_exc())
+
+@app.on_event("startup")
+async def start_dataset_watch():
+    if DATASET_CHECK_SECONDS > 0:
+        app.state.dataset_watch = asyncio.create_task(watch_dataset())
+
 # CEO Questions - Full list of 50 questions from CEO_QUESTIONS_FULL_LIST.md
 SUGGESTED_QUESTIONS = [
     "How do our human-agent configurations compare to industry leaders?",
@@ -198,6 +255,15 @@ SUGGESTED_QUESTIONS = [
 class QuestionRequest(BaseModel):
     question: str = Field(..., min_length=1, max_length=2000, description="The question to ask")
     estimates_ok: bool = Field(default=False, description="Allow estimates in the answer")
+    # Value types depend on the key (see validate_filters)
+    filters: Optional[Dict[str, Any]] = Field(
+        default=None,
+        description="Restrict retrieval by enrichment facet or entity, e.g. {\"confidence_level\": \"HIGH\", \"subreddit\": [\"salesforce\"], \"company\": \"OpenAI\", \"since_days\": 90}"
+    )
+    ranking: Optional[Dict[str, float]] = Field(
+        default=None,
+        description="Override composite ranking weights, e.g. {\"freshness\": 0.4, \"engagement\": 0.2, \"half_life_days\": 60}"
+    )
     
     @validator('question')
     def validate_question(cls, v):
@@ -206,12 +272,208 @@ class QuestionRequest(BaseModel):
         if len(v.strip()) < 3:
             raise ValueError("Question must be at least 3 characters long")
         return v.strip()
+    
+    @validator('filters')
+    def validate_filters(cls, v):
+        if not v:
+            return None
+        allowed = list(FACET_DIMENSIONS) + list(ENTITY_FIELDS) + list(TIME_FILTERS)
+        unknown = set(v) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown filter(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}")
+        dates = {}
+        for key, value in v.items():
+            if key == 'since_days':
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                    raise ValueError("since_days must be a positive number")
+            elif key in ('date_from', 'date_to'):
+                if not isinstance(value, str) or not value.strip():
+                    raise ValueError(f"{key} must be a date string, e.g. 2025-06-01")
+                try:
+                    parsed = pd.Timestamp(value)
+                except (ValueError, TypeError):
+                    raise ValueError(f"{key} is not a valid date: {value!r}")
+                if pd.isna(parsed):
+                    raise ValueError(f"{key} is not a valid date: {value!r}")
+                dates[key] = parsed.tz_localize('UTC') if parsed.tzinfo is None else parsed.tz_convert('UTC')
+            elif isinstance(value, str):
+                if not value.strip():
+                    raise ValueError(f"Filter {key} cannot be empty")
+            elif isinstance(value, list):
+                if not value or not all(isinstance(item, str) and item.strip() for item in value):
+                    raise ValueError(f"Filter {key} must be a non-empty list of non-empty strings")
+            else:
+                raise ValueError(f"Filter {key} must be a string or a list of strings")
+        if len(dates) == 2 and dates['date_from'] > dates['date_to']:
+            raise ValueError("date_from must not be after date_to")
+        return v
+    
+    @validator('ranking')
+    def validate_ranking(cls, v):
+        if not v:
+            return None
+        allowed = list(RANKING_FEATURES) + ['half_life_days']
+        unknown = set(v) - set(allowed)
+        if unknown:
+            raise ValueError(f"Unknown ranking key(s): {', '.join(sorted(unknown))}. Allowed: {', '.join(allowed)}")
+        if any(value < 0 for value in v.values()):
+            raise ValueError("Ranking weights must be non-negative")
+        return v
 
-def get_cache_key(question: str, estimates_ok: bool) -> str:
-    """Generate cache key for a question"""
-    key_string = f"{question.lower().strip()}:{estimates_ok}"
+def get_cache_key(question: str, estimates_ok: bool, filters: Optional[Dict] = None,
+                  ranking: Optional[Dict] = None, version: str = "") -> str:
+    """Generate cache key for a question (version: agent.cache_version the answer depends on)"""
+    key_string = f"{version}:{question.lower().strip()}:{estimates_ok}"
+    if filters:
+        key_string += f":{json.dumps(filters, sort_keys=True)}"
+    if ranking:
+        key_string += f":ranking={json.dumps(ranking, sort_keys=True)}"
     return hashlib.md5(key_string.encode()).hexdigest()
 
+def semantic_scope(question_request: QuestionRequest, version: str) -> str:
+    """Everything except the wording that must match for a paraphrase to share an answer"""
+    scope = {
+        "estimates_ok": question_request.estimates_ok,
+        "filters": question_request.filters or {},
+        "ranking": question_request.ranking or {},
+        "version": version,
+    }
+    return hashlib.md5(json.dumps(scope, sort_keys=True).encode()).hexdigest()
+
+async def lookup_cached_answer(question_request: QuestionRequest, cache_key: str,
+                         version: str) -> Tuple[Optional[Dict], Optional[Dict], bool]:
+    """Cached answer for the exact question, else for its nearest cached paraphrase, else a stale one
+
+    Returns (answer, match, stale): match describes a semantic hit and is None
+    for an exact one; a stale answer has expired within the grace window and
+    its refresh has been scheduled.
+    """
+    answer = await answer_cache.get_async(cache_key)
+    if answer is not None:
+        return answer, None, False
+    if semantic_cache is not None:
+        vector = agent.embed_question(question_request.question)
+        match = (semantic_cache.match(vector, semantic_scope(question_request, version), question_request.question)
+                 if vector is not None else None)
+        if match is not None:
+            matched_key, similarity, matched_question = match
+            answer = await answer_cache.get_async(matched_key)
+            if answer is not None:
+                return answer, {"matched_question": matched_question, "similarity": round(similarity, 3)}, False
+            # The answer expired or was evicted since its question was indexed
+            semantic_cache.discard(matched_key)
+    answer = await answer_cache.get_stale_async(cache_key)
+    if answer is None:
+        return None, None, False
+    revalidator.schedule(cache_key, lambda: refresh_answer(question_request, cache_key, version))
+    return answer, None, True
+
+def answer_job(question_request: QuestionRequest, cache_key: str, version: str, deadline: float):
+    """Coroutine factory that answers the question and caches the result (run through answer_flights)"""
+    async def compute():
+        answer = await agent.answer_ceo_question_async(
+            question=question_request.question,
+            estimates_ok=question_request.estimates_ok,
+            filters=question_request.filters,
+            ranking=question_request.ranking,
+            deadline=deadline
+        )
+        # Cache the answer (an error answer is returned to the caller but never cached)
+        if not answer.get("error"):
+            await store_answer(question_request, cache_key, answer, version)
+        return answer
+    return compute
+
+async def refresh_answer(question_request: QuestionRequest, cache_key: str, version: str):
+    """Recompute a stale answer in the background; a failed refresh leaves the stale answer in place
+
+    Runs through answer_flights, so it joins (or is joined by) a user request
+    or warm-up computing the same answer instead of calling the model again.
+    """
+    deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+    answer, _ = await answer_flights.do(cache_key, answer_job(question_request, cache_key, version, deadline))
+    if answer.get("error"):
+        raise RuntimeError(answer["error"])
+    return answer
+
+async def store_answer(question_request: QuestionRequest, cache_key: str, answer: Dict, version: str):
+    """Cache an answer and index its question for paraphrase lookups
+
+    version is the cache version the request started under, so an answer
+    finishing after a dataset reload is not filed under the new version.
+    """
+    await answer_cache.set_async(cache_key, answer, version)
+    if semantic_cache is None:
+        return
+    try:
+        vector = agent.embed_question(question_request.question)
+        if vector is not None:
+            semantic_cache.add(cache_key, semantic_scope(question_request, version), question_request.question, vector)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not index question for the semantic cache: {str(e)}")
+
+# Cache warm-up: the suggested questions plus the most asked recent ones, at startup and on a schedule
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_INTERVAL_SECONDS = float(os.getenv("WARMUP_INTERVAL_SECONDS", "1800"))
+WARMUP_TOP_ASKED = int(os.getenv("WARMUP_TOP_ASKED", "20"))
+WARMUP_TRAFFIC_WINDOW_HOURS = float(os.getenv("WARMUP_TRAFFIC_WINDOW_HOURS", "168"))
+# Warm-up yields while this many live answers are in flight
+WARMUP_YIELD_AT = int(os.getenv("WARMUP_YIELD_AT", "4"))
+# Report not-ready from /api/ready until the first warm-up pass has finished
+WARMUP_READY_WAIT = os.getenv("WARMUP_READY_WAIT", "false").lower() in ("1", "true", "yes")
+
+question_traffic = QuestionTraffic(getattr(answer_cache, "path", None))
+
+def warmup_questions() -> List[Tuple[str, bool]]:
+    """Suggested questions, then the most asked plain questions not already among them"""
+    questions = [(question, False) for question in SUGGESTED_QUESTIONS]
+    seen = {(question.lower().strip(), estimates_ok) for question, estimates_ok in questions}
+    for question, estimates_ok, _ in question_traffic.top(WARMUP_TOP_ASKED, WARMUP_TRAFFIC_WINDOW_HOURS * 3600):
+        if (question.lower().strip(), estimates_ok) not in seen:
+            seen.add((question.lower().strip(), estimates_ok))
+            questions.append((question, estimates_ok))
+    return questions
+
+# Keys of answers a warm-up job is waiting on, so warm-ups don't count as live traffic
+warming_keys = set()
+
+async def warm_question(question: str, estimates_ok: bool) -> Optional[int]:
+    """Answer and cache one warm-up question unless its answer stays fresh until the next pass
+
+    Runs through answer_flights like /api/answer, so a user asking the same
+    question joins the warm-up (and the other way round). Work shared with a
+    user request counts as nothing to do, not against the token budget.
+    """
+    question_request = QuestionRequest(question=question, estimates_ok=estimates_ok)
+    version = agent.cache_version
+    cache_key = get_cache_key(question_request.question, question_request.estimates_ok, version=version)
+    ttl = await answer_cache.time_to_live_async(cache_key)
+    if ttl is not None and ttl > max(WARMUP_INTERVAL_SECONDS, 0):
+        return None
+    deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+    warming_keys.add(cache_key)
+    try:
+        answer, shared = await answer_flights.do(cache_key, answer_job(question_request, cache_key, version, deadline))
+    finally:
+        warming_keys.discard(cache_key)
+    if shared:
+        return None
+    if answer.get("error"):
+        raise RuntimeError(answer["error"])
+    return answer_token_cost(answer)
+
+warmer = CacheWarmer(
+    warm_question,
+    max_concurrent=int(os.getenv("WARMUP_CONCURRENCY", str(DEFAULT_WARMUP_CONCURRENCY))),
+    token_budget=int(os.getenv("WARMUP_TOKEN_BUDGET", str(DEFAULT_WARMUP_TOKEN_BUDGET))),
+    busy=lambda: len(answer_flights) - len(warming_keys) + len(stream_flights) >= WARMUP_YIELD_AT
+)
+
+@app.on_event("startup")
+async def start_cache_warmup():
+    if WARMUP_ENABLED:
+        app.state.cache_warmup = asyncio.create_task(warmer.run_forever(warmup_questions, WARMUP_INTERVAL_SECONDS))
+
 @app.get("/", response_class=HTMLResponse)
 async def chat_interface():
     """Serve the main chat interface"""
@@ -1246,6 +1508,52 @@ async def chat_interface():
             type();
         }}
         
+        async function fetchAnswerStream(question, onText) {{
+            // Server-Sent Events over POST: meta, delta..., then done (or error)
+            const response = await fetch('/api/answer/stream', {{
+                method: 'POST',
+                headers: {{ 'Content-Type': 'application/json' }},
+                body: JSON.stringify({{ question: question }})
+            }});
+            
+            if (!response.ok || !response.body) {{
+                const errorData = await response.json().catch(() => ({{}}));
+                const errorMsg = errorData.detail || 'HTTP ' + response.status + ': ' + response.statusText;
+                throw new Error(errorMsg);
+            }}
+            
+            const reader = response.body.getReader();
+            const decoder = new TextDecoder();
+            let buffer = '';
+            let text = '';
+            while (true) {{
+                const {{ value, done }} = await reader.read();
+                if (done) break;
+                buffer += decoder.decode(value, {{ stream: true }});
+                let boundary;
+                while ((boundary = buffer.indexOf('\\n\\n')) !== -1) {{
+                    const rawEvent = buffer.slice(0, boundary);
+                    buffer = buffer.slice(boundary + 2);
+                    let eventName = 'message';
+                    let eventData = '';
+                    rawEvent.split('\\n').forEach(line => {{
+                        if (line.startsWith('event: ')) eventName = line.slice(7);
+                        else if (line.startsWith('data: ')) eventData += line.slice(6);
+                    }});
+                    const payload = eventData ? JSON.parse(eventData) : {{}};
+                    if (eventName === 'delta') {{
+                        text += payload.text || '';
+                        onText(text);
+                    }} else if (eventName === 'done') {{
+                        return payload;
+                    }} else if (eventName === 'error') {{
+                        return {{ error: payload.executive_summary || payload.error, answer: payload }};
+                    }}
+                }}
+            }}
+            throw new Error('The answer stream ended unexpectedly. Please try again.');
+        }}
+        
         function escapeHtml(text) {{
             const div = document.createElement('div');
             div.textContent = text;
@@ -1330,19 +1638,17 @@ async def chat_interface():
             
             try {{
                 const startTime = Date.now();
-                const response = await fetch('/api/answer', {{
-                    method: 'POST',
-                    headers: {{ 'Content-Type': 'application/json' }},
-                    body: JSON.stringify({{ question: question }})
+                // Show the answer as it streams in; it is formatted once complete
+                const data = await fetchAnswerStream(question, text => {{
+                    const streamingEl = document.getElementById(loadingId);
+                    if (!streamingEl) return;
+                    const streamingText = streamingEl.querySelector('.message-content > div:last-child');
+                    streamingText.className = 'message-text';
+                    streamingText.style.whiteSpace = 'pre-wrap';
+                    streamingText.textContent = text;
+                    const isNearBottom = chatArea.scrollHeight - chatArea.scrollTop - chatArea.clientHeight < 200;
+                    if (isNearBottom) chatArea.scrollTop = chatArea.scrollHeight;
                 }});
-                
-                if (!response.ok) {{
-                    const errorData = await response.json().catch(() => ({{}}));
-                    const errorMsg = errorData.detail || 'HTTP ' + response.status + ': ' + response.statusText;
-                    throw new Error(errorMsg);
-                }}
-                
-                const data = await response.json();
                 const duration = ((Date.now() - startTime) / 1000).toFixed(1);
                 
                 const loadingEl = document.getElementById(loadingId);
@@ -1470,6 +1776,7 @@ async def chat_interface():
                     if (data.cached) {{
                         answer.cached = true;
                     }}
+                    answer.streamed = true;
                     addMessageWithTypewriter('assistant', answer, data.answer.confidence || 'HIGH');
                     
                     // Save assistant message to conversation
@@ -1814,6 +2121,12 @@ async def chat_interface():
             // Initial scroll to show the message, but then let user scroll freely
             chatArea.scrollTop = chatArea.scrollHeight;
             
+            if (answerData.streamed) {{
+                // The reader already watched the text arrive; render the formatted answer at once
+                textDiv.innerHTML = answerData.text;
+                return;
+            }}
+            
             // LUXURY TYPEWRITER EFFECT - letter by letter
             typewriterLuxury(textDiv, answerData.text, () => {{
                 console.log('[DEBUG] Typewriter completed');
@@ -1904,48 +2217,58 @@ async def get_suggestions(request: Request):
 async def answer_question(request: Request, question_request: QuestionRequest):
     """Answer a CEO question with caching and timeout"""
     start_time = datetime.now()
-    cache_key = get_cache_key(question_request.question, question_request.estimates_ok)
+    cache_version = agent.cache_version
+    cache_key = get_cache_key(question_request.question, question_request.estimates_ok,
+                              question_request.filters, question_request.ranking, cache_version)
     
-    # Check cache first
-    if cache_key in answer_cache:
-        logger.info(f"Cache HIT for question: {question_request.question[:50]}...")
-        cached_answer = answer_cache[cache_key]
+    # Check cache first (exact question, then nearest paraphrase)
+    if not question_request.filters and not question_request.ranking:
+        question_traffic.record_soon(question_request.question, question_request.estimates_ok)
+    cached_answer, cache_match, stale = await lookup_cached_answer(question_request, cache_key, cache_version)
+    if cached_answer is not None:
+        if cache_match:
+            logger.info(f"Semantic cache HIT ({cache_match['similarity']:.3f}) for question: {question_request.question[:50]}...")
+        elif stale:
+            logger.info(f"Stale cache HIT (refreshing) for question: {question_request.question[:50]}...")
+        else:
+            logger.info(f"Cache HIT for question: {question_request.question[:50]}...")
         return {
             "question": question_request.question,
             "answer": cached_answer,
             "cached": True,
+            "cache_match": cache_match,
+            "stale": stale,
             "timestamp": datetime.now().isoformat()
         }
     
     logger.info(f"Processing question: {question_request.question[:100]}...")
     
     try:
-        # Set timeout for agent response (60 seconds)
-        answer = await asyncio.wait_for(
-            asyncio.to_thread(
-                agent.answer_ceo_question,
-                question=question_request.question,
-                estimates_ok=question_request.estimates_ok,
-            verbose=False
-            ),
-            timeout=60.0
-        )
+        # One deadline for the whole request; the agent is cancelled on timeout or disconnect
+        deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
         
-        # Cache the answer
-        answer_cache[cache_key] = answer
+        compute = answer_job(question_request, cache_key, cache_version, deadline)
+        
+        # Concurrent identical questions wait on the first one's call
+        answer, coalesced = await await_while_connected(request, answer_flights.do(cache_key, compute), deadline)
         
         duration = (datetime.now() - start_time).total_seconds()
-        logger.info(f"✅ Answer generated in {duration:.2f}s for: {question_request.question[:50]}...")
+        logger.info(f"✅ Answer {'shared' if coalesced else 'generated'} in {duration:.2f}s for: {question_request.question[:50]}...")
         
         return {
             "question": question_request.question,
             "answer": answer,
             "cached": False,
+            "coalesced": coalesced,
             "timestamp": datetime.now().isoformat()
         }
         
-    except asyncio.TimeoutError:
-        logger.error(f"⏱️ Timeout after 60s for question: {question_request.question[:50]}...")
+    except ClientDisconnected:
+        logger.warning(f"🔌 Client disconnected, cancelled question: {question_request.question[:50]}...")
+        # 499: client closed request (nobody is listening for the response)
+        return Response(status_code=499)
+    except (asyncio.TimeoutError, DeadlineExceeded):
+        logger.error(f"⏱️ Timeout after {REQUEST_TIMEOUT_SECONDS:.0f}s for question: {question_request.question[:50]}...")
         raise HTTPException(
             status_code=status.HTTP_504_GATEWAY_TIMEOUT,
             detail="Request timed out. The question is too complex or the service is overloaded. Please try again with a simpler question."
@@ -1964,13 +2287,101 @@ async def answer_question(request: Request, question_request: QuestionRequest):
             detail=f"Internal server error: {str(e)}"
         )
 
+# Keep proxies from buffering the event stream
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+def sse_event(event: str, data: Dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+@app.post("/api/answer/stream")
+@limiter.limit("10/minute")
+async def stream_answer(request: Request, question_request: QuestionRequest):
+    """Answer a CEO question as Server-Sent Events
+    
+    Events: "meta" (data scope and citations, before the model responds),
+    "delta" (answer text chunks), then "done" with the same payload as
+    /api/answer, or "error".
+    """
+    start_time = datetime.now()
+    cache_version = agent.cache_version
+    cache_key = get_cache_key(question_request.question, question_request.estimates_ok,
+                              question_request.filters, question_request.ranking, cache_version)
+    
+    if not question_request.filters and not question_request.ranking:
+        question_traffic.record_soon(question_request.question, question_request.estimates_ok)
+    cached_answer, cache_match, stale = await lookup_cached_answer(question_request, cache_key, cache_version)
+    if cached_answer is not None:
+        if cache_match:
+            logger.info(f"Semantic cache HIT (stream, {cache_match['similarity']:.3f}) for question: {question_request.question[:50]}...")
+        elif stale:
+            logger.info(f"Stale cache HIT (stream, refreshing) for question: {question_request.question[:50]}...")
+        else:
+            logger.info(f"Cache HIT (stream) for question: {question_request.question[:50]}...")
+        
+        def replay():
+            yield sse_event("meta", {k: v for k, v in cached_answer.items()
+                                     if k not in ("executive_summary", "full_answer", "suggested_followups")})
+            yield sse_event("delta", {"text": cached_answer.get("full_answer", "")})
+            yield sse_event("done", {
+                "question": question_request.question,
+                "answer": cached_answer,
+                "cached": True,
+                "cache_match": cache_match,
+                "stale": stale,
+                "timestamp": datetime.now().isoformat()
+            })
+        
+        return StreamingResponse(replay(), media_type="text/event-stream", headers=SSE_HEADERS)
+    
+    logger.info(f"Streaming question: {question_request.question[:100]}...")
+    deadline = time.monotonic() + REQUEST_TIMEOUT_SECONDS
+    
+    async def produce():
+        # Runs once per in-flight key, however many clients are subscribed
+        async for event, data in agent.stream_ceo_answer_async(
+            question=question_request.question,
+            estimates_ok=question_request.estimates_ok,
+            filters=question_request.filters,
+            ranking=question_request.ranking,
+            deadline=deadline
+        ):
+            if event == "done" and not data.get("error"):
+                await store_answer(question_request, cache_key, data, cache_version)
+            yield event, data
+    
+    def producer_error(e: Exception):
+        return "error", {"error": str(e), "confidence": "LOW", "posts_analyzed": 0}
+    
+    async def events():
+        # Starlette cancels this generator if the client disconnects; the shared
+        # model stream is closed once its last subscriber is gone
+        try:
+            async for event, data in stream_flights.subscribe(cache_key, produce, producer_error):
+                if event != "done":
+                    yield sse_event(event, data)
+                    continue
+                duration = (datetime.now() - start_time).total_seconds()
+                logger.info(f"✅ Answer streamed in {duration:.2f}s for: {question_request.question[:50]}...")
+                yield sse_event("done", {
+                    "question": question_request.question,
+                    "answer": data,
+                    "cached": False,
+                    "timestamp": datetime.now().isoformat()
+                })
+        except Exception as e:
+            logger.error(f"❌ Error streaming answer: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield sse_event("error", {"error": str(e), "confidence": "LOW", "posts_analyzed": 0})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @app.get("/api/health")
 async def health_check():
     """Enhanced health check endpoint"""
     try:
         posts_count = len(agent.df)
-        cache_size = len(answer_cache)
-        cache_info = answer_cache.currsize if hasattr(answer_cache, 'currsize') else cache_size
+        cache_info = answer_cache.currsize
         
         return {
             "status": "healthy",
@@ -1991,6 +2402,16 @@ async def health_check():
         }
         )
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness probe: the agent is loaded (and, with WARMUP_READY_WAIT, the first warm-up pass is done)"""
+    if WARMUP_READY_WAIT and WARMUP_ENABLED and not warmer.ready:
+        return JSONResponse(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            content={"status": "warming", "warmup": warmer.stats(), "timestamp": datetime.now().isoformat()}
+        )
+    return {"status": "ready", "warmup": warmer.stats(), "timestamp": datetime.now().isoformat()}
+
 @app.get("/api/stats")
 @limiter.limit("30/minute")
 async def get_stats(request: Request):
@@ -1998,7 +2419,14 @@ async def get_stats(request: Request):
     return {
         "cache_size": len(answer_cache),
         "cache_maxsize": answer_cache.maxsize,
+        "cache": answer_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else None,
+        "cache_version": agent.cache_version,
+        "stale_refreshes": revalidator.stats(),
+        "warmup": warmer.stats(),
         "posts_loaded": len(agent.df),
+        "in_flight_answers": len(answer_flights),
+        "in_flight_streams": len(stream_flights),
         "suggested_questions_count": len(SUGGESTED_QUESTIONS),
         "timestamp": datetime.now().isoformat()
     }
@@ -2007,7 +2435,16 @@ async def get_stats(request: Request):
 @limiter.limit("30/minute")
 async def get_conversations(request: Request):
     """Get all conversations"""
-    return load_conversations()
+    return conversation_store.all()
+
+@app.get("/api/conversations/{conversation_id}")
+@limiter.limit("30/minute")
+async def get_conversation(request: Request, conversation_id: str):
+    """Get one conversation"""
+    conversation = conversation_store.get(conversation_id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Conversation not found")
+    return conversation
 
 @app.post("/api/save-conversation")
 @limiter.limit("30/minute")
@@ -2017,12 +2454,15 @@ async def save_conversation(request: Request):
         data = await request.json()
         conversation_id = data.get('conversationId')
         conversation = data.get('conversation')
+        if not conversation_id or not isinstance(conversation, dict):
+            raise HTTPException(status_code=400, detail="conversationId and conversation are required")
         
-        conversations = load_conversations()
-        conversations[conversation_id] = conversation
-        save_conversations(conversations)
+        # Only this conversation's new messages are written
+        conversation_store.save(str(conversation_id), conversation)
         
         return {"status": "saved"}
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error saving conversation: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
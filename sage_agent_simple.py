@@ -3,17 +3,34 @@
 Sage AI Agent - Strategic Intelligence Analyst
 Internal reasoning via o3-mini, clean polished output to user
 IMPROVED: Logging, error handling, timeout protection
+AsyncSageAgent: AsyncOpenAI for the model call, retrieval and context work on
+a small dedicated thread pool
 """
 
 import pandas as pd
-from openai import OpenAI
-import json
+import numpy as np
+from openai import AsyncOpenAI, OpenAI
+import asyncio
+import contextvars
 import os
+import time
 import traceback
-from typing import Dict, Optional
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from loguru import logger
+from contextlib import contextmanager
 from datetime import datetime
+from sage_data import DatasetSnapshot, load_dataset, comment_offsets, duplicate_priority
+from sage_context import (
+    render_post_fragments, load_or_build_token_counts, estimate_tokens, pack_posts, candidate_values,
+    confidence_weight_array
+)
+from sage_retrieval import (
+    CompositeRanker, DiversitySelector, EntityIndex, FacetIndex, TimeIndex, ENTITY_FIELDS, TIME_FILTERS,
+    DEFAULT_HALF_LIFE_DAYS, load_or_build_bm25_index, load_or_build_router, load_or_build_semantic_index,
+    load_ranking_config, load_router_history
+)
 
 load_dotenv()
 
@@ -28,22 +45,85 @@ logger.add(
     diagnose=True
 )
 
+RETRIEVAL_MODES = ("bm25", "semantic", "relevance")
+
+# Bump whenever _build_messages changes what the model is asked: cached answers are keyed on it
+PROMPT_VERSION = "2"
+
+
+class DeadlineExceeded(TimeoutError):
+    """The caller's request deadline (a time.monotonic() value) passed"""
+
+
+def time_left(deadline: Optional[float], cap: Optional[float]) -> Optional[float]:
+    """Seconds until the deadline, capped (None = no limit); raises DeadlineExceeded once it has passed"""
+    if deadline is None:
+        return cap
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("Request deadline exceeded (timed out)")
+    return remaining if cap is None else min(remaining, cap)
+
+
+class DatasetState:
+    """Everything derived from one load of the dataset: tables, indexes, rendered blocks, summary
+
+    Built completely before it is published and never mutated, so a reload
+    swaps a single reference and a request pinned to the old state keeps
+    reading consistent rows and indexes.
+    """
+
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"DatasetState is immutable (tried to set '{name}')")
+
+
+# State pinned by the request running in this context (see SageAgent.pinned_state)
+_PINNED_STATE: contextvars.ContextVar[Optional[DatasetState]] = contextvars.ContextVar("sage_pinned_state", default=None)
+
+
 class SageAgent:
     """Sage - Strategic Intelligence Analyst for rPotential.ai CPO tool"""
     
-    def __init__(self, data_path: str, api_key: Optional[str] = None):
+    def __init__(self, data_path: str, api_key: Optional[str] = None, retrieval_mode: Optional[str] = None):
         logger.info(f"Initializing SageAgent with data_path: {data_path}")
         
+        self.retrieval_mode = (retrieval_mode or os.getenv("RETRIEVAL_MODE", "bm25")).lower()
+        if self.retrieval_mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown retrieval mode '{self.retrieval_mode}'. Expected one of: {', '.join(RETRIEVAL_MODES)}")
+        # Upper bound on posts rendered in the prompt; the token budget decides how many fit
+        self.context_posts = int(os.getenv("SAGE_CONTEXT_POSTS", "100"))
+        # Token budget for the whole context block (overview + posts + comments)
+        self.context_token_budget = int(os.getenv("SAGE_CONTEXT_TOKEN_BUDGET", "30000"))
+        # Number of nearest posts taken in semantic mode
+        self.semantic_top_k = int(os.getenv("SEMANTIC_TOP_K", "500"))
+        # Narrow retrieval to the question's routed category/actionability slice
+        self.question_routing = os.getenv("QUESTION_ROUTING", "true").lower() in ("1", "true", "yes")
+        self.routing_min_posts = int(os.getenv("ROUTING_MIN_POSTS", "30"))
+        # Upper bound on one model call; a request deadline can only shorten it
+        self.llm_timeout = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+        # Retrieve one representative per near-duplicate/cross-post cluster
+        self.collapse_duplicates = os.getenv("COLLAPSE_DUPLICATES", "true").lower() in ("1", "true", "yes")
+        # Re-select the context candidates for coverage (MMR over text, subreddit, category, sentiment)
+        self.diversity_selection = os.getenv("DIVERSITY_SELECTION", "true").lower() in ("1", "true", "yes")
+        self.diversity_pool = int(os.getenv("DIVERSITY_POOL", "500"))
+        self.mmr_lambda = float(os.getenv("MMR_LAMBDA", "0.7"))
+        # Composite ranking weights (JSON or path): defaults, and overrides per ceo_question_category
+        self.ranking_weights = load_ranking_config(os.getenv("RANKING_WEIGHTS")) or None
+        self.ranking_category_weights = load_ranking_config(os.getenv("RANKING_CATEGORY_WEIGHTS"))
+        self.ranking_half_life_days = float(os.getenv("RANKING_HALF_LIFE_DAYS", str(DEFAULT_HALF_LIFE_DAYS)))
+        # Question vectors for the semantic answer cache (needs the semantic index)
+        self.embed_questions = os.getenv("SEMANTIC_CACHE", "true").lower() in ("1", "true", "yes")
+        self.model = os.getenv("OPENAI_MODEL", "o3-mini")
+        
+        self.data_path = data_path
         try:
             if not os.path.exists(data_path):
                 raise FileNotFoundError(f"Data file not found: {data_path}")
             
-            logger.info(f"Loading data from {data_path}...")
-            self.df = pd.read_csv(data_path, low_memory=False)
-            logger.info(f"✅ Loaded {len(self.df)} posts from {data_path}")
-            
-            if len(self.df) == 0:
-                logger.warning("⚠️ Dataset is empty!")
+            self._load_data()
         except Exception as e:
             logger.error(f"❌ Failed to load data: {str(e)}")
             logger.error(traceback.format_exc())
@@ -63,198 +143,482 @@ class SageAgent:
             logger.error(f"❌ Failed to initialize OpenAI client: {str(e)}")
             raise
     
-    def answer_ceo_question(self, question: str, estimates_ok: bool = False, verbose: bool = False) -> Dict:
-        """Answer a CEO question - reasoning internal, output polished and clean"""
-        start_time = datetime.now()
-        logger.info(f"🔍 Processing question: {question[:100]}...")
+    def _load_data(self):
+        """Load the dataset and build every index and the materialized summary"""
+        logger.info(f"Loading data from {self.data_path}...")
+        tables, snapshot = load_dataset(self.data_path)
+        df = tables['posts']
+        comments = tables['comments']
+        
+        # Relevance ordering is fixed per dataset: sort once, hand out row positions
+        relevance = pd.to_numeric(df['relevance_score'], errors='coerce').to_numpy()
+        relevance_order = np.argsort(-relevance, kind='stable')
+        relevance_order.setflags(write=False)
+        offsets = comment_offsets(comments, len(df))
+        # Each post's context block is rendered once here; requests only join them
+        post_blocks, comment_blocks = render_post_fragments(df, comments, offsets)
+        # Token counts are persisted beside the snapshot; counted here only if missing or stale
+        post_tokens, comment_tokens = load_or_build_token_counts(
+            post_blocks, comment_blocks, snapshot.artifact_base, snapshot.source_hash
+        )
+        logger.info(f"🧮 Context blocks: ~{int(post_tokens.sum()):,} post tokens, ~{int(comment_tokens.sum()):,} comment tokens")
+        
+        # Build everything before swapping it in, so requests never see a half-loaded dataset
+        state = {
+            "snapshot": snapshot,
+            "df": df,
+            # Comments are pre-sorted by score within each post: top-N is a slice
+            "comments": comments,
+            "comment_offsets": offsets,
+            "post_blocks": post_blocks,
+            "comment_blocks": comment_blocks,
+            "post_tokens": post_tokens,
+            "comment_tokens": comment_tokens,
+            "confidence_weights": confidence_weight_array(df),
+            # Near-duplicate clusters are resolved at ingest (see sage_data.collapse_near_duplicates)
+            "duplicate_of": (df['duplicate_of'].to_numpy() if 'duplicate_of' in df.columns else np.arange(len(df))),
+            "duplicate_priority": duplicate_priority(df),
+            "relevance_order": relevance_order,
+            "relevance": np.nan_to_num(relevance, nan=0.0),
+            "comment_counts": pd.to_numeric(df['num_comments_scraped'], errors='coerce').fillna(0).to_numpy(),
+            "claimed_counts": pd.to_numeric(df['num_comments_claimed'], errors='coerce').fillna(0).to_numpy(),
+            "facets": FacetIndex.build(df),
+            "entities": EntityIndex.build(df),
+            "time_index": TimeIndex(df['created_at']),
+            # Static ranking features (relevance, confidence, age, engagement) computed once
+            "ranker": CompositeRanker.build(
+                df, comments, offsets, self.ranking_weights, self.ranking_half_life_days, self.ranking_category_weights
+            ),
+        }
+        if self.question_routing:
+            state["router"] = load_or_build_router(
+                df, load_router_history(os.getenv("ROUTER_HISTORY_PATH")), snapshot.artifact_base, snapshot.source_hash
+            )
+        if self.retrieval_mode == "bm25":
+            state["bm25"] = load_or_build_bm25_index(df, comments, snapshot.artifact_base, snapshot.source_hash)
+        if self.retrieval_mode == "semantic" or self.diversity_selection or self.embed_questions:
+            # Persisted beside the snapshot; built here only if missing or stale
+            state["semantic"] = load_or_build_semantic_index(
+                df, comments, snapshot.artifact_base, snapshot.source_hash
+            )
+        if self.diversity_selection:
+            state["diversity"] = DiversitySelector.build(df, state["semantic"].vectors, mmr_lambda=self.mmr_lambda)
+        
+        # Dataset-wide aggregates are identical for every full-dataset request: materialize them
+        state["summary"] = self._call_pinned(DatasetState(**state), self._aggregate, np.arange(len(df)))
         
+        # One reference swap publishes the new dataset
+        self.data_stat = snapshot.source_stat()
+        self.state = DatasetState(**state)
+        logger.info(f"✅ Loaded {len(df)} posts from {self.data_path}")
+        
+        if len(df) == 0:
+            logger.warning("⚠️ Dataset is empty!")
+    
+    def __getattr__(self, name: str):
+        # Dataset attributes (df, indexes, summary, ...) resolve against the state pinned by the
+        # running request, else the current one
+        state = _PINNED_STATE.get() or self.__dict__.get("state")
+        if state is None or name.startswith("__"):
+            raise AttributeError(name)
         try:
-            # Find relevant posts - use ALL available data
-            relevant_posts = self._find_all_relevant_posts(question)
-            
-            if len(relevant_posts) == 0:
-                logger.warning("⚠️ No relevant posts found in dataset")
-                return {
-                    "executive_summary": "No relevant posts found in dataset",
-                    "confidence": "LOW",
-                    "posts_analyzed": 0,
-                    "data_scope": "0 posts"
-                }
-            
-            logger.info(f"📊 Analyzing {len(relevant_posts)} posts ({len(relevant_posts)/len(self.df)*100:.1f}% of dataset)")
-            
-            # Build context from posts
-            context = self._build_context(relevant_posts, question)
-            
-            # Generate answer with internal reasoning
-            answer = self._generate_answer(question, context, relevant_posts, estimates_ok, verbose)
-            
-            duration = (datetime.now() - start_time).total_seconds()
-            logger.info(f"✅ Answer generated in {duration:.2f}s")
-            
-            return answer
-            
-        except Exception as e:
-            logger.error(f"❌ Error processing question: {str(e)}")
-            logger.error(traceback.format_exc())
-            return {
-                "executive_summary": f"Error processing question: {str(e)}",
-                "confidence": "LOW",
-                "posts_analyzed": 0,
-                "error": str(e)
-            }
+            return getattr(state, name)
+        except AttributeError:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'") from None
     
-    def _find_all_relevant_posts(self, question: str) -> pd.DataFrame:
-        """Find ALL posts for comprehensive analysis - NO FILTERING"""
-        # Use ALL posts for maximum coverage (Paul: analyze ALL 5K posts)
-        relevant = self.df.copy()
+    @contextmanager
+    def pinned_state(self, state: Optional[DatasetState] = None) -> Iterator[DatasetState]:
+        """Read every dataset attribute from one state inside the block
+
+        Defaults to the state already pinned in this context, else the current
+        one. A reload during the block does not affect it.
+        """
+        state = state or _PINNED_STATE.get() or self.state
+        token = _PINNED_STATE.set(state)
+        try:
+            yield state
+        finally:
+            _PINNED_STATE.reset(token)
+    
+    def _call_pinned(self, state: DatasetState, func, *args):
+        """func(*args) with state pinned (for work handed to other threads)"""
+        with self.pinned_state(state):
+            return func(*args)
+    
+    @property
+    def dataset_version(self) -> str:
+        """Content fingerprint of the loaded CSV"""
+        return self.snapshot.source_hash[:16]
+    
+    @property
+    def cache_version(self) -> str:
+        """What a cached answer depends on besides the request: dataset, prompt template and model"""
+        return f"{self.dataset_version}:p{PROMPT_VERSION}:{self.model}"
+    
+    def embed_question(self, question: str) -> Optional[np.ndarray]:
+        """Unit vector of a question in the semantic index space
         
-        # Sort by relevance but analyze everything
-        relevant = relevant.sort_values('relevance_score', ascending=False)
-        return relevant
+        None without the index, or when the question has terms the index cannot
+        represent: its vector would ignore them, so near-identical vectors could
+        come from questions that ask different things.
+        """
+        semantic = getattr(self, "semantic", None)
+        if semantic is None:
+            return None
+        unknown = semantic.unknown_terms(question)
+        if unknown:
+            logger.debug(f"Question has terms outside the semantic index ({', '.join(unknown[:5])}), not embedding it")
+            return None
+        return semantic.embed([question])[0]
     
-    def _build_context(self, posts: pd.DataFrame, question: str) -> str:
-        """Build comprehensive context using ALL enrichment columns + posts + comments"""
+    def reload_if_changed(self) -> bool:
+        """Reload the dataset (indexes and summary included) if the CSV behind data_path changed"""
+        current = DatasetSnapshot(self.data_path, self.snapshot.snapshot_dir)
+        stat = current.source_stat()
+        if stat == self.data_stat:
+            return False
+        if current.source_hash == self.snapshot.source_hash:
+            self.data_stat = stat
+            return False
+        logger.info(f"🔄 Dataset changed on disk, reloading {self.data_path}")
+        self._load_data()
+        return True
+    
+    def _summarize(self, rows: np.ndarray) -> Dict:
+        """Aggregates for a selection of posts; the full-dataset summary is materialized at load"""
+        if len(rows) == len(self.df):
+            return self.summary
+        return self._aggregate(rows)
+    
+    def _aggregate(self, rows: np.ndarray) -> Dict:
+        """Aggregates for a selection of posts, computed from the facet/entity/time indexes"""
+        selection = self.facets.from_rows(rows)
+        selected = self.facets.mask(selection)
+        return {
+            "posts": len(rows),
+            "comments": int(self.comment_counts[rows].sum()),
+            "comments_claimed": int(self.claimed_counts[rows].sum()),
+            "high_confidence": self.facets.counts('confidence_level', selection).get('HIGH', 0),
+            "subreddits": len(self.facets.counts('subreddit', selection)),
+            "categories": self.facets.counts('ceo_question_category', selection),
+            "actionability": self.facets.counts('actionability', selection),
+            "sentiment": self.facets.counts('sentiment', selection),
+            "entities": {field: self.entities.counts(field, selected, top=5) for field in ("company", "product", "role")},
+            "time": self.time_index.stats(rows),
+        }
+    
+    def _render_overview(self, summary: Dict) -> List[str]:
+        """Dataset overview section of the context, assembled from precomputed aggregates"""
         context_parts = []
-        
-        # Calculate totals
-        total_comments = posts['num_comments_scraped'].fillna(0).sum()
+        num_posts = summary["posts"]
         
         # HIGH-CONFIDENCE pattern summary (use enrichment!)
-        high_conf = posts[posts['confidence_level'] == 'HIGH']
-        context_parts.append(f"DATASET OVERVIEW: {len(posts)} posts ({len(high_conf)} HIGH-confidence), {int(total_comments):,} comments, {posts['subreddit'].nunique()} subreddits")
+        context_parts.append(f"DATASET OVERVIEW: {num_posts} posts ({summary['high_confidence']} HIGH-confidence), {summary['comments']:,} comments, {summary['subreddits']} subreddits")
         
         # CEO Question Categories breakdown (STRATEGIC)
         context_parts.append(f"\nCEO QUESTION CATEGORIES (from enrichment):")
-        for cat in posts['ceo_question_category'].unique()[:5]:
-            if pd.notna(cat):
-                count = len(posts[posts['ceo_question_category'] == cat])
-                pct = count / len(posts) * 100
-                context_parts.append(f"  • {cat}: {count} posts ({pct:.0f}%)")
+        for cat, count in list(summary["categories"].items())[:5]:
+            pct = count / num_posts * 100
+            context_parts.append(f"  • {cat}: {count} posts ({pct:.0f}%)")
         
         # Actionability breakdown (CRITICAL!)
         context_parts.append(f"\nACTIONABILITY DISTRIBUTION:")
-        risk_mit = len(posts[posts['actionability'] == 'Risk Mitigation'])
-        opp_det = len(posts[posts['actionability'] == 'Opportunity Detection'])
-        context_parts.append(f"  • Risk Mitigation: {risk_mit} posts ({risk_mit/len(posts)*100:.0f}%) - URGENT")
-        context_parts.append(f"  • Opportunity Detection: {opp_det} posts ({opp_det/len(posts)*100:.0f}%) - GROWTH")
+        risk_mit = summary["actionability"].get('Risk Mitigation', 0)
+        opp_det = summary["actionability"].get('Opportunity Detection', 0)
+        context_parts.append(f"  • Risk Mitigation: {risk_mit} posts ({risk_mit/num_posts*100:.0f}%) - URGENT")
+        context_parts.append(f"  • Opportunity Detection: {opp_det} posts ({opp_det/num_posts*100:.0f}%) - GROWTH")
         
         # Sentiment breakdown
         context_parts.append(f"\nSENTIMENT ANALYSIS:")
         for sentiment in ['Negative', 'Positive', 'Mixed', 'Neutral']:
-            count = len(posts[posts['sentiment'] == sentiment])
+            count = summary["sentiment"].get(sentiment, 0)
             if count > 0:
-                pct = count / len(posts) * 100
+                pct = count / num_posts * 100
                 context_parts.append(f"  • {sentiment}: {count} posts ({pct:.0f}%)")
         
-        # Companies and Products mentioned (COMPETITIVE INTEL)
-        context_parts.append(f"\nKEY ENTITIES MENTIONED (from enrichment):")
-        companies = [c.strip() for c in str(posts['companies_mentioned'].iloc[0]).split(',') if pd.notna(posts['companies_mentioned'].iloc[0])]
-        products = [p.strip() for p in str(posts['products_mentioned'].iloc[0]).split(',') if pd.notna(posts['products_mentioned'].iloc[0])]
-        context_parts.append(f"  • Companies: {', '.join(companies[:5])}")
-        context_parts.append(f"  • Products: {', '.join(products[:5])}")
+        # Companies, Products and Roles mentioned across the selection (COMPETITIVE INTEL)
+        context_parts.append(f"\nKEY ENTITIES MENTIONED (from enrichment, share of posts):")
+        for label, field in [("Companies", "company"), ("Products", "product"), ("Roles", "role")]:
+            mentions = ', '.join(f"{name} ({count/num_posts*100:.0f}%)" for name, count in summary["entities"][field])
+            context_parts.append(f"  • {label}: {mentions or 'none mentioned'}")
+        
+        return context_parts
+    
+    def _data_scope(self, summary: Dict, rows: np.ndarray) -> str:
+        """Provenance line (posts, comments, subreddits, date range, freshness) for the summarized rows"""
+        date_range = "Date range unavailable"
+        freshness_label = ""
+        time_stats = summary["time"]
+        if time_stats:
+            date_range = f"{time_stats['date_min'].strftime('%B %d, %Y')} to {time_stats['date_max'].strftime('%B %d, %Y')}"
+            # Ages are taken at render time so a long-lived materialized summary stays accurate
+            median_age_days = (pd.Timestamp.now(tz='UTC') - time_stats['median_created']).days
+            freshness_label = f"Median age: {median_age_days} days (FRESH)" if median_age_days < 90 else f"Median age: {median_age_days} days"
+            freshness_label += f", {self.time_index.fresh_share(rows)*100:.1f}% from last 3 months"
+        return f"Based on {summary['posts']} posts and {summary['comments']:,} comments from {summary['subreddits']} subreddits, posted {date_range}. Data freshness: {freshness_label}"
+    
+    def answer_ceo_question(self, question: str, estimates_ok: bool = False, verbose: bool = False,
+                            filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+                            ranking: Optional[Dict[str, float]] = None, deadline: Optional[float] = None) -> Dict:
+        """Answer a CEO question - reasoning internal, output polished and clean
+        
+        filters restricts retrieval by enrichment facet, mentioned entity or date,
+        e.g. {"confidence_level": "HIGH", "subreddit": ["salesforce"], "company": "OpenAI", "since_days": 90}
+        ranking overrides composite ranking weights for this request,
+        e.g. {"freshness": 0.4, "half_life_days": 60}
+        deadline (time.monotonic()) bounds the whole request; past it, DeadlineExceeded is raised
+        """
+        start_time = datetime.now()
+        logger.info(f"🔍 Processing question: {question[:100]}...")
+        
+        try:
+            # Find relevant posts - use ALL available data
+            prepared = self.prepare_answer(question, filters, ranking)
+            if prepared is None:
+                return self._no_posts_answer()
+            
+            # Generate answer with internal reasoning
+            answer = self._call_pinned(prepared["state"], self._generate_answer, question, prepared["context"],
+                                       prepared["rows"], estimates_ok, verbose, prepared["summary"], deadline,
+                                       prepared["context_rows"])
+            return self._finish_answer(answer, prepared, start_time)
+            
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            return self._question_error(e)
+    
+    def prepare_answer(self, question: str, filters: Optional[Dict] = None,
+                       ranking: Optional[Dict[str, float]] = None) -> Optional[Dict]:
+        """Everything before the model call: retrieval, aggregates and the packed context
+        
+        Returns None when no post matches the question and filters
+        """
+        with self.pinned_state() as state:
+            route = self._route_question(question, filters)
+            rows, scores = self._find_all_relevant_posts(question, filters, route, ranking)
+            if len(rows) == 0:
+                logger.warning("⚠️ No relevant posts found in dataset")
+                return None
+            
+            logger.info(f"📊 Analyzing {len(rows)} posts ({len(rows)/len(self.df)*100:.1f}% of dataset)")
+            summary = self._summarize(rows)
+            
+            # Build context from posts
+            context, context_tokens, context_rows = self._build_context(rows, question, summary, scores)
+            weights, half_life = self.ranker.resolve(ranking, self._ranking_category(filters, route))
+            return {
+                "rows": rows,
+                "summary": summary,
+                "context": context,
+                # The posts the model sees: citations come from these
+                "context_rows": context_rows,
+                # Reported with the answer
+                "details": {
+                    "question_route": route,
+                    "context_tokens": context_tokens,
+                    "ranking": {"weights": {k: round(w, 3) for k, w in weights.items()}, "half_life_days": half_life},
+                },
+                # Dataset state the rows refer to; later steps of the request pin it too
+                "state": state,
+            }
+    
+    def _question_error(self, e: Exception) -> Dict:
+        """Answer dict for a failure before the model call (retrieval, context building)"""
+        if not isinstance(e, DeadlineExceeded):
+            logger.error(f"❌ Error processing question: {str(e)}")
+            logger.error(traceback.format_exc())
+        return {
+            "executive_summary": f"Error processing question: {str(e)}",
+            "confidence": "LOW",
+            "posts_analyzed": 0,
+            "error": str(e)
+        }
+    
+    def _finish_answer(self, answer: Dict, prepared: Dict, start_time: datetime, action: str = "generated") -> Dict:
+        """Attach the request details (route, token usage, ranking) to a finished answer"""
+        answer.update(prepared["details"])
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"✅ Answer {action} in {duration:.2f}s")
+        return answer
+    
+    def _no_posts_answer(self) -> Dict:
+        return {
+            "executive_summary": "No relevant posts found in dataset",
+            "confidence": "LOW",
+            "posts_analyzed": 0,
+            "data_scope": "0 posts"
+        }
+    
+    def _route_question(self, question: str, filters: Optional[Dict] = None) -> Dict[str, str]:
+        """Labels the router is confident about, skipping dimensions the caller already filtered"""
+        if not self.question_routing:
+            return {}
+        routes = self.router.route(question)
+        route = {dim: r["label"] for dim, r in routes.items() if not (filters and dim in filters)}
+        if route:
+            logger.info(f"🧭 Routed question to {route}")
+        return route
+    
+    def _ranking_category(self, filters: Optional[Dict] = None, route: Optional[Dict[str, str]] = None) -> Optional[str]:
+        """Category whose ranking weights apply: an explicit single-category filter, else the routed one"""
+        category = (filters or {}).get('ceo_question_category')
+        if isinstance(category, str):
+            return category
+        return (route or {}).get('ceo_question_category')
+    
+    def _find_all_relevant_posts(self, question: str, filters: Optional[Dict] = None,
+                                 route: Optional[Dict[str, str]] = None,
+                                 ranking: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Find the posts that match the question (and facet filters), best first
+        
+        Returns row positions into self.df (never a copy of the frame) and
+        their composite ranking scores
+        """
+        rows, retrieval_scores = self._rank_posts(question)
+        rows, scores = self.ranker.rank(rows, retrieval_scores, ranking, self._ranking_category(filters, route))
+        if filters:
+            facet_filters = {k: v for k, v in filters.items() if k not in ENTITY_FIELDS and k not in TIME_FILTERS}
+            allowed = self.facets.mask(self.facets.select(facet_filters))
+            for field, wanted in filters.items():
+                if field in ENTITY_FIELDS:
+                    allowed &= self.entities.mask(field, wanted)
+            if any(k in filters for k in TIME_FILTERS):
+                allowed &= self.time_index.mask(filters)
+            kept = allowed[rows]
+            rows, scores = rows[kept], scores[kept]
+            logger.info(f"🧮 Filters {filters} kept {len(rows)} posts")
+        if self.collapse_duplicates:
+            # After filtering, so a cluster is kept through its best copy that passed the filters
+            kept = self._cluster_representatives(rows)
+            rows, scores = rows[kept], scores[kept]
+        if route:
+            # Routing is a soft pre-filter: keep the full candidate set if the slice is too thin
+            allowed = self.facets.mask(self.facets.select(route))
+            routed = allowed[rows]
+            if routed.sum() >= self.routing_min_posts:
+                rows, scores = rows[routed], scores[routed]
+            else:
+                logger.info(f"🧭 Routed slice has only {routed.sum()} posts, keeping all {len(rows)} candidates")
+        return rows, scores
+    
+    def _cluster_representatives(self, rows: np.ndarray) -> np.ndarray:
+        """Mask over rows keeping one per near-duplicate cluster (its highest-priority member among rows)"""
+        if len(rows) == 0:
+            return np.zeros(0, dtype=bool)
+        clusters = self.duplicate_of[rows]
+        # Same tie-break as ingest: priority, then lowest row
+        order = np.lexsort((rows, -self.duplicate_priority[rows], clusters))
+        firsts = np.r_[True, clusters[order][1:] != clusters[order][:-1]]
+        keep = np.zeros(len(rows), dtype=bool)
+        keep[order[firsts]] = True
+        return keep
+    
+    def _rank_posts(self, question: str) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Candidate posts for the question in the configured retrieval mode, with their retrieval scores"""
+        if self.retrieval_mode == "bm25":
+            scores = self.bm25.score(question)
+            matched = np.flatnonzero(scores > 0)
+            if len(matched) > 0:
+                # BM25 first, relevance_score breaks ties
+                order = np.lexsort((-self.relevance[matched], -scores[matched]))
+                logger.info(f"🔎 BM25 matched {len(matched)} posts")
+                return matched[order], scores[matched][order]
+            logger.info("🔎 No BM25 matches, falling back to relevance ordering")
+        elif self.retrieval_mode == "semantic":
+            rows, similarities = self.semantic.search(question, top_k=self.semantic_top_k)
+            if len(rows) > 0:
+                logger.info(f"🧭 Semantic search returned {len(rows)} posts (top similarity {similarities[0]:.2f})")
+                return rows, similarities
+            logger.info("🧭 Question has no indexed terms, falling back to relevance ordering")
+        
+        # Use ALL posts for maximum coverage (Paul: analyze ALL 5K posts)
+        return self.relevance_order, None
+    
+    def _build_context(self, rows: np.ndarray, question: str, summary: Optional[Dict] = None,
+                       scores: Optional[np.ndarray] = None) -> Tuple[str, Dict, np.ndarray]:
+        """Build comprehensive context using ALL enrichment columns + posts + comments
+        
+        Posts are packed into the token budget by value per token, then emitted
+        in retrieval order. scores (composite ranking scores aligned with rows)
+        are the relevance term of diversity selection. Returns (context, token
+        usage by section, rows of the posts in the prompt as [POST 1], [POST 2], ...).
+        """
+        summary = summary or self._summarize(rows)
+        context_parts = self._render_overview(summary)
         
         context_parts.append(f"\n{'='*80}")
         context_parts.append(f"DETAILED POST ANALYSIS (ALL ENRICHMENT COLUMNS):")
         context_parts.append(f"{'='*80}")
+        overview_tokens = estimate_tokens("\n".join(context_parts))
         
-        # ITERATE ROW BY ROW - include ALL columns
-        for idx, (_, post) in enumerate(posts.head(100).iterrows(), 1):
-            # Basic info
-            url = str(post.get('url', 'N/A') or 'N/A')
-            title = str(post.get('title', '') or '')
-            body = str(post.get('body', '') or '')[:300]
-            username = str(post.get('username', 'Unknown') or 'Unknown')
-            subreddit = str(post.get('subreddit', 'unknown') or 'unknown')
+        # Candidates are the top of the ranking (re-selected for diversity); the packer picks what fits
+        if self.diversity_selection:
+            pool_scores = scores[:self.diversity_pool] if scores is not None else None
+            candidates = self.diversity.select(rows[:self.diversity_pool], self.context_posts * 3, pool_scores)
+        else:
+            candidates = rows[:self.context_posts * 3]
+        values = candidate_values(candidates, self.relevance, self.confidence_weights)
+        selected, with_comments = pack_posts(
+            candidates, values, self.post_tokens, self.comment_tokens,
+            self.context_token_budget - overview_tokens, self.context_posts
+        )
+        
+        # Pre-rendered per-post blocks (see sage_context.render_post_fragments)
+        for idx, (row, include_comments) in enumerate(zip(selected, with_comments), 1):
+            comment_block = self.comment_blocks[row] if include_comments else ''
+            context_parts.append(f"\n[POST {idx}] {self.post_blocks[row]}{comment_block}")
+        
+        post_tokens = int(self.post_tokens[selected].sum())
+        comment_tokens = int(self.comment_tokens[selected[with_comments]].sum())
+        context_tokens = {
+            "budget": self.context_token_budget,
+            "overview": overview_tokens,
+            "posts": post_tokens,
+            "comments": comment_tokens,
+            "total": overview_tokens + post_tokens + comment_tokens,
+            "posts_included": int(len(selected)),
+            "posts_with_comments": int(with_comments.sum()),
+        }
+        logger.info(f"🧮 Packed {len(selected)} of {len(candidates)} candidate posts into ~{context_tokens['total']:,} tokens "
+                    f"(overview {overview_tokens:,}, posts {post_tokens:,}, comments {comment_tokens:,})")
+        return "\n".join(context_parts), context_tokens, selected
+    
+    def _generate_answer(self, question: str, context: str, rows: np.ndarray, estimates_ok: bool, verbose: bool,
+                         summary: Optional[Dict] = None, deadline: Optional[float] = None,
+                         context_rows: Optional[np.ndarray] = None) -> Dict:
+        """Generate answer - reasoning is INTERNAL via o3-mini, output is CLEAN"""
+        summary = summary or self._summarize(rows)
+        messages = self._build_messages(question, context, rows, estimates_ok, summary)
+        
+        try:
+            if verbose:
+                logger.info(f"🤖 Calling {self.model} with HIGH reasoning...")
             
-            # Extract date
-            post_date = "Date unavailable"
-            try:
-                created_at = post.get('created_at')
-                if pd.notna(created_at):
-                    if isinstance(created_at, str):
-                        from datetime import datetime
-                        post_date = pd.to_datetime(created_at, errors='coerce')
-                    else:
-                        post_date = created_at
-                    if pd.notna(post_date):
-                        post_date = post_date.strftime('%B %d, %Y') if hasattr(post_date, 'strftime') else str(post_date)
-            except:
-                post_date = "Date unavailable"
+            logger.debug(f"Requesting OpenAI API with model: {self.model}")
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_completion_tokens=4000,
+                timeout=time_left(deadline, self.llm_timeout)
+            )
             
-            # ENRICHMENT COLUMNS (THE AHA MOMENT!)
-            ceo_cat = str(post.get('ceo_question_category', '') or '')
-            strategic_signal = str(post.get('strategic_signal', '') or '')[:200]
-            confidence = str(post.get('confidence_level', 'UNKNOWN') or 'UNKNOWN')
-            sentiment = str(post.get('sentiment', '') or '')
-            actionability = str(post.get('actionability', '') or '')
-            temporal = str(post.get('temporal_context', '') or '')
-            companies = str(post.get('companies_mentioned', '') or '')
-            products = str(post.get('products_mentioned', '') or '')
-            roles = str(post.get('roles_mentioned', '') or '')
-            tags = str(post.get('tags', '') or '')[:200]
-            relevance_score = float(post.get('relevance_score', 0) or 0)
-            relevance_cat = str(post.get('relevance_category', '') or '')
+            answer_text = response.choices[0].message.content
             
-            # Build enriched post entry with date
-            context_parts.append(f"\n[POST {idx}] r/{subreddit} by u/{username} | Posted: {post_date} | {confidence} confidence | {actionability}")
-            context_parts.append(f"  URL: {url}")
-            context_parts.append(f"  TITLE: {title}")
-            if body:
-                context_parts.append(f"  TEXT: {body}")
+            if verbose:
+                logger.info("✅ Response received from OpenAI")
             
-            # ENRICHMENT METADATA (THIS IS THE MAGIC!)
-            if strategic_signal and strategic_signal != 'nan':
-                context_parts.append(f"  🎯 SIGNAL: {strategic_signal}")
-            context_parts.append(f"  📊 Category: {ceo_cat} | Sentiment: {sentiment} | Temporal: {temporal}")
-            context_parts.append(f"  💼 Relevance: {relevance_cat} (score: {relevance_score:.2f})")
-            if companies and companies != 'nan':
-                context_parts.append(f"  🏢 Companies: {companies[:100]}")
-            if products and products != 'nan':
-                context_parts.append(f"  ⚙️  Products: {products[:100]}")
-            if roles and roles != 'nan':
-                context_parts.append(f"  👥 Roles: {roles[:100]}")
-            if tags and tags != 'nan':
-                context_parts.append(f"  #️⃣  Tags: {tags}")
+            answer = self._finalize_answer(question, answer_text, rows, summary, context_rows)
+            self._record_usage(answer, response)
+            return answer
             
-            # Include top comments
-            try:
-                comments_json_str = post.get('all_scraped_comments_json', '[]')
-                if pd.notna(comments_json_str) and comments_json_str:
-                    comments_data = json.loads(str(comments_json_str))
-                    if isinstance(comments_data, list) and len(comments_data) > 0:
-                        top_comments = sorted(
-                            comments_data, 
-                            key=lambda x: x.get('score', 0), 
-                            reverse=True
-                        )[:3]
-                        context_parts.append(f"  💬 TOP COMMENTS ({len(comments_data)} total):")
-                        for c_idx, comment in enumerate(top_comments, 1):
-                            c_author = comment.get('author', 'Unknown')
-                            c_score = comment.get('score', 0)
-                            c_body = str(comment.get('body', ''))[:150]
-                            # Extract comment date if available
-                            c_date = "Date unavailable"
-                            try:
-                                c_created = comment.get('created_utc') or comment.get('publishingDate')
-                                if c_created:
-                                    if isinstance(c_created, (int, float)):
-                                        from datetime import datetime
-                                        c_date = datetime.fromtimestamp(c_created).strftime('%B %d, %Y')
-                                    elif isinstance(c_created, str):
-                                        c_date = pd.to_datetime(c_created, errors='coerce')
-                                        if pd.notna(c_date):
-                                            c_date = c_date.strftime('%B %d, %Y') if hasattr(c_date, 'strftime') else str(c_date)
-                            except:
-                                pass
-                            context_parts.append(f"      [{c_idx}] u/{c_author} ({c_score}↑) on {c_date}: {c_body}")
-            except:
-                pass
-        
-        return "\n".join(context_parts)
-    
-    def _generate_answer(self, question: str, context: str, posts: pd.DataFrame, estimates_ok: bool, verbose: bool) -> Dict:
-        """Generate answer - reasoning is INTERNAL via o3-mini, output is CLEAN"""
+        except Exception as e:
+            self._raise_if_past(deadline, e)
+            return self._answer_error(e, rows)
+    
+    def _build_messages(self, question: str, context: str, rows: np.ndarray, estimates_ok: bool,
+                        summary: Dict) -> List[Dict[str, str]]:
+        """System and user messages for the model"""
         
         system_prompt = """Act like Sage, a strategic intelligence analyst for rPotential.ai's CPO (Chief Potential Officer) tool, advising Fortune 500 CEOs on $10M+ decisions about AI and human workforce optimization.
 
@@ -316,7 +680,7 @@ Strategic context order:
   1. CEO Question (what we're solving)
   2. Enrichment Summary (CEO categories %, actionability %, sentiment %)
   3. Few-Shot Examples (what a good answer looks like)
-  4. Top 30 Posts (by relevance_score × confidence_level)
+  4. Top Posts (ranked by retrieval, relevance, confidence, freshness and engagement, picked for diversity)
   5. Top Comments (high-upvote validation)
   6. Explicit Instructions (response format)
 
@@ -414,7 +778,7 @@ QUALITY CHECKS (BEFORE RESPONDING)
         
         user_prompt = f"""QUESTION FROM CEO: {question}
 
-CONTEXT (from {len(posts)} posts analyzed with {int(posts['num_comments_scraped'].fillna(0).sum()):,} total comments):
+CONTEXT (from {summary['posts']} posts analyzed with {summary['comments']:,} total comments):
 {context}
 
 ⚡ CRITICAL: USE ENRICHMENT METADATA TO CREATE AHA MOMENTS FOR PAUL:
@@ -528,96 +892,84 @@ DELIVER OUTPUT WITH ACTUAL CITATIONS - DO NOT PARAPHRASE OR SUMMARIZE. Quote eve
 
 Analyze the posts AND comments thoroughly. Quote specific users. Ground everything in the data."""
         
-        try:
-            if verbose:
-                logger.info("🤖 Calling o3-mini with HIGH reasoning...")
-            
-            logger.debug(f"Requesting OpenAI API with model: o3-mini")
-            response = self.client.chat.completions.create(
-                model="o3-mini",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
-                max_completion_tokens=4000,
-                timeout=60.0  # 60 second timeout
-            )
-            
-            answer_text = response.choices[0].message.content
-            
-            if verbose:
-                logger.info("✅ Response received from OpenAI")
-            
-            if not answer_text:
-                logger.warning("⚠️ Empty response from OpenAI")
-                raise ValueError("Empty response from OpenAI API")
-            
-            # Clean and format the answer text for readability
-            answer_text = self._clean_answer_text(answer_text)
-            
-            # Extract first paragraph as executive summary
-            summary = answer_text.split('\n\n')[0] if '\n\n' in answer_text else answer_text[:300]
-            
+        return [
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_prompt}
+        ]
+    
+    def _answer_metadata(self, rows: np.ndarray, summary: Dict, context_rows: Optional[np.ndarray] = None) -> Dict:
+        """Scope and citations of an answer, known before the model responds
+
+        Citations are the posts placed in the prompt (context_rows, in [POST n]
+        order); without them, the top retrieved rows.
+        """
+        return {
+            "posts_analyzed": summary["posts"],
+            "comments_analyzed": summary["comments"],
+            "comments_claimed": summary["comments_claimed"],
+            "subreddits": summary["subreddits"],
+            "dataset_coverage": f"{len(rows)/len(self.df)*100:.1f}% ({len(rows)} of {len(self.df)} posts analyzed)",
+            "data_scope": self._data_scope(summary, rows),
             # Extract citations
-            citations = self._extract_citations(posts)
-            
-            # Calculate totals
-            total_comments = int(posts['num_comments_scraped'].fillna(0).sum())
-            total_comments_claimed = int(posts['num_comments_claimed'].fillna(0).sum())
-            
-            # Calculate actual date range from posts
-            date_range = "Date range unavailable"
-            freshness_label = ""
-            try:
-                posts['created_at'] = pd.to_datetime(posts['created_at'], errors='coerce', utc=True)
-                posts['created_at'] = posts['created_at'].dt.tz_localize(None)
-                date_min = posts['created_at'].min()
-                date_max = posts['created_at'].max()
-                if pd.notna(date_min) and pd.notna(date_max):
-                    date_range = f"{date_min.strftime('%B %d, %Y')} to {date_max.strftime('%B %d, %Y')}"
-                    # Calculate freshness (median age)
-                    from datetime import datetime
-                    today = datetime.now()
-                    median_age_days = int((today - posts['created_at'].median()).days)
-                    freshness_label = f"Median age: {median_age_days} days (FRESH)" if median_age_days < 90 else f"Median age: {median_age_days} days"
-            except:
-                date_range = "Date range unavailable"
-                freshness_label = ""
-            
-            return {
-                "executive_summary": summary,
-                "full_answer": answer_text,
-                "confidence": "HIGH",
-                "posts_analyzed": len(posts),
-                "comments_analyzed": total_comments,
-                "comments_claimed": total_comments_claimed,
-                "subreddits": posts['subreddit'].nunique(),
-                "dataset_coverage": "100.0% (ALL posts analyzed)",
-                "data_scope": f"Based on {len(posts)} posts and {total_comments:,} comments from {posts['subreddit'].nunique()} subreddits, posted {date_range}. Data freshness: {freshness_label}",
-                "citations": citations,
-                "suggested_followups": self._generate_followups(question, answer_text)
-            }
-            
-        except Exception as e:
-            logger.error(f"❌ Error generating answer: {str(e)}")
-            logger.error(traceback.format_exc())
-            
-            # Check for specific error types
-            if "timeout" in str(e).lower() or "timed out" in str(e).lower():
-                error_msg = "Request timed out. The question may be too complex. Please try again."
-            elif "rate limit" in str(e).lower():
-                error_msg = "Rate limit exceeded. Please wait a moment and try again."
-            elif "authentication" in str(e).lower() or "api key" in str(e).lower():
-                error_msg = "Authentication error. Please check API key configuration."
-            else:
-                error_msg = f"Error generating response: {str(e)}"
-            
-            return {
-                "executive_summary": error_msg,
-                "confidence": "LOW",
-                "posts_analyzed": len(posts),
-                "error": str(e)
-            }
+            "citations": self._extract_citations(context_rows if context_rows is not None else rows[:20])
+        }
+    
+    def _finalize_answer(self, question: str, answer_text: str, rows: np.ndarray, summary: Dict,
+                         context_rows: Optional[np.ndarray] = None) -> Dict:
+        """Turn the model's raw text into the answer dict (empty text raises ValueError)"""
+        if not answer_text:
+            logger.warning("⚠️ Empty response from OpenAI")
+            raise ValueError("Empty response from OpenAI API")
+        
+        # Clean and format the answer text for readability
+        answer_text = self._clean_answer_text(answer_text)
+        
+        # Extract first paragraph as executive summary
+        executive_summary = answer_text.split('\n\n')[0] if '\n\n' in answer_text else answer_text[:300]
+        
+        return {
+            "executive_summary": executive_summary,
+            "full_answer": answer_text,
+            "confidence": "HIGH",
+            **self._answer_metadata(rows, summary, context_rows),
+            "suggested_followups": self._generate_followups(question, answer_text)
+        }
+    
+    def _record_usage(self, answer: Dict, response):
+        """Model tokens billed for the answer (prompt + completion, reasoning included), when reported"""
+        usage = getattr(response, "usage", None)
+        total = getattr(usage, "total_tokens", None)
+        if isinstance(total, int):
+            answer["token_usage"] = total
+    
+    def _raise_if_past(self, deadline: Optional[float], error: Exception):
+        """Surface a model timeout caused by the request deadline as DeadlineExceeded"""
+        if isinstance(error, DeadlineExceeded):
+            raise error
+        if deadline is not None and time.monotonic() >= deadline:
+            raise DeadlineExceeded("Request deadline exceeded (timed out)") from error
+    
+    def _answer_error(self, e: Exception, rows: np.ndarray) -> Dict:
+        """Answer dict for a failed model call"""
+        logger.error(f"❌ Error generating answer: {str(e)}")
+        logger.error(traceback.format_exc())
+        
+        # Check for specific error types
+        if "timeout" in str(e).lower() or "timed out" in str(e).lower():
+            error_msg = "Request timed out. The question may be too complex. Please try again."
+        elif "rate limit" in str(e).lower():
+            error_msg = "Rate limit exceeded. Please wait a moment and try again."
+        elif "authentication" in str(e).lower() or "api key" in str(e).lower():
+            error_msg = "Authentication error. Please check API key configuration."
+        else:
+            error_msg = f"Error generating response: {str(e)}"
+        
+        return {
+            "executive_summary": error_msg,
+            "confidence": "LOW",
+            "posts_analyzed": len(rows),
+            "error": str(e)
+        }
     
     def _clean_answer_text(self, text: str) -> str:
         """Clean and format answer text for better readability"""
@@ -681,11 +1033,11 @@ Analyze the posts AND comments thoroughly. Quote specific users. Ground everythi
         
         return cleaned.strip()
     
-    def _extract_citations(self, posts: pd.DataFrame, claim_keywords: list = None) -> list:
+    def _extract_citations(self, rows: np.ndarray, claim_keywords: list = None) -> list:
         """Extract citations for claims - return post URLs and metadata with dates"""
         citations = []
         
-        for _, post in posts.head(20).iterrows():
+        for _, post in self.df.iloc[rows].iterrows():
             # Handle NaN values properly
             title = str(post.get('title', '') or '')[:80]
             post_id = str(post.get('post_id', 'N/A') or 'N/A')
@@ -694,22 +1046,8 @@ Analyze the posts AND comments thoroughly. Quote specific users. Ground everythi
             username = str(post.get('username', 'Unknown') or 'Unknown')
             comments = int(post.get('num_comments_scraped', 0) or 0)
             
-            # Extract date
-            post_date = "Date unavailable"
-            try:
-                created_at = post.get('created_at')
-                if pd.notna(created_at):
-                    if isinstance(created_at, str):
-                        post_date = pd.to_datetime(created_at, errors='coerce')
-                    else:
-                        post_date = created_at
-                    if pd.notna(post_date):
-                        if hasattr(post_date, 'strftime'):
-                            post_date = post_date.strftime('%B %d, %Y')
-                        else:
-                            post_date = str(post_date)
-            except:
-                post_date = "Date unavailable"
+            # Date formatted once at ingest
+            post_date = post.get('created_display', "Date unavailable")
             
             citation = {
                 'post_id': post_id,
@@ -750,6 +1088,154 @@ Analyze the posts AND comments thoroughly. Quote specific users. Ground everythi
         
         return followups[:3]
 
+class AsyncSageAgent(SageAgent):
+    """SageAgent for async servers
+    
+    The model call goes through AsyncOpenAI, so a waiting question holds no
+    thread. Only CPU-bound work (retrieval, aggregates, context packing) runs
+    on a dedicated bounded executor (SAGE_CPU_WORKERS threads), never on the
+    event loop's default pool.
+    """
+    
+    def __init__(self, data_path: str, api_key: Optional[str] = None, retrieval_mode: Optional[str] = None,
+                 cpu_workers: Optional[int] = None):
+        super().__init__(data_path, api_key=api_key, retrieval_mode=retrieval_mode)
+        
+        cpu_workers = cpu_workers or int(os.getenv("SAGE_CPU_WORKERS", str(min(4, os.cpu_count() or 1))))
+        self.executor = ThreadPoolExecutor(max_workers=cpu_workers, thread_name_prefix="sage-cpu")
+        try:
+            self.async_client = AsyncOpenAI(api_key=api_key or os.getenv("OPENAI_API_KEY"))
+            logger.info(f"✅ Async OpenAI client initialized ({cpu_workers} CPU workers)")
+        except Exception as e:
+            logger.error(f"❌ Failed to initialize async OpenAI client: {str(e)}")
+            raise
+    
+    async def _before_deadline(self, awaitable, deadline: Optional[float], cap: Optional[float] = None):
+        """Await within the time left; past it the awaitable is cancelled and DeadlineExceeded raised"""
+        try:
+            return await asyncio.wait_for(awaitable, time_left(deadline, cap))
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceeded("Request deadline exceeded (timed out)") from e
+    
+    async def _run_cpu(self, deadline: Optional[float], func, *args):
+        """Run CPU-bound agent work on the dedicated executor (the request stops waiting at the deadline)"""
+        future = asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        return await self._before_deadline(future, deadline)
+    
+    async def answer_ceo_question_async(self, question: str, estimates_ok: bool = False,
+                                        filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+                                        ranking: Optional[Dict[str, float]] = None,
+                                        deadline: Optional[float] = None) -> Dict:
+        """Async answer_ceo_question
+        
+        deadline (time.monotonic()) bounds retrieval, context building and the
+        model call together; past it, DeadlineExceeded is raised. Cancelling
+        the calling task aborts the in-flight OpenAI request.
+        """
+        start_time = datetime.now()
+        logger.info(f"🔍 Processing question: {question[:100]}...")
+        
+        try:
+            prepared = await self._run_cpu(deadline, self.prepare_answer, question, filters, ranking)
+            if prepared is None:
+                return self._no_posts_answer()
+            rows, summary = prepared["rows"], prepared["summary"]
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            return self._question_error(e)
+        
+        try:
+            messages = self._build_messages(question, prepared["context"], rows, estimates_ok, summary)
+            logger.debug(f"Requesting OpenAI API with model: {self.model}")
+            response = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_completion_tokens=4000,
+                timeout=time_left(deadline, self.llm_timeout)
+            )
+            answer_text = response.choices[0].message.content
+            answer = await self._run_cpu(deadline, self._call_pinned, prepared["state"], self._finalize_answer,
+                                        question, answer_text, rows, summary, prepared["context_rows"])
+            self._record_usage(answer, response)
+        except asyncio.CancelledError:
+            logger.warning(f"🛑 Cancelled question: {question[:50]}...")
+            raise
+        except Exception as e:
+            self._raise_if_past(deadline, e)
+            return self._answer_error(e, rows)
+        
+        return self._finish_answer(answer, prepared, start_time)
+    
+    async def stream_ceo_answer_async(self, question: str, estimates_ok: bool = False,
+                                      filters: Optional[Dict[str, Union[str, List[str]]]] = None,
+                                      ranking: Optional[Dict[str, float]] = None,
+                                      deadline: Optional[float] = None) -> AsyncIterator[Tuple[str, Dict]]:
+        """Answer a CEO question as a stream of (event, data) pairs
+        
+        "meta" comes first with the locally computed scope and citations, then
+        one "delta" per chunk of model output, then "done" with the same dict
+        answer_ceo_question_async returns ("error" replaces "done" on failure).
+        Past the deadline the stream ends with a timeout "error" event; closing
+        the generator (client disconnect) closes the OpenAI stream.
+        """
+        start_time = datetime.now()
+        logger.info(f"🔍 Streaming question: {question[:100]}...")
+        
+        try:
+            prepared = await self._run_cpu(deadline, self.prepare_answer, question, filters, ranking)
+        except Exception as e:
+            yield "error", self._question_error(e)
+            return
+        if prepared is None:
+            yield "done", self._no_posts_answer()
+            return
+        
+        rows, summary = prepared["rows"], prepared["summary"]
+        metadata = await self._run_cpu(deadline, self._call_pinned, prepared["state"], self._answer_metadata,
+                                        rows, summary, prepared["context_rows"])
+        yield "meta", {**metadata, **prepared["details"]}
+        
+        parts = []
+        try:
+            messages = self._build_messages(question, prepared["context"], rows, estimates_ok, summary)
+            logger.debug(f"Streaming from OpenAI API with model: {self.model}")
+            stream = await self.async_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_completion_tokens=4000,
+                timeout=time_left(deadline, self.llm_timeout),
+                stream=True
+            )
+            try:
+                chunks = stream.__aiter__()
+                while True:
+                    try:
+                        chunk = await self._before_deadline(chunks.__anext__(), deadline, self.llm_timeout)
+                    except StopAsyncIteration:
+                        break
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        parts.append(delta)
+                        yield "delta", {"text": delta}
+            finally:
+                # Drops the HTTP connection if we stopped early (deadline, disconnect)
+                await stream.close()
+            
+            answer_text = "".join(parts)
+            answer = await self._run_cpu(deadline, self._call_pinned, prepared["state"], self._finalize_answer,
+                                        question, answer_text, rows, summary, prepared["context_rows"])
+        except asyncio.CancelledError:
+            logger.warning(f"🛑 Cancelled streaming question: {question[:50]}...")
+            raise
+        except Exception as e:
+            yield "error", self._answer_error(e, rows)
+            return
+        
+        yield "done", self._finish_answer(answer, prepared, start_time, "streamed")
+
 if __name__ == "__main__":
     agent = SageAgent("results/rpotential_filtered_focused_data.csv")
     result = agent.answer_ceo_question(
@@ -0,0 +1,614 @@
+#!/usr/bin/env python3
+"""
+Sage Answer Cache - pluggable answer cache backends
+MemoryAnswerCache: the in-process TTLCache the API has always used
+SQLiteAnswerCache: persistent SQLite store (WAL mode, shared by every worker
+on the host) with TTL and size-based eviction, zlib-compressed JSON values
+and an in-process LRU in front of it
+Every entry records the cache version (dataset fingerprint, prompt version,
+model) it was computed under, so a dataset swap can drop exactly the entries
+of other versions instead of flushing the cache
+Expired entries are kept for a grace window (get_stale) so the API can serve
+them while StaleRevalidator refreshes them in the background
+SemanticCacheIndex: question vectors of cached answers, so a paraphrased
+question can be served the answer cached for its nearest neighbour when both
+use the same question words, negation and comparisons
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from cachetools import LRUCache, TTLCache
+from loguru import logger
+from sage_retrieval import intent_words
+
+DEFAULT_TTL_SECONDS = 3600
+DEFAULT_MAXSIZE = 1000
+DEFAULT_MEMORY_SIZE = 256
+DEFAULT_STALE_GRACE_SECONDS = 86400
+DEFAULT_MAX_REFRESHES = 4
+
+
+def _json_default(value: Any):
+    """NumPy scalars/arrays in answer dicts serialize as plain numbers/lists"""
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
+
+
+def encode_answer(answer: Dict) -> bytes:
+    return zlib.compress(json.dumps(answer, default=_json_default).encode('utf-8'), 6)
+
+
+def decode_answer(blob: bytes) -> Dict:
+    return json.loads(zlib.decompress(blob).decode('utf-8'))
+
+
+class AnswerCache:
+    """Interface every answer cache backend implements
+
+    Keys are get_cache_key() strings and values are answer dicts. The mapping
+    operators are kept so the cache reads like the TTLCache it replaced.
+    version tags an entry with the cache version it was computed under (see
+    SageAgent.cache_version); invalidate_other_versions() drops the rest.
+    Entries expire after ttl but are kept grace seconds longer for get_stale().
+    Async handlers use the *_async variants, which keep disk I/O off the
+    event loop.
+    """
+
+    backend = "base"
+
+    def __init__(self, maxsize: int, ttl: float, grace: float = DEFAULT_STALE_GRACE_SECONDS):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.grace = grace
+        self.hits = 0
+        self.misses = 0
+        self.stale_hits = 0
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Unexpired answer for key"""
+        raise NotImplementedError
+
+    def get_stale(self, key: str) -> Optional[Dict]:
+        """Answer for key that expired less than grace seconds ago (call after get() missed)"""
+        raise NotImplementedError
+
+    def set(self, key: str, answer: Dict, version: str = ""):
+        raise NotImplementedError
+
+    def time_to_live(self, key: str) -> Optional[float]:
+        """Seconds until key's answer expires (negative once stale, None if absent); not counted as a lookup"""
+        raise NotImplementedError
+
+    def invalidate_other_versions(self, version: str) -> List[str]:
+        """Remove every entry not computed under version; returns the removed keys"""
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    async def get_async(self, key: str) -> Optional[Dict]:
+        return self.get(key)
+
+    async def get_stale_async(self, key: str) -> Optional[Dict]:
+        return self.get_stale(key)
+
+    async def set_async(self, key: str, answer: Dict, version: str = ""):
+        self.set(key, answer, version)
+
+    async def time_to_live_async(self, key: str) -> Optional[float]:
+        return self.time_to_live(key)
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    @property
+    def currsize(self) -> int:
+        return len(self)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __getitem__(self, key: str) -> Dict:
+        answer = self.get(key)
+        if answer is None:
+            raise KeyError(key)
+        return answer
+
+    def __setitem__(self, key: str, answer: Dict):
+        self.set(key, answer)
+
+    def _record(self, answer: Optional[Dict]) -> Optional[Dict]:
+        if answer is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return answer
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": self.backend,
+            "entries": len(self),
+            "maxsize": self.maxsize,
+            "ttl_seconds": self.ttl,
+            "stale_grace_seconds": self.grace,
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale_hits": self.stale_hits,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
+
+
+class MemoryAnswerCache(AnswerCache):
+    """Process-local TTL cache (lost on restart, not shared between workers)"""
+
+    backend = "memory"
+
+    def __init__(self, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL_SECONDS,
+                 grace: float = DEFAULT_STALE_GRACE_SECONDS):
+        super().__init__(maxsize, ttl, grace)
+        # Entries live through the grace window; freshness is checked against their own expiry
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl + grace)
+
+    def get(self, key: str) -> Optional[Dict]:
+        entry = self._cache.get(key)
+        if entry is None or entry[1] <= time.time():
+            return self._record(None)
+        return self._record(entry[2])
+
+    def get_stale(self, key: str) -> Optional[Dict]:
+        entry = self._cache.get(key)
+        if entry is None or entry[1] <= time.time() - self.grace:
+            return None
+        self.stale_hits += 1
+        return entry[2]
+
+    def set(self, key: str, answer: Dict, version: str = ""):
+        self._cache[key] = (version, time.time() + self.ttl, answer)
+
+    def time_to_live(self, key: str) -> Optional[float]:
+        entry = self._cache.get(key)
+        return entry[1] - time.time() if entry is not None else None
+
+    def invalidate_other_versions(self, version: str) -> List[str]:
+        removed = [key for key, entry in list(self._cache.items()) if entry[0] != version]
+        for key in removed:
+            self._cache.pop(key, None)
+        return removed
+
+    def delete(self, key: str):
+        self._cache.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+
+    def __len__(self) -> int:
+        now = time.time()
+        return sum(1 for entry in list(self._cache.values()) if entry[1] > now)
+
+
+class SQLiteAnswerCache(AnswerCache):
+    """Answers persisted in SQLite, fronted by a small in-process LRU
+
+    WAL mode lets every worker on the host read while one writes. Expired
+    rows are only served through get_stale() and are purged on write once
+    past the grace window; past maxsize the least recently used rows go. LRU
+    entries keep their expiry, so the front never outlives the TTL. The
+    *_async variants answer LRU hits inline and run SQLite work on a small
+    dedicated thread pool.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path: str, maxsize: int = DEFAULT_MAXSIZE, ttl: float = DEFAULT_TTL_SECONDS,
+                 memory_size: int = DEFAULT_MEMORY_SIZE, grace: float = DEFAULT_STALE_GRACE_SECONDS):
+        super().__init__(maxsize, ttl, grace)
+        self.path = path
+        self.memory_hits = 0
+        self._memory: LRUCache = LRUCache(maxsize=memory_size)
+        # _memory_lock guards the LRU front (used from the event loop and the I/O threads), _lock the connection
+        self._memory_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._io = ThreadPoolExecutor(max_workers=2, thread_name_prefix="sage-cache")
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                created_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                version TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(answers)")}
+        if "version" not in columns:
+            # Caches written before entries were versioned: their rows match no version
+            self._conn.execute("ALTER TABLE answers ADD COLUMN version TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_version ON answers (version)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_expires_at ON answers (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS answers_accessed_at ON answers (accessed_at)")
+        logger.info(f"💾 Answer cache at {path} ({len(self)} entries)")
+
+    def _memory_get(self, key: str, now: float) -> Optional[Dict]:
+        """Unexpired answer from the LRU front (counted as a hit), else None"""
+        with self._memory_lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            expires_at, answer = entry
+            if expires_at <= now:
+                self._memory.pop(key, None)
+                return None
+        self.memory_hits += 1
+        return self._record(answer)
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        answer = self._memory_get(key, now)
+        if answer is not None:
+            return answer
+
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM answers WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return self._record(None)
+            self._conn.execute("UPDATE answers SET accessed_at = ? WHERE key = ?", (now, key))
+        answer = decode_answer(row[0])
+        with self._memory_lock:
+            self._memory[key] = (row[1], answer)
+        return self._record(answer)
+
+    def get_stale(self, key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM answers WHERE key = ? AND expires_at > ?", (key, time.time() - self.grace)
+            ).fetchone()
+        if row is None:
+            return None
+        self.stale_hits += 1
+        return decode_answer(row[0])
+
+    def time_to_live(self, key: str) -> Optional[float]:
+        with self._lock:
+            row = self._conn.execute("SELECT expires_at FROM answers WHERE key = ?", (key,)).fetchone()
+        return row[0] - time.time() if row is not None else None
+
+    def set(self, key: str, answer: Dict, version: str = ""):
+        now = time.time()
+        expires_at = now + self.ttl
+        blob = encode_answer(answer)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO answers (key, value, created_at, expires_at, accessed_at, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, blob, now, expires_at, now, version)
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        with self._memory_lock:
+            self._memory[key] = (expires_at, answer)
+
+    def _evict(self, now: float):
+        """Drop rows past their grace window, then the least recently used beyond maxsize (inside the write transaction)"""
+        self._conn.execute("DELETE FROM answers WHERE expires_at <= ?", (now - self.grace,))
+        self._conn.execute(
+            "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.maxsize,)
+        )
+
+    def invalidate_other_versions(self, version: str) -> List[str]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                removed = [row[0] for row in self._conn.execute(
+                    "SELECT key FROM answers WHERE version != ?", (version,)
+                )]
+                self._conn.execute("DELETE FROM answers WHERE version != ?", (version,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        with self._memory_lock:
+            for key in removed:
+                self._memory.pop(key, None)
+        return removed
+
+    def delete(self, key: str):
+        with self._memory_lock:
+            self._memory.pop(key, None)
+        with self._lock:
+            self._conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._memory_lock:
+            self._memory.clear()
+        with self._lock:
+            self._conn.execute("DELETE FROM answers")
+
+    async def _run_io(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._io, func, *args)
+
+    async def get_async(self, key: str) -> Optional[Dict]:
+        answer = self._memory_get(key, time.time())
+        if answer is not None:
+            return answer
+        return await self._run_io(self.get, key)
+
+    async def get_stale_async(self, key: str) -> Optional[Dict]:
+        return await self._run_io(self.get_stale, key)
+
+    async def set_async(self, key: str, answer: Dict, version: str = ""):
+        await self._run_io(self.set, key, answer, version)
+
+    async def time_to_live_async(self, key: str) -> Optional[float]:
+        return await self._run_io(self.time_to_live, key)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers WHERE expires_at > ?", (time.time(),)).fetchone()[0]
+
+    def stats(self) -> Dict:
+        stats = super().stats()
+        stats.update({"path": self.path, "memory_hits": self.memory_hits, "memory_entries": len(self._memory)})
+        return stats
+
+
+DEFAULT_SEMANTIC_THRESHOLD = 0.92
+
+
+class SemanticCacheIndex:
+    """Nearest-neighbour lookup over the questions of cached answers
+
+    Each entry is (cache key, scope, question, unit vector). A lookup only
+    considers entries with the same scope (estimates flag, filters, ranking,
+    dataset version, ...) and the same question words, negation and
+    comparisons (see sage_retrieval.intent_words), which the vectors do not
+    see; it is one matrix-vector product over them. With a
+    path, entries are persisted in SQLite and rows added by other workers are
+    picked up on the next lookup.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_SEMANTIC_THRESHOLD, maxsize: int = DEFAULT_MAXSIZE,
+                 path: Optional[str] = None):
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._keys: List[str] = []
+        self._scopes: List[str] = []
+        self._questions: List[str] = []
+        self._intents: List[frozenset] = []
+        self._vectors = np.zeros((0, 0), dtype=np.float32)
+        self._last_id = 0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS question_vectors (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    key TEXT NOT NULL,
+                    scope TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            self._sync()
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def _append(self, key: str, scope: str, question: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32).reshape(1, -1)
+        if self._vectors.shape[1] != vector.shape[1]:
+            # Embedding space changed (e.g. index rebuilt with other dimensions): old entries are unusable
+            self._keys, self._scopes, self._questions, self._intents = [], [], [], []
+            self._vectors = np.zeros((0, vector.shape[1]), dtype=np.float32)
+        if key in self._keys:
+            i = self._keys.index(key)
+            self._scopes[i], self._questions[i], self._vectors[i] = scope, question, vector[0]
+            self._intents[i] = intent_words(question)
+            return
+        self._keys.append(key)
+        self._scopes.append(scope)
+        self._questions.append(question)
+        self._intents.append(intent_words(question))
+        self._vectors = np.vstack([self._vectors, vector])
+        if len(self._keys) > self.maxsize:
+            drop = len(self._keys) - self.maxsize
+            del self._keys[:drop], self._scopes[:drop], self._questions[:drop], self._intents[:drop]
+            self._vectors = self._vectors[drop:]
+
+    def _sync(self):
+        """Load rows added since the last sync (by this or another worker)"""
+        if self._conn is None:
+            return
+        rows = self._conn.execute(
+            "SELECT id, key, scope, question, vector FROM question_vectors WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for row_id, key, scope, question, blob in rows:
+            self._append(key, scope, question, np.frombuffer(blob, dtype=np.float32))
+            self._last_id = row_id
+
+    def add(self, key: str, scope: str, question: str, vector: np.ndarray):
+        vector = np.asarray(vector, dtype=np.float32)
+        if not np.any(vector):
+            return
+        with self._lock:
+            if self._conn is None:
+                self._append(key, scope, question, vector)
+                return
+            self._conn.execute(
+                "INSERT INTO question_vectors (key, scope, question, vector, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, scope, question, vector.tobytes(), time.time())
+            )
+            # Keep the table bounded like the answer cache it indexes
+            self._conn.execute(
+                "DELETE FROM question_vectors WHERE id IN (SELECT id FROM question_vectors ORDER BY id DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+            self._sync()
+
+    def match(self, vector: np.ndarray, scope: str, question: str) -> Optional[Tuple[str, float, str]]:
+        """(cache key, similarity, cached question) of the nearest same-scope question above threshold
+        whose question words, negation and comparisons are exactly those of question"""
+        vector = np.asarray(vector, dtype=np.float32)
+        intent = intent_words(question)
+        with self._lock:
+            self._sync()
+            if not len(self._keys) or not np.any(vector) or self._vectors.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+            similarities = self._vectors @ vector
+            similarities[np.asarray(self._scopes) != scope] = -1.0
+            similarities[[i for i, other in enumerate(self._intents) if other != intent]] = -1.0
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return self._keys[best], float(similarities[best]), self._questions[best]
+
+    def discard(self, *keys: str):
+        """Forget questions whose answers are no longer cached"""
+        gone = set(keys)
+        with self._lock:
+            keep = [i for i, key in enumerate(self._keys) if key not in gone]
+            if len(keep) < len(self._keys):
+                self._keys = [self._keys[i] for i in keep]
+                self._scopes = [self._scopes[i] for i in keep]
+                self._questions = [self._questions[i] for i in keep]
+                self._intents = [self._intents[i] for i in keep]
+                self._vectors = self._vectors[keep]
+            if self._conn is not None:
+                self._conn.executemany("DELETE FROM question_vectors WHERE key = ?", [(key,) for key in gone])
+
+    def stats(self) -> Dict:
+        return {"entries": len(self), "threshold": self.threshold, "hits": self.hits, "misses": self.misses}
+
+
+class StaleRevalidator:
+    """Background refreshes of stale answers: one per key, at most max_concurrent at a time
+
+    Refreshes beyond the cap are skipped (the stale answer is still served and
+    the next stale serve tries again), so a burst of expiries cannot flood
+    the model with requests.
+    """
+
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_REFRESHES):
+        self.max_concurrent = max_concurrent
+        self.started = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def schedule(self, key: str, refresh: Callable[[], Awaitable[Any]]) -> bool:
+        """Start refresh() for key unless it is already refreshing or the cap is reached"""
+        if key in self._tasks:
+            return False
+        if len(self._tasks) >= self.max_concurrent:
+            self.skipped += 1
+            logger.warning(f"⚠️ Refresh cap ({self.max_concurrent}) reached, not refreshing {key[:12]}")
+            return False
+        self.started += 1
+        self._tasks[key] = asyncio.ensure_future(self._run(key, refresh))
+        return True
+
+    async def _run(self, key: str, refresh: Callable[[], Awaitable[Any]]):
+        try:
+            await refresh()
+            self.completed += 1
+            logger.info(f"♻️ Refreshed stale answer {key[:12]}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"❌ Refreshing stale answer {key[:12]} failed: {str(e)}")
+        finally:
+            self._tasks.pop(key, None)
+
+    def stats(self) -> Dict:
+        return {
+            "in_progress": len(self),
+            "max_concurrent": self.max_concurrent,
+            "started": self.started,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped_at_cap": self.skipped,
+        }
+
+
+def create_semantic_index(cache: AnswerCache) -> Optional[SemanticCacheIndex]:
+    """Semantic tier configured from the environment (SEMANTIC_CACHE, SEMANTIC_CACHE_THRESHOLD)
+
+    Persisted beside the SQLite answer cache when that is the backend.
+    """
+    if os.getenv("SEMANTIC_CACHE", "true").lower() not in ("1", "true", "yes"):
+        return None
+    threshold = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", str(DEFAULT_SEMANTIC_THRESHOLD)))
+    path = cache.path if isinstance(cache, SQLiteAnswerCache) else None
+    try:
+        return SemanticCacheIndex(threshold=threshold, maxsize=cache.maxsize, path=path)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not open semantic cache index ({str(e)}), keeping it in memory")
+        return SemanticCacheIndex(threshold=threshold, maxsize=cache.maxsize)
+
+
+def create_answer_cache() -> AnswerCache:
+    """Answer cache configured from the environment
+
+    ANSWER_CACHE_BACKEND: sqlite (default) or memory
+    ANSWER_CACHE_PATH, ANSWER_CACHE_TTL, ANSWER_CACHE_MAXSIZE, ANSWER_CACHE_MEMORY_SIZE,
+    ANSWER_CACHE_STALE_GRACE (seconds an expired answer may still be served stale; 0 disables)
+    Falls back to memory if the SQLite file cannot be opened (e.g. read-only disk).
+    """
+    backend = os.getenv("ANSWER_CACHE_BACKEND", "sqlite").lower()
+    ttl = float(os.getenv("ANSWER_CACHE_TTL", str(DEFAULT_TTL_SECONDS)))
+    maxsize = int(os.getenv("ANSWER_CACHE_MAXSIZE", str(DEFAULT_MAXSIZE)))
+    grace = float(os.getenv("ANSWER_CACHE_STALE_GRACE", str(DEFAULT_STALE_GRACE_SECONDS)))
+    if backend == "sqlite":
+        path = os.getenv("ANSWER_CACHE_PATH", "cache/answers.sqlite3")
+        try:
+            return SQLiteAnswerCache(path, maxsize=maxsize, ttl=ttl, grace=grace,
+                                     memory_size=int(os.getenv("ANSWER_CACHE_MEMORY_SIZE", str(DEFAULT_MEMORY_SIZE))))
+        except Exception as e:
+            logger.warning(f"⚠️ Could not open answer cache at {path} ({str(e)}), using in-memory cache")
+    elif backend != "memory":
+        logger.warning(f"⚠️ Unknown ANSWER_CACHE_BACKEND '{backend}', using in-memory cache")
+    return MemoryAnswerCache(maxsize=maxsize, ttl=ttl, grace=grace)
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Sage Context - prompt context assembly for the Sage agent
+Per-post context blocks are rendered once at load into string arrays indexed
+by row, so building a prompt is a join over the selected rows
+Token-budget packer: fills a configurable token budget greedily by value per
+token, using a calibrated local token estimator; block token counts are
+persisted beside the dataset snapshot
+"""
+
+import pandas as pd
+import numpy as np
+import re
+from typing import Tuple
+from loguru import logger
+from datetime import datetime
+from sage_data import load_arrays, save_arrays
+
+# Truncation limits for the rendered post blocks (characters)
+BODY_CHARS = 300
+SIGNAL_CHARS = 200
+ENTITY_CHARS = 100
+TAG_CHARS = 200
+COMMENT_CHARS = 150
+TOP_COMMENTS = 3
+
+# Bump when the rendered blocks or estimate_tokens change so persisted token counts get recomputed
+TOKEN_COUNTS_FORMAT_VERSION = 1
+
+
+def _text(value, default: str = '') -> str:
+    """Column value as display text; NaN/None/empty become the default"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return default
+    text = str(value)
+    return text if text and text != 'nan' else default
+
+
+def _column(posts: pd.DataFrame, name: str) -> list:
+    return posts[name].tolist() if name in posts.columns else [None] * len(posts)
+
+
+def render_post_fragments(posts: pd.DataFrame, comments: pd.DataFrame, offsets: np.ndarray,
+                          top_comments: int = TOP_COMMENTS) -> Tuple[np.ndarray, np.ndarray]:
+    """Render every post's context block once
+
+    Returns (post_blocks, comment_blocks), object arrays indexed by row. A post
+    block starts right after the "[POST n] " prefix, which depends on the
+    post's position in a given prompt and is added at join time. A comment
+    block is empty or starts with a newline, so post + comment concatenate.
+    """
+    start_time = datetime.now()
+    num_posts = len(posts)
+    post_blocks = np.empty(num_posts, dtype=object)
+    comment_blocks = np.empty(num_posts, dtype=object)
+
+    columns = zip(
+        _column(posts, 'url'), _column(posts, 'title'), _column(posts, 'body'),
+        _column(posts, 'username'), _column(posts, 'subreddit'), _column(posts, 'created_display'),
+        _column(posts, 'ceo_question_category'), _column(posts, 'strategic_signal'),
+        _column(posts, 'confidence_level'), _column(posts, 'sentiment'), _column(posts, 'actionability'),
+        _column(posts, 'temporal_context'), _column(posts, 'companies_mentioned'),
+        _column(posts, 'products_mentioned'), _column(posts, 'roles_mentioned'), _column(posts, 'tags'),
+        _column(posts, 'relevance_score'), _column(posts, 'relevance_category'), _column(posts, 'also_posted_in'),
+    )
+    for row, (url, title, body, username, subreddit, post_date, ceo_cat, strategic_signal, confidence,
+              sentiment, actionability, temporal, companies, products, roles, tags,
+              relevance_score, relevance_cat, also_posted_in) in enumerate(columns):
+        body = _text(body)[:BODY_CHARS]
+        strategic_signal = _text(strategic_signal)[:SIGNAL_CHARS]
+        companies, products, roles = _text(companies), _text(products), _text(roles)
+        tags = _text(tags)[:TAG_CHARS]
+        score = pd.to_numeric(relevance_score, errors='coerce')
+
+        # Build enriched post entry with date
+        lines = [
+            f"r/{_text(subreddit, 'unknown')} by u/{_text(username, 'Unknown')} | Posted: {_text(post_date, 'Date unavailable')} | {_text(confidence, 'UNKNOWN')} confidence | {_text(actionability)}",
+            f"  URL: {_text(url, 'N/A')}",
+            f"  TITLE: {_text(title)}",
+        ]
+        if _text(also_posted_in):
+            lines.append(f"  🔁 Also posted in: {_text(also_posted_in)}")
+        if body:
+            lines.append(f"  TEXT: {body}")
+
+        # ENRICHMENT METADATA (THIS IS THE MAGIC!)
+        if strategic_signal:
+            lines.append(f"  🎯 SIGNAL: {strategic_signal}")
+        lines.append(f"  📊 Category: {_text(ceo_cat)} | Sentiment: {_text(sentiment)} | Temporal: {_text(temporal)}")
+        lines.append(f"  💼 Relevance: {_text(relevance_cat)} (score: {0.0 if pd.isna(score) else float(score):.2f})")
+        if companies:
+            lines.append(f"  🏢 Companies: {companies[:ENTITY_CHARS]}")
+        if products:
+            lines.append(f"  ⚙️  Products: {products[:ENTITY_CHARS]}")
+        if roles:
+            lines.append(f"  👥 Roles: {roles[:ENTITY_CHARS]}")
+        if tags:
+            lines.append(f"  #️⃣  Tags: {tags}")
+        post_blocks[row] = "\n".join(lines)
+        comment_blocks[row] = ''
+
+    # Top comments come pre-sorted by score, so each post's top-N is a slice
+    authors = comments['author'].tolist()
+    scores = comments['score'].tolist()
+    bodies = comments['body'].tolist()
+    dates = comments['created_display'].tolist()
+    for row in np.flatnonzero(np.diff(offsets) > 0):
+        start, end = offsets[row], offsets[row + 1]
+        lines = [f"  💬 TOP COMMENTS ({end - start} total):"]
+        for c_idx, i in enumerate(range(start, min(end, start + top_comments)), 1):
+            lines.append(f"      [{c_idx}] u/{authors[i]} ({scores[i]}↑) on {dates[i]}: {bodies[i][:COMMENT_CHARS]}")
+        comment_blocks[row] = "\n" + "\n".join(lines)
+
+    duration = (datetime.now() - start_time).total_seconds()
+    logger.info(f"🧩 Rendered {num_posts} post context blocks in {duration:.2f}s")
+    return post_blocks, comment_blocks
+
+
+# Pieces a BPE tokenizer rarely merges across: letter runs, short digit runs, single symbols
+TOKEN_PIECE = re.compile(r"[A-Za-z]+|[0-9]{1,3}|[^\sA-Za-z0-9]")
+
+# Confidence levels as value multipliers when packing
+CONFIDENCE_WEIGHTS = {"HIGH": 1.0, "MEDIUM": 0.6, "LOW": 0.3}
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate o-series (o200k BPE) token count without a tokenizer
+
+    Calibrated on English Reddit text: common words are one token, long words
+    add one per ~7 letters, digits go in groups of three, each ASCII symbol is
+    one token and non-ASCII symbols (emoji, arrows) about one per two bytes.
+    """
+    if not text:
+        return 0
+    tokens = 0
+    for piece in TOKEN_PIECE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += 1 + (len(piece) - 1) // 7
+        elif first.isascii():
+            tokens += 1
+        else:
+            tokens += max(1, len(piece.encode('utf-8')) // 2)
+    return tokens
+
+
+def block_token_counts(blocks: np.ndarray) -> np.ndarray:
+    """Token estimates for an array of rendered blocks (computed once at load)"""
+    return np.fromiter((estimate_tokens(b) for b in blocks), dtype=np.int32, count=len(blocks))
+
+
+def load_or_build_token_counts(post_blocks: np.ndarray, comment_blocks: np.ndarray, base_path: str,
+                               fingerprint: str, rebuild: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """Token estimates of the post and comment blocks, reused for this dataset fingerprint or counted (and saved)"""
+    path = f"{base_path}.tokens.npz"
+    stored = None if rebuild else load_arrays(path, TOKEN_COUNTS_FORMAT_VERSION, fingerprint)
+    if stored is not None and len(stored["post_tokens"]) == len(post_blocks):
+        return stored["post_tokens"], stored["comment_tokens"]
+
+    start_time = datetime.now()
+    post_tokens = block_token_counts(post_blocks)
+    comment_tokens = block_token_counts(comment_blocks)
+    duration = (datetime.now() - start_time).total_seconds()
+    logger.info(f"🧮 Counted tokens of {len(post_blocks)} post blocks in {duration:.2f}s")
+    save_arrays(path, {"post_tokens": post_tokens, "comment_tokens": comment_tokens},
+                TOKEN_COUNTS_FORMAT_VERSION, fingerprint)
+    return post_tokens, comment_tokens
+
+
+def pack_posts(rows: np.ndarray, values: np.ndarray, post_tokens: np.ndarray, comment_tokens: np.ndarray,
+               budget: int, max_posts: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Choose which candidate posts (and their comments) fit the token budget
+
+    Greedy by value per token: each candidate is taken with its comments if
+    that fits, otherwise as the post block alone. Returns (selected rows in
+    their original candidate order, per-selected-row "with comments" flags).
+    """
+    if len(rows) == 0 or budget <= 0 or max_posts <= 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=bool)
+
+    # "\n[POST n] " prefix and the joining newline
+    prefix_tokens = 6
+    full_cost = post_tokens[rows] + comment_tokens[rows] + prefix_tokens
+    post_cost = post_tokens[rows] + prefix_tokens
+    density = values / np.maximum(full_cost, 1)
+    order = np.argsort(-density, kind='stable')
+
+    chosen = np.zeros(len(rows), dtype=bool)
+    with_comments = np.zeros(len(rows), dtype=bool)
+    remaining = budget
+    taken = 0
+    for i in order:
+        if taken >= max_posts or remaining < prefix_tokens:
+            break
+        if full_cost[i] <= remaining:
+            chosen[i] = with_comments[i] = True
+            remaining -= full_cost[i]
+        elif post_cost[i] <= remaining:
+            chosen[i] = True
+            remaining -= post_cost[i]
+        else:
+            continue
+        taken += 1
+    return rows[chosen], with_comments[chosen]
+
+
+def candidate_values(rows: np.ndarray, relevance: np.ndarray, confidence_weights: np.ndarray) -> np.ndarray:
+    """Marginal value of each candidate: retrieval rank discount × relevance × confidence"""
+    rank_discount = 1.0 / np.log2(np.arange(len(rows)) + 2)
+    relevance_weight = 0.2 + 0.8 * np.clip(relevance[rows] / 5.0, 0.0, 1.0)
+    return rank_discount * relevance_weight * confidence_weights[rows]
+
+
+def confidence_weight_array(posts: pd.DataFrame) -> np.ndarray:
+    """Per-row confidence multiplier; unknown levels get 0.5"""
+    levels = posts['confidence_level'] if 'confidence_level' in posts.columns else pd.Series([None] * len(posts))
+    return levels.map(CONFIDENCE_WEIGHTS).fillna(0.5).to_numpy(dtype=np.float32)
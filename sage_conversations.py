@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Sage Conversations - SQLite store for chat history
+One row per conversation and one per message, so saving a turn writes only
+the new messages of that conversation (not every conversation ever saved),
+in a single transaction. Replaces the conversations.json whole-file rewrite;
+an existing conversations.json is imported when the store is first created.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+from loguru import logger
+
+LEGACY_CONVERSATIONS_FILE = "conversations.json"
+
+
+class ConversationStore:
+    """Conversations as {id: {...metadata, "messages": [...]}}, the shape the chat UI uses
+
+    Saving a conversation that extends the stored one inserts only the new
+    messages. Each conversation keeps a running hash of its stored messages;
+    if the saved list no longer starts with them (an earlier message was
+    edited, or the list was truncated) the conversation is rewritten.
+    """
+
+    def __init__(self, path: str, legacy_file: Optional[str] = LEGACY_CONVERSATIONS_FILE):
+        self.path = path
+        created = not os.path.exists(path)
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                id TEXT PRIMARY KEY,
+                metadata TEXT NOT NULL,
+                message_count INTEGER NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL,
+                messages_hash TEXT NOT NULL DEFAULT ''
+            )
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(conversations)")}
+        if "messages_hash" not in columns:
+            # Stores written before hashing: the first save of each conversation rewrites it
+            self._conn.execute("ALTER TABLE conversations ADD COLUMN messages_hash TEXT NOT NULL DEFAULT ''")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS messages (
+                conversation_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                message TEXT NOT NULL,
+                PRIMARY KEY (conversation_id, seq)
+            )
+        """)
+        if created and legacy_file and os.path.exists(legacy_file):
+            self._import_legacy(legacy_file)
+        logger.info(f"💬 Conversation store at {path} ({len(self)} conversations)")
+
+    def _import_legacy(self, legacy_file: str):
+        try:
+            with open(legacy_file, 'r') as f:
+                conversations = json.load(f)
+            for conversation_id, conversation in conversations.items():
+                self.save(conversation_id, conversation)
+            logger.info(f"📥 Imported {len(conversations)} conversations from {legacy_file}")
+        except Exception as e:
+            logger.error(f"❌ Could not import {legacy_file}: {str(e)}")
+
+    @staticmethod
+    def _running_hashes(messages: List) -> List[str]:
+        """Hash of messages[:n] for every n from 0 to len(messages)"""
+        digest = ""
+        hashes = [digest]
+        for message in messages:
+            digest = hashlib.sha256((digest + json.dumps(message, sort_keys=True)).encode('utf-8')).hexdigest()
+            hashes.append(digest)
+        return hashes
+
+    def save(self, conversation_id: str, conversation: Dict):
+        """Store a conversation, writing only messages not stored yet unless the stored ones changed"""
+        messages: List = conversation.get('messages') or []
+        metadata = {k: v for k, v in conversation.items() if k != 'messages'}
+        hashes = self._running_hashes(messages)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT message_count, messages_hash FROM conversations WHERE id = ?", (conversation_id,)
+                ).fetchone()
+                stored, stored_hash = row if row is not None else (0, "")
+                if stored > len(messages) or hashes[stored] != stored_hash:
+                    # The saved list does not extend what is stored: replace the conversation's messages
+                    logger.info(f"✏️ Conversation {conversation_id} changed before message {stored}, rewriting it")
+                    self._conn.execute("DELETE FROM messages WHERE conversation_id = ?", (conversation_id,))
+                    stored = 0
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO messages (conversation_id, seq, message) VALUES (?, ?, ?)",
+                    [(conversation_id, seq, json.dumps(messages[seq])) for seq in range(stored, len(messages))]
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO conversations (id, metadata, message_count, updated_at, messages_hash) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (conversation_id, json.dumps(metadata), len(messages), time.time(), hashes[-1])
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get(self, conversation_id: str) -> Dict:
+        """One conversation (empty dict if unknown)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT metadata FROM conversations WHERE id = ?", (conversation_id,)
+            ).fetchone()
+            if row is None:
+                return {}
+            messages = self._conn.execute(
+                "SELECT message FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+            ).fetchall()
+        return {**json.loads(row[0]), "messages": [json.loads(m[0]) for m in messages]}
+
+    def all(self) -> Dict[str, Dict]:
+        """Every conversation, most recently updated first"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, metadata FROM conversations ORDER BY updated_at DESC").fetchall()
+            messages = self._conn.execute(
+                "SELECT conversation_id, message FROM messages ORDER BY conversation_id, seq"
+            ).fetchall()
+        conversations = {conversation_id: {**json.loads(metadata), "messages": []} for conversation_id, metadata in rows}
+        for conversation_id, message in messages:
+            if conversation_id in conversations:
+                conversations[conversation_id]["messages"].append(json.loads(message))
+        return conversations
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def create_conversation_store() -> ConversationStore:
+    """Conversation store at CONVERSATIONS_DB (default conversations.sqlite3)
+
+    Falls back to an in-memory store if the file cannot be opened (e.g. read-only disk).
+    """
+    path = os.getenv("CONVERSATIONS_DB", "conversations.sqlite3")
+    try:
+        return ConversationStore(path)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not open conversation store at {path} ({str(e)}), keeping conversations in memory")
+        return ConversationStore(":memory:", legacy_file=None)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Sage Data Layer - dataset loading and ingest for the Sage agent
+Converts the enriched posts CSV into a typed columnar snapshot (Feather) once
+and reloads that on later starts, rebuilding it when the CSV changes
+Ingest explodes the per-post comment JSON into a normalized comments table
+and normalizes created_at to UTC datetime64 with pre-formatted display dates
+Near-duplicates and cross-posts are clustered with MinHash/LSH over title+body;
+each cluster keeps one representative that lists where the others were posted
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import re
+import sys
+import zlib
+import traceback
+from typing import Dict, Optional, Tuple
+from loguru import logger
+from datetime import datetime
+
+# Bump when the ingest output changes shape so stale snapshots get rebuilt
+SNAPSHOT_FORMAT_VERSION = 5
+
+HASH_CHUNK_SIZE = 4 * 1024 * 1024
+
+# MinHash/LSH near-duplicate detection: 16 bands x 4 rows catches pairs above
+# ~0.5 Jaccard as candidates; candidates are kept at >= 0.8 estimated Jaccard
+MINHASH_PERMUTATIONS = 64
+LSH_BANDS = 16
+NEAR_DUPLICATE_THRESHOLD = 0.8
+SHINGLE_WORDS = 3
+# Texts shorter than this (in words) are too generic to call duplicates
+MIN_DUPLICATE_WORDS = 5
+MINHASH_PRIME = np.uint64(4294967311)
+
+
+class DatasetSnapshot:
+    """Feather snapshot of a source CSV, keyed on the CSV's size, mtime and SHA-256"""
+
+    def __init__(self, source_path: str, snapshot_dir: Optional[str] = None):
+        self.source_path = source_path
+        if snapshot_dir is None:
+            snapshot_dir = os.getenv("SNAPSHOT_DIR") or os.path.dirname(os.path.abspath(source_path))
+        self.snapshot_dir = snapshot_dir
+        self.base_name = os.path.splitext(os.path.basename(source_path))[0]
+        self.manifest_path = os.path.join(snapshot_dir, f"{self.base_name}.snapshot.json")
+        self._source_hash: Optional[str] = None
+
+    @property
+    def artifact_base(self) -> str:
+        """Path prefix for other derived files (e.g. indexes) stored beside the snapshot"""
+        return os.path.join(self.snapshot_dir, self.base_name)
+
+    def table_path(self, name: str) -> str:
+        """Path of the Feather file holding one snapshot table"""
+        return os.path.join(self.snapshot_dir, f"{self.base_name}.{name}.feather")
+
+    def source_stat(self) -> Dict:
+        """Cheap identity of the source file (size + mtime)"""
+        stat = os.stat(self.source_path)
+        return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+    @property
+    def source_hash(self) -> str:
+        """SHA-256 of the source file, computed at most once per instance"""
+        if self._source_hash is None:
+            digest = hashlib.sha256()
+            with open(self.source_path, 'rb') as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+            self._source_hash = digest.hexdigest()
+        return self._source_hash
+
+    def _read_manifest(self) -> Optional[Dict]:
+        if not os.path.exists(self.manifest_path):
+            return None
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Unreadable snapshot manifest {self.manifest_path}: {str(e)}")
+            return None
+
+    def _write_manifest(self, manifest: Dict):
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _is_current(self, manifest: Dict) -> bool:
+        """Size/mtime match is trusted; otherwise fall back to the content hash
+        (a fresh checkout or copy changes mtime without changing the data)"""
+        if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            return False
+        stat = self.source_stat()
+        if manifest.get("size") != stat["size"]:
+            return False
+        if manifest.get("mtime_ns") == stat["mtime_ns"]:
+            self._source_hash = manifest.get("sha256")
+            return True
+        if manifest.get("sha256") != self.source_hash:
+            return False
+        try:
+            manifest["mtime_ns"] = stat["mtime_ns"]
+            self._write_manifest(manifest)
+        except OSError:
+            pass
+        return True
+
+    def load(self) -> Optional[Dict[str, pd.DataFrame]]:
+        """Load all snapshot tables, or None if the snapshot is missing or stale"""
+        manifest = self._read_manifest()
+        if manifest is None or not self._is_current(manifest):
+            return None
+        try:
+            return {
+                name: pd.read_feather(self.table_path(name))
+                for name in manifest.get("tables", [])
+            }
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to read snapshot, rebuilding: {str(e)}")
+            return None
+
+    def save(self, tables: Dict[str, pd.DataFrame]) -> bool:
+        """Write all tables plus the manifest; failures are logged, not raised"""
+        try:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            for name, table in tables.items():
+                tmp_path = f"{self.table_path(name)}.tmp"
+                table.reset_index(drop=True).to_feather(tmp_path)
+                os.replace(tmp_path, self.table_path(name))
+            stat = self.source_stat()
+            self._write_manifest({
+                "format_version": SNAPSHOT_FORMAT_VERSION,
+                "source": os.path.basename(self.source_path),
+                "size": stat["size"],
+                "mtime_ns": stat["mtime_ns"],
+                "sha256": self.source_hash,
+                "tables": list(tables.keys()),
+                "created_at": datetime.now().isoformat()
+            })
+            logger.info(f"💾 Wrote dataset snapshot to {self.manifest_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write dataset snapshot ({str(e)}), continuing without it")
+            return False
+
+
+def save_arrays(path: str, arrays: Dict[str, np.ndarray], format_version: int, fingerprint: str) -> bool:
+    """Persist arrays derived from a snapshot (.npz) with the versions and dataset
+    fingerprint they were built under; failures are logged, not raised"""
+    try:
+        info = {"format_version": format_version, "snapshot_format_version": SNAPSHOT_FORMAT_VERSION,
+                "fingerprint": fingerprint}
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, info=np.array(json.dumps(info)), **arrays)
+        os.replace(tmp_path, path)
+        logger.info(f"💾 Wrote {path}")
+        return True
+    except Exception as e:
+        logger.warning(f"⚠️ Could not write {path} ({str(e)}), continuing without it")
+        return False
+
+
+def load_arrays(path: str, format_version: int, fingerprint: str) -> Optional[Dict[str, np.ndarray]]:
+    """Arrays written by save_arrays, or None if missing, unreadable or built under
+    another format version or from other data"""
+    if not os.path.exists(path):
+        return None
+    try:
+        with np.load(path) as stored:
+            info = json.loads(str(stored["info"]))
+            if (info.get("format_version") != format_version
+                    or info.get("snapshot_format_version") != SNAPSHOT_FORMAT_VERSION
+                    or info.get("fingerprint") != fingerprint):
+                logger.info(f"♻️ {os.path.basename(path)} is stale, rebuilding")
+                return None
+            return {name: stored[name] for name in stored.files if name != "info"}
+    except Exception as e:
+        logger.warning(f"⚠️ Failed to read {path}, rebuilding: {str(e)}")
+        return None
+
+
+def build_comments_table(posts: pd.DataFrame) -> pd.DataFrame:
+    """Explode all_scraped_comments_json into one row per comment
+
+    Rows are ordered by post_row, then score descending, so the top-N comments
+    of a post are a contiguous slice (see comment_offsets)
+    """
+    post_rows, post_ids, authors, scores, bodies, created = [], [], [], [], [], []
+
+    blobs = posts['all_scraped_comments_json'] if 'all_scraped_comments_json' in posts.columns else pd.Series([], dtype=object)
+    ids = posts['post_id'] if 'post_id' in posts.columns else pd.Series([None] * len(posts))
+    for row, (blob, post_id) in enumerate(zip(blobs, ids)):
+        if not isinstance(blob, str) or not blob:
+            continue
+        try:
+            comments_data = json.loads(blob)
+        except ValueError:
+            continue
+        if not isinstance(comments_data, list):
+            continue
+        for comment in comments_data:
+            if not isinstance(comment, dict):
+                continue
+            post_rows.append(row)
+            post_ids.append(post_id)
+            authors.append(comment.get('author'))
+            scores.append(comment.get('score', 0))
+            bodies.append(comment.get('body', ''))
+            created.append(comment.get('created_utc') or comment.get('publishingDate'))
+
+    comments = pd.DataFrame({
+        'post_row': np.asarray(post_rows, dtype=np.int32),
+        'post_id': pd.Series(post_ids, dtype=object).astype(str),
+        'author': pd.Series(authors, dtype=object).fillna('Unknown').astype(str),
+        'score': pd.to_numeric(pd.Series(scores, dtype=object), errors='coerce').fillna(0).astype(np.int64),
+        'body': pd.Series(bodies, dtype=object).fillna('').astype(str),
+        'created': _parse_comment_timestamps(pd.Series(created, dtype=object)),
+    })
+    comments['created_display'] = comments['created'].dt.strftime('%B %d, %Y').fillna("Date unavailable")
+
+    order = np.lexsort((-comments['score'].to_numpy(), comments['post_row'].to_numpy()))
+    return comments.iloc[order].reset_index(drop=True)
+
+
+def _parse_comment_timestamps(values: pd.Series) -> pd.Series:
+    """Comments carry either epoch seconds (created_utc) or date strings (publishingDate)"""
+    numeric = pd.to_numeric(values, errors='coerce')
+    parsed = pd.to_datetime(numeric, unit='s', errors='coerce', utc=True)
+    is_text = numeric.isna() & values.notna()
+    if is_text.any():
+        parsed[is_text] = pd.to_datetime(values[is_text].astype(str), errors='coerce', utc=True, format='mixed')
+    return parsed
+
+
+def comment_offsets(comments: pd.DataFrame, num_posts: int) -> np.ndarray:
+    """Offsets into the sorted comments table: post row r owns [offsets[r], offsets[r + 1])"""
+    return np.searchsorted(comments['post_row'].to_numpy(), np.arange(num_posts + 1), side='left')
+
+
+def minhash_signatures(texts: pd.Series, num_perm: int = MINHASH_PERMUTATIONS, seed: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """MinHash signatures over word shingles
+
+    Returns (signatures [n x num_perm] uint64, has_signature mask). Texts with
+    fewer than MIN_DUPLICATE_WORDS words get no signature.
+    """
+    doc_ids, shingle_hashes = [], []
+    for doc, text in enumerate(texts):
+        words = re.findall(r"[a-z0-9]+", text.lower()) if isinstance(text, str) else []
+        if len(words) < MIN_DUPLICATE_WORDS:
+            continue
+        shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+        shingle_hashes.extend(zlib.crc32(s.encode('utf-8')) for s in shingles)
+        doc_ids.extend([doc] * len(shingles))
+
+    num_docs = len(texts)
+    signatures = np.full((num_docs, num_perm), np.iinfo(np.uint64).max, dtype=np.uint64)
+    has_signature = np.zeros(num_docs, dtype=bool)
+    if not shingle_hashes:
+        return signatures, has_signature
+
+    hashes = np.asarray(shingle_hashes, dtype=np.uint64)
+    doc_ids = np.asarray(doc_ids, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, doc_ids[1:] != doc_ids[:-1]])
+    docs = doc_ids[starts]
+    has_signature[docs] = True
+
+    # (a * x + b) mod p with a, b < 2^31 and x < 2^32 stays inside uint64
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 2 ** 31, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 2 ** 31, size=num_perm, dtype=np.uint64)
+    for k in range(num_perm):
+        permuted = (a[k] * hashes + b[k]) % MINHASH_PRIME
+        signatures[docs, k] = np.minimum.reduceat(permuted, starts)
+    return signatures, has_signature
+
+
+def near_duplicate_clusters(signatures: np.ndarray, has_signature: np.ndarray, priority: np.ndarray,
+                            bands: int = LSH_BANDS, threshold: float = NEAR_DUPLICATE_THRESHOLD) -> np.ndarray:
+    """Cluster near-duplicates with banded LSH; returns each row's representative row
+
+    Candidate pairs share at least one band bucket and are confirmed when their
+    signatures agree on at least `threshold` of positions. The representative
+    of a cluster is its member with the highest priority.
+    """
+    num_docs, num_perm = signatures.shape
+    parent = np.arange(num_docs)
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    rows_per_band = num_perm // bands
+    candidates = np.flatnonzero(has_signature)
+    for band in range(bands):
+        block = signatures[candidates, band * rows_per_band:(band + 1) * rows_per_band]
+        _, bucket, counts = np.unique(block, axis=0, return_inverse=True, return_counts=True)
+        bucket = bucket.reshape(-1)
+        shared = counts[bucket] > 1
+        if not shared.any():
+            continue
+        members = candidates[shared]
+        order = np.argsort(bucket[shared], kind='stable')
+        members, member_buckets = members[order], bucket[shared][order]
+        firsts = np.r_[True, member_buckets[1:] != member_buckets[:-1]]
+        heads = members[np.maximum.accumulate(np.where(firsts, np.arange(len(members)), 0))]
+        agreement = (signatures[members] == signatures[heads]).mean(axis=1)
+        for head, member in zip(heads[~firsts & (agreement >= threshold)], members[~firsts & (agreement >= threshold)]):
+            root_a, root_b = find(head), find(member)
+            if root_a != root_b:
+                parent[root_b] = root_a
+
+    roots = np.array([find(i) for i in range(num_docs)])
+    # Highest-priority member of each cluster becomes its representative
+    order = np.lexsort((np.arange(num_docs), -priority, roots))
+    firsts = np.r_[True, roots[order][1:] != roots[order][:-1]]
+    best = order[np.maximum.accumulate(np.where(firsts, np.arange(num_docs), 0))]
+    representative = np.empty(num_docs, dtype=np.int64)
+    representative[order] = best
+    return representative
+
+
+def duplicate_priority(posts: pd.DataFrame) -> np.ndarray:
+    """Which copy of a near-duplicate cluster to keep: the most relevant, then the most discussed"""
+    priority = np.zeros(len(posts))
+    if 'relevance_score' in posts.columns:
+        priority += pd.to_numeric(posts['relevance_score'], errors='coerce').fillna(0).to_numpy() * 1e6
+    if 'num_comments_scraped' in posts.columns:
+        priority += pd.to_numeric(posts['num_comments_scraped'], errors='coerce').fillna(0).to_numpy()
+    return priority
+
+
+def collapse_near_duplicates(posts: pd.DataFrame) -> pd.DataFrame:
+    """Add duplicate_of (representative row) and also_posted_in (the cluster's other subreddits) columns"""
+    start_time = datetime.now()
+    title = posts['title'].fillna('').astype(str) if 'title' in posts.columns else pd.Series('', index=posts.index)
+    body = posts['body'].fillna('').astype(str) if 'body' in posts.columns else pd.Series('', index=posts.index)
+    signatures, has_signature = minhash_signatures(title + " " + body)
+
+    representative = near_duplicate_clusters(signatures, has_signature, duplicate_priority(posts))
+
+    subreddits = posts['subreddit'].fillna('unknown').astype(str).to_numpy() if 'subreddit' in posts.columns else np.full(len(posts), 'unknown', dtype=object)
+    also_posted_in = np.full(len(posts), '', dtype=object)
+    duplicated = np.flatnonzero(representative != np.arange(len(posts)))
+    clusters: Dict[int, list] = {}
+    for row in duplicated:
+        clusters.setdefault(representative[row], [representative[row]]).append(row)
+    # Any member may be the one a filtered request keeps: each lists the cluster's subreddits other than its own
+    for members in clusters.values():
+        cluster_subreddits = list(dict.fromkeys(subreddits[members]))
+        for row in members:
+            also_posted_in[row] = ", ".join(f"r/{s}" for s in cluster_subreddits if s != subreddits[row])
+
+    posts = posts.assign(duplicate_of=representative, also_posted_in=also_posted_in)
+    duration = (datetime.now() - start_time).total_seconds()
+    logger.info(f"🔁 Collapsed {len(duplicated)} near-duplicate posts into {len(clusters)} clusters in {duration:.2f}s")
+    return posts
+
+
+def ingest(df: pd.DataFrame) -> Dict[str, pd.DataFrame]:
+    """Turn the raw CSV frame into the tables the agent serves from"""
+    comments = build_comments_table(df)
+    posts = df.drop(columns=['all_scraped_comments_json'], errors='ignore')
+    created = posts['created_at'] if 'created_at' in posts.columns else pd.Series(pd.NaT, index=posts.index)
+    posts['created_at'] = pd.to_datetime(created, errors='coerce', utc=True, format='mixed')
+    posts['created_display'] = posts['created_at'].dt.strftime('%B %d, %Y').fillna("Date unavailable")
+    posts = collapse_near_duplicates(posts)
+    logger.info(f"💬 Parsed {len(comments):,} comments from {len(posts)} posts")
+    return {"posts": posts, "comments": comments}
+
+
+def load_dataset(data_path: str, snapshot_dir: Optional[str] = None) -> Tuple[Dict[str, pd.DataFrame], DatasetSnapshot]:
+    """Load the ingested tables, preferring a current snapshot over parsing the CSV"""
+    snapshot = DatasetSnapshot(data_path, snapshot_dir)
+
+    tables = snapshot.load()
+    if tables is not None:
+        logger.info(f"⚡ Loaded dataset snapshot for {data_path}")
+        return tables, snapshot
+
+    logger.info(f"Parsing {data_path} (no current snapshot)...")
+    df = pd.read_csv(data_path, low_memory=False)
+    tables = ingest(df)
+    snapshot.save(tables)
+    return tables, snapshot
+
+
+if __name__ == "__main__":
+    # Build (or refresh) the snapshot ahead of time, e.g. during a deploy build step
+    path = sys.argv[1] if len(sys.argv) > 1 else os.getenv("DATA_PATH", "results/rpotential_filtered_focused_data.csv")
+    try:
+        start_time = datetime.now()
+        tables, snapshot = load_dataset(path)
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"Snapshot ready for {len(tables['posts'])} posts in {duration:.2f}s: {snapshot.manifest_path}")
+    except Exception as e:
+        logger.error(f"❌ Failed to build snapshot: {str(e)}")
+        logger.error(traceback.format_exc())
+        sys.exit(1)
@@ -0,0 +1,1055 @@
+#!/usr/bin/env python3
+"""
+Sage Retrieval - in-process indexes for question-specific post retrieval
+BM25 inverted index over post titles, bodies and comment text, stored as
+compact CSR-style NumPy arrays and persisted beside the dataset snapshot
+Semantic index: TF-IDF + truncated SVD vectors (float32, memory-mapped),
+searched exactly up to IVF_MIN_DOCS posts and through an IVF approximate
+nearest-neighbour layer beyond that, fully offline
+Facet index: packed bitmaps per enrichment value for filtering and counts
+Entity index: exploded companies/products/roles/tags with per-post postings
+Time index: posts sorted by created_at for date-range slicing and freshness
+Question router: nearest-centroid TF-IDF classifier mapping a question to
+the ceo_question_category / actionability slice it should be answered from
+Diversity selector: maximal marginal relevance over the semantic vectors with
+penalties for over-represented subreddits, categories and sentiments
+Composite ranker: weighted retrieval score, relevance, confidence, freshness
+decay and engagement, with the static features precomputed at load
+"""
+
+import pandas as pd
+import numpy as np
+import hashlib
+import json
+import os
+import re
+import sys
+import traceback
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from loguru import logger
+from datetime import datetime, timedelta, timezone
+from sage_data import load_arrays, save_arrays
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#\-']*[a-z0-9+#]|[a-z0-9]")
+
+STOPWORDS = frozenset("""
+a about above after again against all am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has have
+having he her here hers herself him himself his how i if in into is it its itself just me more most
+my myself no nor not now of off on once only or other our ours ourselves out over own same she should
+so some such than that the their theirs them themselves then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your
+yours yourself yourselves us also get got like really im ive dont thats one make many much way well
+""".split())
+
+# Words that change what a question asks though tokenize drops most of them:
+# question words, negation, comparison and time order
+INTENT_WORDS = frozenset("""
+how why when where which what who whom whose before after during since until
+more most less least fewer fewest than better worse best worst
+""".split())
+NEGATIONS = frozenset("""
+not no nor never none nothing without cannot dont doesnt didnt isnt arent wasnt werent
+cant couldnt wont wouldnt shouldnt havent hasnt hadnt
+""".split())
+
+# Title terms say more about a post than a passing mention in a comment
+FIELD_WEIGHTS = {"title": 2.0, "body": 1.0, "comments": 0.5}
+
+# Below this many posts an exact matrix-vector product is cheap (well under a
+# millisecond at 5K posts) and IVF would only cost recall
+IVF_MIN_DOCS = 100_000
+# IVF probes lists until they hold at least this many candidates per result asked
+# for; on weakly clustered text recall keeps climbing up to ~32 (8 left it near 0.5)
+IVF_CANDIDATES_PER_RESULT = 32
+
+
+def _stem(token: str) -> str:
+    """Minimal plural folding so competitors matches competitor"""
+    if len(token) > 3 and token.endswith('s') and not token.endswith('ss'):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with stopwords removed"""
+    if not isinstance(text, str) or not text:
+        return []
+    return [_stem(t) for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def intent_words(text: str) -> frozenset:
+    """The question words, comparisons and negation of a text (every negation folds to "not")"""
+    if not isinstance(text, str) or not text:
+        return frozenset()
+    words = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in NEGATIONS or token.endswith("n't"):
+            words.add("not")
+        elif token in INTENT_WORDS:
+            words.add(token)
+    return frozenset(words)
+
+
+def post_documents(posts: pd.DataFrame, comments: pd.DataFrame) -> Dict[str, List[str]]:
+    """Per-field text for every post row; comment text is concatenated per post"""
+    num_posts = len(posts)
+    comment_text = [''] * num_posts
+    if len(comments):
+        grouped = comments.groupby('post_row', sort=False)['body'].agg(' '.join)
+        for row, text in grouped.items():
+            comment_text[int(row)] = text
+    return {
+        "title": posts['title'].fillna('').astype(str).tolist() if 'title' in posts.columns else [''] * num_posts,
+        "body": posts['body'].fillna('').astype(str).tolist() if 'body' in posts.columns else [''] * num_posts,
+        "comments": comment_text,
+    }
+
+
+def term_document_counts(fields: Dict[str, List[str]], field_weights: Optional[Dict[str, float]] = None) -> Tuple[Dict[str, int], np.ndarray, np.ndarray, np.ndarray, int]:
+    """Weighted (term, doc) counts over all fields, sorted term-major
+
+    Returns (vocabulary, term_ids, doc_ids, counts, num_docs)
+    """
+    field_weights = field_weights or FIELD_WEIGHTS
+    vocabulary: Dict[str, int] = {}
+    term_chunks, doc_chunks, weight_chunks = [], [], []
+    num_docs = len(next(iter(fields.values()))) if fields else 0
+    for field, texts in fields.items():
+        weight = field_weights.get(field, 1.0)
+        for doc, text in enumerate(texts):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            term_chunks.append(np.fromiter(
+                (vocabulary.setdefault(t, len(vocabulary)) for t in tokens),
+                dtype=np.int64, count=len(tokens)
+            ))
+            doc_chunks.append(np.full(len(tokens), doc, dtype=np.int64))
+            weight_chunks.append(np.full(len(tokens), weight, dtype=np.float32))
+
+    if not term_chunks:
+        empty = np.zeros(0, dtype=np.int64)
+        return vocabulary, empty, empty, np.zeros(0, dtype=np.float32), num_docs
+
+    terms = np.concatenate(term_chunks)
+    docs = np.concatenate(doc_chunks)
+    weights = np.concatenate(weight_chunks)
+
+    keys = terms * num_docs + docs
+    unique_keys, inverse = np.unique(keys, return_inverse=True)
+    counts = np.bincount(inverse, weights=weights).astype(np.float32)
+    return vocabulary, unique_keys // num_docs, unique_keys % num_docs, counts, num_docs
+
+
+class BM25Index:
+    """Okapi BM25 over weighted fields, postings stored term-major in flat arrays
+
+    Postings for term t live in doc_ids/term_freqs[offsets[t]:offsets[t + 1]]
+    """
+
+    # Bump when tokenize, FIELD_WEIGHTS or the stored arrays change
+    FORMAT_VERSION = 1
+    ARRAYS = ("offsets", "doc_ids", "term_freqs", "doc_lengths", "idf", "length_norm")
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocabulary: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype=np.int64)
+        self.doc_ids = np.zeros(0, dtype=np.int32)
+        self.term_freqs = np.zeros(0, dtype=np.float32)
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.idf = np.zeros(0, dtype=np.float32)
+        self.length_norm = np.zeros(0, dtype=np.float32)
+        self.num_docs = 0
+
+    @classmethod
+    def build(cls, fields: Dict[str, List[str]], field_weights: Optional[Dict[str, float]] = None) -> 'BM25Index':
+        """Build the index from per-field document text (all lists share row order)"""
+        start_time = datetime.now()
+        index = cls()
+        vocabulary, posting_terms, doc_ids, counts, num_docs = term_document_counts(fields, field_weights)
+        index.vocabulary = vocabulary
+        index.num_docs = num_docs
+        if len(doc_ids) == 0:
+            index.doc_lengths = np.zeros(num_docs, dtype=np.float32)
+            index.length_norm = np.full(num_docs, index.k1, dtype=np.float32)
+            return index
+
+        index.term_freqs = counts
+        index.doc_ids = doc_ids.astype(np.int32)
+        index.offsets = np.searchsorted(posting_terms, np.arange(len(vocabulary) + 1)).astype(np.int64)
+
+        index.doc_lengths = np.bincount(doc_ids, weights=counts, minlength=num_docs).astype(np.float32)
+        doc_freq = np.diff(index.offsets).astype(np.float64)
+        index.idf = np.log1p((num_docs - doc_freq + 0.5) / (doc_freq + 0.5)).astype(np.float32)
+        avg_length = float(index.doc_lengths.mean()) or 1.0
+        index.length_norm = (index.k1 * (1 - index.b + index.b * index.doc_lengths / avg_length)).astype(np.float32)
+
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"🔎 Built BM25 index: {len(vocabulary):,} terms, {len(index.doc_ids):,} postings in {duration:.2f}s")
+        return index
+
+    def score(self, query: str) -> np.ndarray:
+        """BM25 score of every document for the query (0 where no term matches)"""
+        scores = np.zeros(self.num_docs, dtype=np.float32)
+        term_ids = {self.vocabulary[t] for t in tokenize(query) if t in self.vocabulary}
+        if not term_ids:
+            return scores
+
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.doc_ids[start:end]
+            tf = self.term_freqs[start:end]
+            scores[docs] += self.idf[term_id] * tf * (self.k1 + 1) / (tf + self.length_norm[docs])
+        return scores
+
+    @staticmethod
+    def path(base_path: str) -> str:
+        return f"{base_path}.bm25.npz"
+
+    def save(self, base_path: str, fingerprint: str) -> bool:
+        """Persist the postings and scoring arrays (the vocabulary as its terms in id order)"""
+        arrays = {name: getattr(self, name) for name in self.ARRAYS}
+        # Vocabulary ids are assigned in insertion order, so the keys are the terms by id
+        arrays.update(terms=np.array(list(self.vocabulary), dtype=str), params=np.array([self.k1, self.b]))
+        return save_arrays(self.path(base_path), arrays, self.FORMAT_VERSION, fingerprint)
+
+    @classmethod
+    def load(cls, base_path: str, fingerprint: str) -> Optional['BM25Index']:
+        """Load a persisted index, or None if missing or built from other data"""
+        stored = load_arrays(cls.path(base_path), cls.FORMAT_VERSION, fingerprint)
+        if stored is None:
+            return None
+        k1, b = stored["params"].tolist()
+        index = cls(k1, b)
+        index.vocabulary = {term: i for i, term in enumerate(stored["terms"].tolist())}
+        for name in cls.ARRAYS:
+            setattr(index, name, stored[name])
+        index.num_docs = len(index.doc_lengths)
+        logger.info(f"⚡ Loaded BM25 index ({len(index.vocabulary):,} terms, {len(index.doc_ids):,} postings)")
+        return index
+
+
+def load_or_build_bm25_index(posts: pd.DataFrame, comments: pd.DataFrame, base_path: str,
+                             fingerprint: str, rebuild: bool = False) -> BM25Index:
+    """Reuse the persisted BM25 index for this dataset fingerprint, building (and saving) it if needed"""
+    if not rebuild:
+        index = BM25Index.load(base_path, fingerprint)
+        if index is not None and index.num_docs == len(posts):
+            return index
+    index = BM25Index.build(post_documents(posts, comments))
+    index.save(base_path, fingerprint)
+    return index
+
+
+class SemanticIndex:
+    """Dense post vectors from TF-IDF + truncated SVD, searched by inner product
+
+    Vectors are L2-normalised float32 rows, so a matrix product gives cosine
+    similarity. Indexes of IVF_MIN_DOCS posts or more add an IVF layer
+    (spherical k-means lists) so a query only scans the posts in its nearest
+    clusters; smaller ones are always searched exactly.
+    """
+
+    # 2: IVF only from IVF_MIN_DOCS posts (older files carry lists for 4K+ posts)
+    FORMAT_VERSION = 2
+
+    def __init__(self, terms: List[str], idf: np.ndarray, components: np.ndarray, vectors: np.ndarray,
+                 centroids: Optional[np.ndarray] = None, list_offsets: Optional[np.ndarray] = None,
+                 list_rows: Optional[np.ndarray] = None, fingerprint: str = ""):
+        self.terms = list(terms)
+        self.vocabulary = {t: i for i, t in enumerate(self.terms)}
+        self.idf = idf.astype(np.float32)
+        self.components = components.astype(np.float32)
+        self.vectors = vectors
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.fingerprint = fingerprint
+
+    @property
+    def num_docs(self) -> int:
+        return self.vectors.shape[0]
+
+    @property
+    def dimensions(self) -> int:
+        return self.vectors.shape[1]
+
+    @classmethod
+    def build(cls, fields: Dict[str, List[str]], dimensions: int = 128, max_features: int = 4096,
+              min_df: int = 2, fingerprint: str = "", chunk_size: int = 1024) -> 'SemanticIndex':
+        """Fit TF-IDF + SVD on the posts and project every post into the latent space"""
+        start_time = datetime.now()
+        vocabulary, term_ids, doc_ids, counts, num_docs = term_document_counts(fields)
+
+        # Keep the max_features most widespread terms that appear in at least min_df posts
+        doc_freq = np.bincount(term_ids, minlength=len(vocabulary))
+        candidates = np.flatnonzero(doc_freq >= min_df)
+        keep = candidates[np.argsort(-doc_freq[candidates], kind='stable')[:max_features]]
+        remap = np.full(len(vocabulary), -1, dtype=np.int64)
+        remap[keep] = np.arange(len(keep))
+        by_id = {i: t for t, i in vocabulary.items()}
+        terms = [by_id[i] for i in keep]
+        idf = (np.log((1 + num_docs) / (1 + doc_freq[keep])) + 1).astype(np.float32)
+
+        mask = remap[term_ids] >= 0
+        columns = remap[term_ids[mask]]
+        rows = doc_ids[mask]
+        values = (1 + np.log(counts[mask])) * idf[columns]
+
+        # Doc-major CSR so chunks of posts can be densified one at a time
+        order = np.lexsort((columns, rows))
+        rows, columns, values = rows[order], columns[order], values[order].astype(np.float32)
+        indptr = np.searchsorted(rows, np.arange(num_docs + 1))
+        norms = np.sqrt(np.bincount(rows, weights=values.astype(np.float64) ** 2, minlength=num_docs))
+        values = values / np.maximum(norms[rows], 1e-12).astype(np.float32)
+
+        def dense_chunk(start: int, end: int) -> np.ndarray:
+            chunk = np.zeros((end - start, len(terms)), dtype=np.float32)
+            lo, hi = indptr[start], indptr[end]
+            chunk[rows[lo:hi] - start, columns[lo:hi]] = values[lo:hi]
+            return chunk
+
+        # Truncated SVD via the term Gram matrix: its top eigenvectors are the right
+        # singular vectors, found with randomized subspace iteration
+        gram = np.zeros((len(terms), len(terms)), dtype=np.float32)
+        for start in range(0, num_docs, chunk_size):
+            chunk = dense_chunk(start, min(start + chunk_size, num_docs))
+            gram += chunk.T @ chunk
+        dimensions = max(1, min(dimensions, len(terms)))
+        rank = min(len(terms), dimensions + 16)
+        basis = np.random.default_rng(0).standard_normal((len(terms), rank)).astype(np.float32)
+        for _ in range(4):
+            basis, _ = np.linalg.qr(gram @ basis)
+        eigenvalues, eigenvectors = np.linalg.eigh(basis.T @ gram @ basis)
+        components = (basis @ eigenvectors[:, ::-1][:, :dimensions]).astype(np.float32)
+
+        vectors = np.zeros((num_docs, dimensions), dtype=np.float32)
+        for start in range(0, num_docs, chunk_size):
+            end = min(start + chunk_size, num_docs)
+            vectors[start:end] = dense_chunk(start, end) @ components
+        vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+        index = cls(terms, idf, components, vectors, fingerprint=fingerprint)
+        index._build_ivf()
+
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"🧭 Built semantic index: {num_docs} posts × {dimensions} dims, {len(terms):,} terms in {duration:.2f}s")
+        return index
+
+    def _build_ivf(self, iterations: int = 10, min_docs: int = IVF_MIN_DOCS):
+        """Spherical k-means inverted lists; small indexes are searched exhaustively"""
+        if self.num_docs < min_docs:
+            return
+        num_lists = int(np.sqrt(self.num_docs))
+        rng = np.random.default_rng(0)
+        centroids = self.vectors[rng.choice(self.num_docs, num_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+            for cluster in range(num_lists):
+                members = self.vectors[assignment == cluster]
+                if len(members):
+                    centroids[cluster] = members.sum(axis=0)
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+        assignment = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.list_rows = np.argsort(assignment, kind='stable').astype(np.int32)
+        self.list_offsets = np.searchsorted(assignment[self.list_rows], np.arange(num_lists + 1)).astype(np.int64)
+        self.centroids = centroids.astype(np.float32)
+
+    def unknown_terms(self, text: str) -> List[str]:
+        """Terms of a text the index has no dimension for (embed ignores them)"""
+        return [token for token in tokenize(text) if token not in self.vocabulary]
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Project a batch of texts (e.g. questions) into the index space"""
+        matrix = np.zeros((len(texts), len(self.terms)), dtype=np.float32)
+        for i, text in enumerate(texts):
+            for token in tokenize(text):
+                column = self.vocabulary.get(token)
+                if column is not None:
+                    matrix[i, column] += 1
+        nonzero = matrix > 0
+        matrix[nonzero] = 1 + np.log(matrix[nonzero])
+        matrix *= self.idf
+        vectors = matrix @ self.components
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+    def similarities(self, query_vector: np.ndarray) -> np.ndarray:
+        """Exact cosine similarity of one query vector against every post"""
+        return self.vectors @ query_vector
+
+    def search(self, query: str, top_k: int = 500, nprobe: int = 8) -> Tuple[np.ndarray, np.ndarray]:
+        """Nearest posts to the query as (rows, similarities), best first
+
+        With IVF lists, at least nprobe of the nearest lists are scanned, and
+        more until they hold IVF_CANDIDATES_PER_RESULT candidates per result.
+        """
+        query_vector = self.embed([query])[0]
+        if not query_vector.any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        if self.centroids is not None:
+            ranked = np.argsort(-(self.centroids @ query_vector))
+            covered = np.cumsum(np.diff(self.list_offsets)[ranked])
+            wanted = min(top_k * IVF_CANDIDATES_PER_RESULT, self.num_docs)
+            probes = ranked[:max(nprobe, int(np.searchsorted(covered, wanted)) + 1)]
+            candidates = np.concatenate([
+                self.list_rows[self.list_offsets[p]:self.list_offsets[p + 1]] for p in probes
+            ])
+            scores = self.vectors[candidates] @ query_vector
+        else:
+            candidates = np.arange(self.num_docs)
+            scores = self.similarities(query_vector)
+
+        top_k = min(top_k, len(candidates))
+        best = np.argpartition(-scores, top_k - 1)[:top_k] if top_k < len(candidates) else np.arange(len(candidates))
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return candidates[best].astype(np.int64), scores[best]
+
+    @staticmethod
+    def paths(base_path: str) -> Tuple[str, str]:
+        """(metadata .npz, vectors .npy) for an index stored at base_path"""
+        return f"{base_path}.semantic.npz", f"{base_path}.semantic.vectors.npy"
+
+    def save(self, base_path: str) -> bool:
+        """Persist the index; the vector matrix is a plain .npy so it can be memory-mapped"""
+        meta_path, vectors_path = self.paths(base_path)
+        try:
+            tmp_vectors = f"{vectors_path}.tmp.npy"
+            np.save(tmp_vectors, np.ascontiguousarray(self.vectors, dtype=np.float32))
+            os.replace(tmp_vectors, vectors_path)
+            arrays = {
+                "terms": np.array(self.terms, dtype=str),
+                "idf": self.idf,
+                "components": self.components,
+                "info": np.array(json.dumps({"format_version": self.FORMAT_VERSION, "fingerprint": self.fingerprint})),
+            }
+            if self.centroids is not None:
+                arrays.update(centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows)
+            tmp_meta = f"{meta_path}.tmp.npz"
+            np.savez(tmp_meta, **arrays)
+            os.replace(tmp_meta, meta_path)
+            logger.info(f"💾 Wrote semantic index to {meta_path}")
+            return True
+        except Exception as e:
+            logger.warning(f"⚠️ Could not write semantic index ({str(e)}), continuing without it")
+            return False
+
+    @classmethod
+    def load(cls, base_path: str, fingerprint: Optional[str] = None) -> Optional['SemanticIndex']:
+        """Load a persisted index, or None if missing or built from other data"""
+        meta_path, vectors_path = cls.paths(base_path)
+        if not (os.path.exists(meta_path) and os.path.exists(vectors_path)):
+            return None
+        try:
+            with np.load(meta_path) as meta:
+                info = json.loads(str(meta["info"]))
+                if info.get("format_version") != cls.FORMAT_VERSION:
+                    return None
+                if fingerprint is not None and info.get("fingerprint") != fingerprint:
+                    logger.info("🧭 Semantic index is stale (dataset changed)")
+                    return None
+                ivf = {}
+                if "centroids" in meta.files:
+                    ivf = {"centroids": meta["centroids"], "list_offsets": meta["list_offsets"], "list_rows": meta["list_rows"]}
+                index = cls(meta["terms"].tolist(), meta["idf"], meta["components"],
+                            np.load(vectors_path, mmap_mode='r'), fingerprint=info.get("fingerprint", ""), **ivf)
+            logger.info(f"⚡ Loaded semantic index ({index.num_docs} posts × {index.dimensions} dims)")
+            return index
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to load semantic index: {str(e)}")
+            return None
+
+
+def load_or_build_semantic_index(posts: pd.DataFrame, comments: pd.DataFrame, base_path: str,
+                                 fingerprint: str, rebuild: bool = False) -> SemanticIndex:
+    """Reuse the persisted index for this dataset fingerprint, building (and saving) it if needed"""
+    if not rebuild:
+        index = SemanticIndex.load(base_path, fingerprint)
+        if index is not None and index.num_docs == len(posts):
+            return index
+    index = SemanticIndex.build(post_documents(posts, comments), fingerprint=fingerprint)
+    index.save(base_path)
+    return index
+
+
+FACET_DIMENSIONS = (
+    'confidence_level', 'sentiment', 'actionability',
+    'ceo_question_category', 'temporal_context', 'subreddit'
+)
+
+
+class FacetIndex:
+    """One packed bitset (np.packbits, 1 bit per post row) per value of each facet
+
+    Filters combine with bitwise OR within a dimension and AND across
+    dimensions; counts are popcounts, so no pass over the frame is needed
+    """
+
+    def __init__(self, num_rows: int):
+        self.num_rows = num_rows
+        self.bitmaps: Dict[str, Dict[str, np.ndarray]] = {}
+        self.all_rows = np.packbits(np.ones(num_rows, dtype=bool))
+
+    @classmethod
+    def build(cls, posts: pd.DataFrame, dimensions: Iterable[str] = FACET_DIMENSIONS) -> 'FacetIndex':
+        index = cls(len(posts))
+        for dim in dimensions:
+            if dim not in posts.columns:
+                continue
+            codes, values = pd.factorize(posts[dim], sort=False)
+            index.bitmaps[dim] = {
+                str(value): np.packbits(codes == code)
+                for code, value in enumerate(values)
+            }
+        return index
+
+    def from_rows(self, rows: np.ndarray) -> np.ndarray:
+        """Bitset of an arbitrary row selection"""
+        mask = np.zeros(self.num_rows, dtype=bool)
+        mask[rows] = True
+        return np.packbits(mask)
+
+    def mask(self, bitmap: np.ndarray) -> np.ndarray:
+        """Bitset expanded to a boolean array over all rows"""
+        return np.unpackbits(bitmap, count=self.num_rows).astype(bool)
+
+    @staticmethod
+    def count(bitmap: np.ndarray) -> int:
+        return int(np.bitwise_count(bitmap).sum())
+
+    def select(self, filters: Dict[str, Union[str, List[str]]], within: Optional[np.ndarray] = None) -> np.ndarray:
+        """Bitset of rows matching every filter (a list value matches any of its values)"""
+        result = self.all_rows if within is None else within
+        for dim, wanted in filters.items():
+            if dim not in self.bitmaps:
+                raise ValueError(f"Unknown facet '{dim}'. Expected one of: {', '.join(self.bitmaps)}")
+            values = [wanted] if isinstance(wanted, str) else list(wanted)
+            matched = np.zeros_like(self.all_rows)
+            for value in values:
+                bitmap = self.bitmaps[dim].get(str(value))
+                if bitmap is not None:
+                    matched = matched | bitmap
+            result = result & matched
+        return result
+
+    def counts(self, dim: str, within: Optional[np.ndarray] = None) -> Dict[str, int]:
+        """Posts per value of a facet, most common first (missing values excluded)"""
+        counts = {}
+        for value, bitmap in self.bitmaps.get(dim, {}).items():
+            n = self.count(bitmap if within is None else bitmap & within)
+            if n > 0:
+                counts[value] = n
+        return dict(sorted(counts.items(), key=lambda item: -item[1]))
+
+
+# Filter name -> comma-separated enrichment column
+ENTITY_FIELDS = {
+    'company': 'companies_mentioned',
+    'product': 'products_mentioned',
+    'role': 'roles_mentioned',
+    'tag': 'tags',
+}
+
+
+class EntityIndex:
+    """Comma-separated entity columns exploded once into (row, entity) postings
+
+    Entities are matched case-insensitively and displayed with their first-seen
+    spelling. Counting over any row selection is a single bincount.
+    """
+
+    def __init__(self, num_rows: int):
+        self.num_rows = num_rows
+        self.names: Dict[str, List[str]] = {}
+        self.lookup: Dict[str, Dict[str, int]] = {}
+        self.row_ids: Dict[str, np.ndarray] = {}
+        self.entity_ids: Dict[str, np.ndarray] = {}
+        self.global_counts: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def build(cls, posts: pd.DataFrame, fields: Optional[Dict[str, str]] = None) -> 'EntityIndex':
+        index = cls(len(posts))
+        for field, column in (fields or ENTITY_FIELDS).items():
+            if column not in posts.columns:
+                continue
+            values = pd.Series(posts[column].to_numpy(), index=np.arange(len(posts))).dropna().astype(str)
+            exploded = values.str.split(',').explode().str.strip()
+            exploded = exploded[(exploded != '') & (exploded.str.lower() != 'nan')]
+            keys = exploded.str.lower()
+            codes, uniques = pd.factorize(keys, sort=False)
+            pairs = pd.DataFrame({'row': exploded.index.to_numpy(dtype=np.int64), 'entity': codes}).drop_duplicates()
+
+            display = exploded.groupby(codes, sort=True).first()
+            index.names[field] = display.tolist()
+            index.lookup[field] = {key: i for i, key in enumerate(uniques)}
+            index.row_ids[field] = pairs['row'].to_numpy(dtype=np.int32)
+            index.entity_ids[field] = pairs['entity'].to_numpy(dtype=np.int32)
+            index.global_counts[field] = np.bincount(index.entity_ids[field], minlength=len(uniques))
+        logger.info("🏢 Built entity index: " + ", ".join(f"{len(names)} {field}s" for field, names in index.names.items()))
+        return index
+
+    def counts(self, field: str, mask: Optional[np.ndarray] = None, top: int = 5) -> List[Tuple[str, int]]:
+        """Most mentioned entities (name, posts) over all posts or a boolean row mask"""
+        if field not in self.names:
+            return []
+        if mask is None:
+            counts = self.global_counts[field]
+        else:
+            selected = mask[self.row_ids[field]]
+            counts = np.bincount(self.entity_ids[field][selected], minlength=len(self.names[field]))
+        best = np.argsort(-counts, kind='stable')[:top]
+        return [(self.names[field][i], int(counts[i])) for i in best if counts[i] > 0]
+
+    def mask(self, field: str, wanted: Union[str, List[str]]) -> np.ndarray:
+        """Boolean row mask of posts mentioning any of the wanted entities"""
+        if field not in self.lookup:
+            raise ValueError(f"Unknown entity filter '{field}'. Expected one of: {', '.join(self.lookup)}")
+        values = [wanted] if isinstance(wanted, str) else list(wanted)
+        ids = [self.lookup[field][v.strip().lower()] for v in values if v.strip().lower() in self.lookup[field]]
+        mask = np.zeros(self.num_rows, dtype=bool)
+        if ids:
+            mask[self.row_ids[field][np.isin(self.entity_ids[field], ids)]] = True
+        return mask
+
+
+# Time-range filter keys: since_days (int), date_from / date_to (ISO dates, UTC)
+TIME_FILTERS = ('since_days', 'date_from', 'date_to')
+
+NAT_INT = np.iinfo(np.int64).min
+
+
+class TimeIndex:
+    """created_at as int64 UTC nanoseconds plus the dated rows sorted by time"""
+
+    def __init__(self, created_at: pd.Series):
+        created = pd.to_datetime(created_at, errors='coerce', utc=True)
+        self.timestamps = created.dt.tz_convert(None).to_numpy(dtype='datetime64[ns]').view(np.int64)
+        dated = np.flatnonzero(self.timestamps != NAT_INT)
+        self.sorted_rows = dated[np.argsort(self.timestamps[dated], kind='stable')]
+        self.sorted_timestamps = self.timestamps[self.sorted_rows]
+
+    @staticmethod
+    def _to_ns(value: Union[str, datetime, pd.Timestamp]) -> int:
+        stamp = pd.Timestamp(value)
+        stamp = stamp.tz_localize('UTC') if stamp.tzinfo is None else stamp.tz_convert('UTC')
+        return stamp.value
+
+    def rows_between(self, start=None, end=None) -> np.ndarray:
+        """Rows created in [start, end] (either bound optional), oldest first"""
+        lo = 0 if start is None else np.searchsorted(self.sorted_timestamps, self._to_ns(start), side='left')
+        hi = len(self.sorted_rows) if end is None else np.searchsorted(self.sorted_timestamps, self._to_ns(end), side='right')
+        return self.sorted_rows[lo:hi]
+
+    def mask(self, filters: Dict) -> np.ndarray:
+        """Boolean row mask for since_days / date_from / date_to filters"""
+        starts = []
+        if filters.get('date_from') is not None:
+            starts.append(pd.Timestamp(filters['date_from']))
+        if filters.get('since_days') is not None:
+            starts.append(pd.Timestamp(datetime.now(timezone.utc) - timedelta(days=float(filters['since_days']))))
+        start = max(starts, key=self._to_ns) if starts else None
+        end = filters.get('date_to')
+        if end is not None and len(str(end)) <= 10:
+            # A bare date means "through the end of that day"
+            end = pd.Timestamp(end) + pd.Timedelta(days=1) - pd.Timedelta(1)
+        mask = np.zeros(len(self.timestamps), dtype=bool)
+        mask[self.rows_between(start, end)] = True
+        return mask
+
+    def stats(self, rows: np.ndarray) -> Optional[Dict]:
+        """Date range and median creation time for a selection (None if undated)"""
+        stamps = self.timestamps[rows]
+        stamps = stamps[stamps != NAT_INT]
+        if len(stamps) == 0:
+            return None
+        return {
+            "date_min": pd.Timestamp(int(stamps.min()), tz='UTC'),
+            "date_max": pd.Timestamp(int(stamps.max()), tz='UTC'),
+            "median_created": pd.Timestamp(int(np.median(stamps)), tz='UTC'),
+            "dated_posts": int(len(stamps)),
+        }
+
+    def fresh_share(self, rows: np.ndarray, days: float = 90, now: Optional[datetime] = None) -> float:
+        """Share of a selection's dated posts created in the last `days` days"""
+        stamps = self.timestamps[rows]
+        stamps = stamps[stamps != NAT_INT]
+        if len(stamps) == 0:
+            return 0.0
+        cutoff = self._to_ns((now or datetime.now(timezone.utc)) - timedelta(days=days))
+        return float((stamps >= cutoff).mean())
+
+
+ROUTED_DIMENSIONS = ('ceo_question_category', 'actionability')
+
+
+class QuestionRouter:
+    """Classifies a question into enrichment labels by TF-IDF centroid similarity
+
+    Each label's centroid is the mean TF-IDF vector of the posts carrying that
+    label (plus any labelled past questions). A label is only returned when
+    its cosine similarity beats the runner-up by a clear relative margin, so
+    labels whose posts read alike never route.
+    """
+
+    # Bump when tokenize, the TF-IDF weighting or the stored arrays change
+    FORMAT_VERSION = 1
+
+    def __init__(self, vocabulary: Dict[str, int], idf: np.ndarray, centroids: Dict[str, Tuple[List[str], np.ndarray]],
+                 min_similarity: float = 0.05, min_margin: float = 0.25):
+        self.vocabulary = vocabulary
+        self.idf = idf
+        self.centroids = centroids
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+
+    @classmethod
+    def build(cls, posts: pd.DataFrame, history: Optional[List[Dict]] = None,
+              history_weight: float = 5.0) -> 'QuestionRouter':
+        """Train from the enriched posts plus optional labelled questions
+        ({"question": ..., "ceo_question_category": ..., "actionability": ...})"""
+        start_time = datetime.now()
+        history = history or []
+        text = posts['title'].fillna('').astype(str)
+        for column in ('body', 'strategic_signal'):
+            if column in posts.columns:
+                text = text + ' ' + posts[column].fillna('').astype(str)
+        texts = text.tolist() + [str(h.get('question', '')) for h in history]
+        weights = np.concatenate([np.ones(len(posts)), np.full(len(history), history_weight)]).astype(np.float32)
+
+        vocabulary, term_ids, doc_ids, counts, num_docs = term_document_counts({"text": texts})
+        doc_freq = np.bincount(term_ids, minlength=len(vocabulary))
+        idf = (np.log((1 + num_docs) / (1 + doc_freq)) + 1).astype(np.float32)
+        values = (1 + np.log(counts)) * idf[term_ids]
+        norms = np.sqrt(np.bincount(doc_ids, weights=values.astype(np.float64) ** 2, minlength=num_docs))
+        values = (values / np.maximum(norms[doc_ids], 1e-12) * weights[doc_ids]).astype(np.float32)
+
+        centroids = {}
+        for dim in ROUTED_DIMENSIONS:
+            if dim not in posts.columns:
+                continue
+            labels = posts[dim].tolist() + [h.get(dim) for h in history]
+            codes, names = pd.factorize(pd.Series(labels, dtype=object), sort=True)
+            if len(names) < 2:
+                continue
+            matrix = np.zeros((len(names), len(vocabulary)), dtype=np.float32)
+            labelled = codes[doc_ids] >= 0
+            np.add.at(matrix, (codes[doc_ids][labelled], term_ids[labelled]), values[labelled])
+            matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+            centroids[dim] = ([str(n) for n in names], matrix)
+
+        duration = (datetime.now() - start_time).total_seconds()
+        logger.info(f"🧭 Built question router over {', '.join(centroids)} in {duration:.2f}s")
+        return cls(vocabulary, idf, centroids)
+
+    def _vector(self, question: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        counts: Dict[int, int] = {}
+        for token in tokenize(question):
+            column = self.vocabulary.get(token)
+            if column is not None:
+                counts[column] = counts.get(column, 0) + 1
+        if not counts:
+            return None
+        columns = np.fromiter(counts.keys(), dtype=np.int64)
+        values = (1 + np.log(np.fromiter(counts.values(), dtype=np.float32))) * self.idf[columns]
+        return columns, values / np.linalg.norm(values)
+
+    def route(self, question: str) -> Dict[str, Dict]:
+        """Confident labels per dimension: {dim: {"label", "similarity", "margin"}}"""
+        vector = self._vector(question)
+        if vector is None:
+            return {}
+        columns, values = vector
+        routes = {}
+        for dim, (names, matrix) in self.centroids.items():
+            similarities = matrix[:, columns] @ values
+            ranked = np.argsort(-similarities)
+            best, runner_up = similarities[ranked[0]], similarities[ranked[1]]
+            margin = float((best - runner_up) / best) if best > 0 else 0.0
+            if best >= self.min_similarity and margin >= self.min_margin:
+                routes[dim] = {"label": names[ranked[0]], "similarity": round(float(best), 3), "margin": round(margin, 3)}
+        return routes
+
+    @staticmethod
+    def path(base_path: str) -> str:
+        return f"{base_path}.router.npz"
+
+    def save(self, base_path: str, fingerprint: str) -> bool:
+        """Persist the vocabulary, idf and per-dimension label centroids"""
+        arrays = {"terms": np.array(list(self.vocabulary), dtype=str), "idf": self.idf,
+                  "dimensions": np.array(list(self.centroids), dtype=str)}
+        for dim, (names, matrix) in self.centroids.items():
+            arrays[f"{dim}__names"] = np.array(names, dtype=str)
+            arrays[f"{dim}__matrix"] = matrix
+        return save_arrays(self.path(base_path), arrays, self.FORMAT_VERSION, fingerprint)
+
+    @classmethod
+    def load(cls, base_path: str, fingerprint: str) -> Optional['QuestionRouter']:
+        """Load a persisted router, or None if missing or trained on other data"""
+        stored = load_arrays(cls.path(base_path), cls.FORMAT_VERSION, fingerprint)
+        if stored is None:
+            return None
+        vocabulary = {term: i for i, term in enumerate(stored["terms"].tolist())}
+        centroids = {
+            dim: (stored[f"{dim}__names"].tolist(), stored[f"{dim}__matrix"])
+            for dim in stored["dimensions"].tolist()
+        }
+        logger.info(f"⚡ Loaded question router over {', '.join(centroids)}")
+        return cls(vocabulary, stored["idf"], centroids)
+
+
+def load_or_build_router(posts: pd.DataFrame, history: List[Dict], base_path: str,
+                         fingerprint: str, rebuild: bool = False) -> QuestionRouter:
+    """Reuse the persisted router for this dataset and question history, training (and saving) it if needed"""
+    # Labelled history changes the centroids as much as the posts do
+    history_hash = hashlib.sha256(json.dumps(history, sort_keys=True, default=str).encode('utf-8')).hexdigest()
+    fingerprint = f"{fingerprint}:{history_hash}"
+    if not rebuild:
+        router = QuestionRouter.load(base_path, fingerprint)
+        if router is not None:
+            return router
+    router = QuestionRouter.build(posts, history)
+    router.save(base_path, fingerprint)
+    return router
+
+
+# Penalty weight per facet: how much a candidate loses as its value's share of the selection grows
+DIVERSITY_WEIGHTS = {'subreddit': 0.15, 'ceo_question_category': 0.10, 'sentiment': 0.05}
+
+
+class DiversitySelector:
+    """Maximal marginal relevance (MMR) re-selection of ranked candidates
+
+    Each step picks the candidate maximising
+        lambda * relevance - (1 - lambda) * max cosine to the picks so far
+        - sum over facets of weight * share of picks with the candidate's value
+    Facet values are factorized once at build, so selection is a short loop
+    of vectorised updates over the candidate pool.
+    """
+
+    def __init__(self, vectors: np.ndarray, codes: Dict[str, np.ndarray], weights: Dict[str, float],
+                 mmr_lambda: float = 0.7):
+        self.vectors = vectors
+        self.codes = codes
+        self.weights = weights
+        self.mmr_lambda = mmr_lambda
+
+    @classmethod
+    def build(cls, posts: pd.DataFrame, vectors: np.ndarray, weights: Optional[Dict[str, float]] = None,
+              mmr_lambda: float = 0.7) -> 'DiversitySelector':
+        weights = dict(DIVERSITY_WEIGHTS if weights is None else weights)
+        codes = {}
+        for dim in list(weights):
+            if dim not in posts.columns:
+                weights.pop(dim)
+                continue
+            codes[dim] = pd.factorize(posts[dim].fillna('Unknown').astype(str))[0].astype(np.int32)
+        return cls(vectors, codes, weights, mmr_lambda)
+
+    def select(self, rows: np.ndarray, k: int, relevance: Optional[np.ndarray] = None) -> np.ndarray:
+        """Pick k of the ranked candidate rows, in pick order
+
+        relevance is aligned with rows; by default it decays with rank.
+        """
+        num_candidates = len(rows)
+        if num_candidates <= 1 or k <= 0:
+            return rows[:k]
+        k = min(k, num_candidates)
+        if relevance is None:
+            relevance = 1.0 / np.log2(np.arange(num_candidates) + 2)
+        relevance = np.asarray(relevance, dtype=np.float32)
+        span = relevance.max() - relevance.min()
+        relevance = (relevance - relevance.min()) / span if span > 0 else np.ones(num_candidates, dtype=np.float32)
+
+        vectors = np.asarray(self.vectors[rows], dtype=np.float32)
+        codes = {dim: c[rows] for dim, c in self.codes.items()}
+        group_counts = {dim: np.zeros(c.max() + 1, dtype=np.float32) for dim, c in codes.items()}
+        max_similarity = np.zeros(num_candidates, dtype=np.float32)
+        available = np.ones(num_candidates, dtype=bool)
+        picks = np.empty(k, dtype=np.int64)
+
+        for step in range(k):
+            score = self.mmr_lambda * relevance - (1 - self.mmr_lambda) * max_similarity
+            if step > 0:
+                for dim, c in codes.items():
+                    score -= self.weights[dim] * group_counts[dim][c] / step
+            score[~available] = -np.inf
+            pick = int(np.argmax(score))
+            picks[step] = pick
+            available[pick] = False
+            np.maximum(max_similarity, vectors @ vectors[pick], out=max_similarity)
+            for dim, c in codes.items():
+                group_counts[dim][c[pick]] += 1
+        return rows[picks]
+
+
+RANKING_FEATURES = ('retrieval', 'relevance', 'confidence', 'freshness', 'engagement')
+DEFAULT_RANKING_WEIGHTS = {'retrieval': 0.5, 'relevance': 0.2, 'confidence': 0.1, 'freshness': 0.1, 'engagement': 0.1}
+DEFAULT_HALF_LIFE_DAYS = 180.0
+CONFIDENCE_SCORES = {'HIGH': 1.0, 'MEDIUM': 0.6, 'LOW': 0.3}
+
+
+def _unit_scale(values: np.ndarray) -> np.ndarray:
+    """Scale non-negative values into [0, 1] by their maximum"""
+    values = np.nan_to_num(np.asarray(values, dtype=np.float32), nan=0.0)
+    top = values.max() if len(values) else 0.0
+    return values / top if top > 0 else np.zeros_like(values)
+
+
+class CompositeRanker:
+    """Weighted sum of per-post features, all scaled to [0, 1]
+
+    relevance, confidence and engagement are fixed per dataset and stored as
+    arrays; freshness is exp(-ln 2 * age / half_life) over precomputed ages
+    (relative to the newest post), so a request with its own half-life is
+    still a single vector pass. retrieval is the query's BM25/semantic score.
+    Weights come from the defaults, then per-category overrides, then the
+    request's own overrides, and are normalised to sum to 1.
+    """
+
+    def __init__(self, features: Dict[str, np.ndarray], age_days: np.ndarray,
+                 weights: Optional[Dict[str, float]] = None, half_life_days: float = DEFAULT_HALF_LIFE_DAYS,
+                 category_weights: Optional[Dict[str, Dict[str, float]]] = None):
+        self.features = features
+        self.age_days = age_days
+        self.weights = dict(DEFAULT_RANKING_WEIGHTS if weights is None else weights)
+        self.half_life_days = half_life_days
+        self.category_weights = category_weights or {}
+
+    @classmethod
+    def build(cls, posts: pd.DataFrame, comments: pd.DataFrame, offsets: np.ndarray,
+              weights: Optional[Dict[str, float]] = None, half_life_days: float = DEFAULT_HALF_LIFE_DAYS,
+              category_weights: Optional[Dict[str, Dict[str, float]]] = None) -> 'CompositeRanker':
+        relevance = pd.to_numeric(posts['relevance_score'], errors='coerce').to_numpy() \
+            if 'relevance_score' in posts.columns else np.zeros(len(posts))
+        confidence = posts['confidence_level'].map(CONFIDENCE_SCORES).fillna(0.5).to_numpy() \
+            if 'confidence_level' in posts.columns else np.full(len(posts), 0.5)
+
+        # Engagement: comment volume and the best comment's score, both log-damped
+        num_comments = pd.to_numeric(posts['num_comments_scraped'], errors='coerce').fillna(0).to_numpy() \
+            if 'num_comments_scraped' in posts.columns else np.diff(offsets)
+        top_comment = np.zeros(len(posts))
+        has_comments = np.diff(offsets) > 0
+        top_comment[has_comments] = comments['score'].to_numpy()[offsets[:-1][has_comments]]
+        engagement = 0.5 * _unit_scale(np.log1p(np.maximum(num_comments, 0))) + \
+            0.5 * _unit_scale(np.log1p(np.maximum(top_comment, 0)))
+
+        created = posts['created_at'] if 'created_at' in posts.columns else pd.Series(pd.NaT, index=posts.index)
+        age_days = ((created.max() - created).dt.total_seconds() / 86400).to_numpy(dtype=np.float32, na_value=np.nan)
+
+        features = {
+            'relevance': _unit_scale(np.maximum(np.nan_to_num(relevance, nan=0.0), 0)),
+            'confidence': confidence.astype(np.float32),
+            'engagement': engagement.astype(np.float32),
+        }
+        return cls(features, age_days, weights, half_life_days, category_weights)
+
+    def resolve(self, overrides: Optional[Dict[str, float]] = None,
+                category: Optional[str] = None) -> Tuple[Dict[str, float], float]:
+        """Effective (weights, half_life_days) for a request"""
+        weights = dict(self.weights)
+        half_life = self.half_life_days
+        for layer in (self.category_weights.get(category) if category else None, overrides):
+            if not layer:
+                continue
+            weights.update({k: float(v) for k, v in layer.items() if k in RANKING_FEATURES})
+            half_life = float(layer.get('half_life_days', half_life))
+        total = sum(max(w, 0.0) for w in weights.values())
+        if total > 0:
+            weights = {k: max(w, 0.0) / total for k, w in weights.items()}
+        return weights, half_life
+
+    def score(self, rows: np.ndarray, retrieval_scores: Optional[np.ndarray] = None,
+              overrides: Optional[Dict[str, float]] = None, category: Optional[str] = None) -> np.ndarray:
+        """Composite score of each row (retrieval_scores aligned with rows, any scale)"""
+        weights, half_life = self.resolve(overrides, category)
+        score = np.zeros(len(rows), dtype=np.float32)
+        for name, feature in self.features.items():
+            if weights.get(name):
+                score += weights[name] * feature[rows]
+        if weights.get('freshness'):
+            freshness = np.exp(-np.log(2) * self.age_days[rows] / max(half_life, 1e-6))
+            score += weights['freshness'] * np.nan_to_num(freshness, nan=0.0).astype(np.float32)
+        if weights.get('retrieval') and retrieval_scores is not None:
+            score += weights['retrieval'] * _unit_scale(np.maximum(retrieval_scores, 0))
+        return score
+
+    def rank(self, rows: np.ndarray, retrieval_scores: Optional[np.ndarray] = None,
+             overrides: Optional[Dict[str, float]] = None, category: Optional[str] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Rows re-ordered by composite score (ties keep retrieval order), with their scores"""
+        score = self.score(rows, retrieval_scores, overrides, category)
+        order = np.argsort(-score, kind='stable')
+        return rows[order], score[order]
+
+
+def load_ranking_config(value: Optional[str]) -> Dict:
+    """Ranking weights from a JSON string or a path to a JSON file"""
+    if not value:
+        return {}
+    try:
+        if os.path.exists(value):
+            with open(value, 'r') as f:
+                return json.load(f)
+        return json.loads(value)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not parse ranking config {value[:80]}: {str(e)}")
+        return {}
+
+
+def load_router_history(path: Optional[str]) -> List[Dict]:
+    """Labelled past questions from a JSONL file (missing file = no history)"""
+    if not path or not os.path.exists(path):
+        return []
+    history = []
+    with open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                history.append(json.loads(line))
+            except ValueError:
+                logger.warning(f"⚠️ Skipping malformed router history line in {path}")
+    return history
+
+
+if __name__ == "__main__":
+    # Index-build CLI: python sage_retrieval.py build-semantic|build-indexes [data_path]
+    # build-indexes also persists everything else the agent would otherwise compute at startup
+    import argparse
+    from sage_data import load_dataset, comment_offsets
+    from sage_context import render_post_fragments, load_or_build_token_counts
+
+    parser = argparse.ArgumentParser(description="Build Sage retrieval indexes")
+    parser.add_argument("command", choices=["build-semantic", "build-indexes"])
+    parser.add_argument("data_path", nargs="?", default=os.getenv("DATA_PATH", "results/rpotential_filtered_focused_data.csv"))
+    parser.add_argument("--rebuild", action="store_true", help="Rebuild even if a current index exists")
+    args = parser.parse_args()
+
+    try:
+        start_time = datetime.now()
+        tables, snapshot = load_dataset(args.data_path)
+        posts, comments = tables['posts'], tables['comments']
+        index = load_or_build_semantic_index(
+            posts, comments, snapshot.artifact_base, snapshot.source_hash, rebuild=args.rebuild
+        )
+        print(f"Semantic index ready: {index.num_docs} posts × {index.dimensions} dims")
+        if args.command == "build-indexes":
+            post_blocks, comment_blocks = render_post_fragments(posts, comments, comment_offsets(comments, len(posts)))
+            load_or_build_token_counts(post_blocks, comment_blocks, snapshot.artifact_base, snapshot.source_hash,
+                                       rebuild=args.rebuild)
+            print("Context token counts ready")
+            bm25 = load_or_build_bm25_index(posts, comments, snapshot.artifact_base, snapshot.source_hash,
+                                            rebuild=args.rebuild)
+            print(f"BM25 index ready: {len(bm25.vocabulary):,} terms")
+            router = load_or_build_router(posts, load_router_history(os.getenv("ROUTER_HISTORY_PATH")),
+                                          snapshot.artifact_base, snapshot.source_hash, rebuild=args.rebuild)
+            print(f"Question router ready: {', '.join(router.centroids)}")
+        duration = (datetime.now() - start_time).total_seconds()
+        print(f"Done in {duration:.2f}s")
+    except Exception as e:
+        logger.error(f"❌ Failed to build indexes: {str(e)}")
+        logger.error(traceback.format_exc())
+        sys.exit(1)
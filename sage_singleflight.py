@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Sage Single-Flight - coalescing of identical in-flight requests
+The first request for a key starts the work; concurrent requests for the same
+key wait on that work (or subscribe to its event stream) instead of starting
+their own. The work is cancelled only once every waiter has gone away.
+"""
+
+import asyncio
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+
+class SingleFlight:
+    """One shared task per key for awaitable work"""
+
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._tasks
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Result of the work for key, and whether it was shared with an earlier caller
+
+        factory is only called if no work for key is in flight. Cancelling a
+        caller stops it waiting; the work itself is cancelled with the last one.
+        A caller that joins shares the work as the first caller started it,
+        deadline included: it gets the first caller's result or timeout, which
+        may come before its own deadline.
+        """
+        task = self._tasks.get(key)
+        if task is not None and task.cancelled():
+            # Cancelled, but its done callback has not run yet: start over
+            task = None
+        shared = task is not None
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._tasks[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            logger.info(f"🔗 Joined in-flight request {key[:12]} ({self._waiters.get(key, 0)} already waiting)")
+
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            return await asyncio.shield(task), shared
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                if not task.done():
+                    logger.info(f"🛑 Last waiter left, cancelling request {key[:12]}")
+                    # Forget it now so a caller arriving before the cancellation lands starts afresh
+                    self._forget(key, task)
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+
+
+class _Broadcast:
+    """Events of one in-flight stream, replayable from the start for late subscribers"""
+
+    def __init__(self):
+        self.events: List[Any] = []
+        self.finished = False
+        self.subscribers = 0
+        self.changed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+
+    def publish(self, item: Any):
+        self.events.append(item)
+        self._notify()
+
+    def finish(self):
+        self.finished = True
+        self._notify()
+
+    def _notify(self):
+        changed, self.changed = self.changed, asyncio.Event()
+        changed.set()
+
+
+class StreamFlight:
+    """One shared producer per key for async event streams, fanned out to every subscriber"""
+
+    def __init__(self):
+        self._broadcasts: Dict[str, _Broadcast] = {}
+
+    def __len__(self) -> int:
+        return len(self._broadcasts)
+
+    async def subscribe(self, key: str, factory: Callable[[], AsyncIterator[Any]],
+                        on_error: Optional[Callable[[Exception], Any]] = None) -> AsyncIterator[Any]:
+        """Iterate the stream for key, starting it with factory if none is in flight
+
+        Late subscribers first receive every event published so far. on_error
+        turns an exception escaping the producer into a final event.
+        """
+        broadcast = self._broadcasts.get(key)
+        if broadcast is None:
+            broadcast = _Broadcast()
+            self._broadcasts[key] = broadcast
+            broadcast.task = asyncio.ensure_future(self._pump(key, broadcast, factory(), on_error))
+            broadcast.task.add_done_callback(lambda done: self._close(key, broadcast))
+        else:
+            logger.info(f"🔗 Joined in-flight stream {key[:12]} ({broadcast.subscribers} already subscribed)")
+
+        broadcast.subscribers += 1
+        position = 0
+        try:
+            while True:
+                changed = broadcast.changed
+                while position < len(broadcast.events):
+                    yield broadcast.events[position]
+                    position += 1
+                if broadcast.finished:
+                    return
+                await changed.wait()
+        finally:
+            broadcast.subscribers -= 1
+            if broadcast.subscribers == 0 and not broadcast.task.done():
+                logger.info(f"🛑 Last subscriber left, cancelling stream {key[:12]}")
+                broadcast.task.cancel()
+
+    async def _pump(self, key: str, broadcast: _Broadcast, stream: AsyncIterator[Any],
+                    on_error: Optional[Callable[[Exception], Any]]):
+        try:
+            async for item in stream:
+                broadcast.publish(item)
+        except Exception as e:
+            logger.error(f"❌ Shared stream {key[:12]} failed: {str(e)}")
+            if on_error is not None:
+                broadcast.publish(on_error(e))
+
+    def _close(self, key: str, broadcast: _Broadcast):
+        """Runs when the producer ends for any reason, including cancellation before it started"""
+        # Stop taking subscribers first: anyone arriving now starts fresh (or hits the cache)
+        if self._broadcasts.get(key) is broadcast:
+            del self._broadcasts[key]
+        broadcast.finish()
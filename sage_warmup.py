@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Sage Warm-up - precomputes answers before users ask for them
+QuestionTraffic: log of asked questions (SQLite, shared by every worker on the
+host) answering "what was asked most recently"
+CacheWarmer: works through a warm-up question list at low priority, under a
+concurrency limit and a per-run token budget, and reports its progress
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+
+from sage_context import estimate_tokens
+
+DEFAULT_WARMUP_CONCURRENCY = 2
+DEFAULT_WARMUP_TOKEN_BUDGET = 2_000_000
+# How long a warm-up job waits between checks while live traffic is busy
+BUSY_POLL_SECONDS = 1.0
+
+
+class QuestionTraffic:
+    """Timestamped log of the questions users asked
+
+    With a path the log lives in SQLite (the answer cache file works), so
+    every worker contributes; otherwise it is in memory for this process.
+    Rows older than the window asked for are pruned on read. Request
+    handlers use record_soon(), which writes on a background thread.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or ":memory:"
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._lock = threading.Lock()
+        # One writer thread: inserts queue up in order and never block the event loop
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sage-traffic")
+        self._conn = sqlite3.connect(self.path, timeout=5.0, check_same_thread=False, isolation_level=None)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS questions_asked (
+                question TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                estimates_ok INTEGER NOT NULL,
+                asked_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS questions_asked_at ON questions_asked (asked_at)")
+
+    def record(self, question: str, estimates_ok: bool):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO questions_asked (question, normalized, estimates_ok, asked_at) VALUES (?, ?, ?, ?)",
+                (question.strip(), question.lower().strip(), int(estimates_ok), time.time())
+            )
+
+    def record_soon(self, question: str, estimates_ok: bool) -> Future:
+        """record() on the writer thread; a failed write is logged, not raised"""
+        future = self._writer.submit(self.record, question, estimates_ok)
+        future.add_done_callback(self._log_failure)
+        return future
+
+    @staticmethod
+    def _log_failure(future: Future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning(f"⚠️ Could not record asked question: {str(future.exception())}")
+
+    def top(self, limit: int, window_seconds: float) -> List[Tuple[str, bool, int]]:
+        """Most asked (question, estimates_ok, times asked) within the window, most asked first"""
+        since = time.time() - window_seconds
+        with self._lock:
+            self._conn.execute("DELETE FROM questions_asked WHERE asked_at <= ?", (since,))
+            # With MAX(), SQLite takes the bare question column from the latest row: its latest wording
+            rows = self._conn.execute("""
+                SELECT question, estimates_ok, COUNT(*) AS asks, MAX(asked_at)
+                FROM questions_asked
+                GROUP BY normalized, estimates_ok
+                ORDER BY asks DESC, MAX(asked_at) DESC
+                LIMIT ?
+            """, (limit,)).fetchall()
+        return [(question, bool(estimates_ok), asks) for question, estimates_ok, asks, _ in rows]
+
+
+def answer_token_cost(answer: Dict) -> int:
+    """Model tokens an answer cost: reported usage, else context estimate plus answer text"""
+    if isinstance(answer.get("token_usage"), int):
+        return answer["token_usage"]
+    context_tokens = answer.get("context_tokens") or {}
+    return int(context_tokens.get("total", 0)) + estimate_tokens(answer.get("full_answer", ""))
+
+
+class CacheWarmer:
+    """Runs warm-up passes over a question list
+
+    warm(question, estimates_ok) computes and caches one answer, returning the
+    tokens it spent, or None if nothing had to be done (answer still fresh).
+    busy() reports live traffic; while it is true no new warm-up job starts.
+    A pass stops starting jobs once its token budget is spent.
+    """
+
+    def __init__(self, warm: Callable[[str, bool], Awaitable[Optional[int]]],
+                 max_concurrent: int = DEFAULT_WARMUP_CONCURRENCY,
+                 token_budget: int = DEFAULT_WARMUP_TOKEN_BUDGET,
+                 busy: Optional[Callable[[], bool]] = None):
+        self.warm = warm
+        self.max_concurrent = max_concurrent
+        self.token_budget = token_budget
+        self.busy = busy
+        self.runs = 0
+        self.ready = False
+        self.progress: Dict = {"status": "pending"}
+
+    async def run(self, questions: List[Tuple[str, bool]]):
+        """One warm-up pass over (question, estimates_ok) pairs, in order"""
+        progress = {
+            "status": "running",
+            "total": len(questions),
+            "done": 0,
+            "warmed": 0,
+            "already_fresh": 0,
+            "failed": 0,
+            "skipped_budget": 0,
+            "tokens_used": 0,
+            "token_budget": self.token_budget,
+            "started_at": time.time(),
+            "finished_at": None,
+        }
+        self.progress = progress
+        logger.info(f"🔥 Cache warm-up started for {len(questions)} questions")
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def job(question: str, estimates_ok: bool):
+            async with semaphore:
+                while self.busy is not None and self.busy():
+                    await asyncio.sleep(BUSY_POLL_SECONDS)
+                if progress["tokens_used"] >= self.token_budget:
+                    progress["skipped_budget"] += 1
+                else:
+                    try:
+                        spent = await self.warm(question, estimates_ok)
+                        if spent is None:
+                            progress["already_fresh"] += 1
+                        else:
+                            progress["warmed"] += 1
+                            progress["tokens_used"] += spent
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        progress["failed"] += 1
+                        logger.warning(f"⚠️ Warm-up failed for '{question[:50]}': {str(e)}")
+                progress["done"] += 1
+
+        try:
+            await asyncio.gather(*(job(question, estimates_ok) for question, estimates_ok in questions))
+        finally:
+            progress["status"] = "finished" if progress["done"] == progress["total"] else "cancelled"
+            progress["finished_at"] = time.time()
+            self.runs += 1
+            self.ready = True
+        logger.info(
+            f"🔥 Cache warm-up finished: {progress['warmed']} warmed, {progress['already_fresh']} already fresh, "
+            f"{progress['failed']} failed, {progress['skipped_budget']} over budget, ~{progress['tokens_used']:,} tokens "
+            f"in {progress['finished_at'] - progress['started_at']:.1f}s"
+        )
+
+    async def run_forever(self, questions: Callable[[], List[Tuple[str, bool]]], interval: float):
+        """A pass now, then every interval seconds (interval <= 0: only the first)"""
+        while True:
+            try:
+                await self.run(questions())
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Cache warm-up pass failed: {str(e)}")
+            if interval <= 0:
+                return
+            await asyncio.sleep(interval)
+
+    def stats(self) -> Dict:
+        return {"ready": self.ready, "runs": self.runs, "max_concurrent": self.max_concurrent, **self.progress}
@@ -0,0 +1,92 @@
+"""Shared fixtures: a small synthetic enriched-posts CSV and agents built on it"""
+
+import csv
+import datetime
+import json
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+WORDS = ("agent ai workforce talent competitor redundancy layoffs upskill burnout attrition productivity automation "
+         "integration deployment security budget roi pricing hiring retention leadership manager skills copilot").split()
+SUBREDDITS = ["salesforce", "agentforce", "devops", "cscareerquestions"]
+
+
+def post_row(i: int, rng: random.Random, **overrides) -> dict:
+    created = datetime.datetime(2025, 10, 24) - datetime.timedelta(days=rng.randint(0, 800))
+    body = " ".join(rng.choices(WORDS, k=rng.randint(10, 40)))
+    comments = [{"author": f"user{rng.randint(1, 50)}", "score": rng.randint(0, 100),
+                 "body": " ".join(rng.choices(WORDS, k=10)), "created_utc": created.timestamp()}
+                for _ in range(rng.randint(0, 3))]
+    row = dict(
+        post_id=f"p{i}", url=f"https://reddit.com/r/x/comments/p{i}/", title=" ".join(rng.choices(WORDS, k=6)).title(),
+        body=body, username=f"u{i}", subreddit=rng.choice(SUBREDDITS),
+        created_at=created.strftime("%Y-%m-%d %H:%M:%S+00:00"),
+        ceo_question_category=rng.choice(["Implementation Reality", "Competitive Intelligence", "Budget/ROI"]),
+        strategic_signal="signal " + body[:40], confidence_level=rng.choice(["HIGH", "MEDIUM"]),
+        sentiment=rng.choice(["Negative", "Positive", "Mixed"]),
+        actionability=rng.choice(["Risk Mitigation", "Opportunity Detection", "Decision Support"]),
+        temporal_context="Immediate", companies_mentioned="Salesforce, OpenAI", products_mentioned="Copilot",
+        roles_mentioned="Manager", tags=", ".join(rng.sample(WORDS, 3)), relevance_score=round(rng.uniform(0, 5), 2),
+        relevance_category="High", num_comments_scraped=len(comments), num_comments_claimed=len(comments),
+        all_scraped_comments_json=json.dumps(comments),
+    )
+    row.update(overrides)
+    return row
+
+
+def write_posts_csv(path, rows: list):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def synthetic_rows(n: int, seed: int = 1) -> list:
+    rng = random.Random(seed)
+    return [post_row(i, rng) for i in range(n)]
+
+
+@pytest.fixture
+def make_agent(monkeypatch):
+    """Build a SageAgent over a CSV; index options kept small so tests stay fast"""
+    monkeypatch.setenv("QUESTION_ROUTING", "false")
+    monkeypatch.setenv("DIVERSITY_SELECTION", "false")
+    monkeypatch.setenv("SEMANTIC_CACHE", "false")
+
+    def build(data_path, **env):
+        for key, value in env.items():
+            monkeypatch.setenv(key, value)
+        from sage_agent_simple import SageAgent
+        return SageAgent(data_path=str(data_path))
+
+    return build
+
+
+@pytest.fixture(scope="session")
+def chat_api(tmp_path_factory):
+    """The chat_interface module over a synthetic CSV, with a throwaway answer cache and no background jobs"""
+    workdir = tmp_path_factory.mktemp("api")
+    data_path = workdir / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(300))
+    cache_path = workdir / "answers.sqlite3"
+    # An answer left over from a previous dataset version, as after a restart with a new CSV
+    from sage_cache import SQLiteAnswerCache
+    SQLiteAnswerCache(str(cache_path)).set("previous-version-answer", {"full_answer": "old"}, "previous-version")
+    os.environ.update({
+        "DATA_PATH": str(data_path),
+        "ANSWER_CACHE_PATH": str(cache_path),
+        "CONVERSATIONS_DB": str(workdir / "conversations.sqlite3"),
+        "WARMUP_ENABLED": "false",
+        "DATASET_CHECK_SECONDS": "0",
+        "QUESTION_ROUTING": "false",
+        "DIVERSITY_SELECTION": "false",
+        "SEMANTIC_CACHE": "false",
+    })
+    import chat_interface
+    return chat_interface
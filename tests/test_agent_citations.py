@@ -0,0 +1,20 @@
+"""Citations describe the posts the model was actually given"""
+
+from conftest import synthetic_rows, write_posts_csv
+
+
+def test_citations_are_the_packed_posts(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(300))
+    # A small budget packs fewer posts than the top 20 retrieved
+    agent = make_agent(data_path, SAGE_CONTEXT_TOKEN_BUDGET="3000")
+
+    prepared = agent.prepare_answer("talent retention budget")
+    metadata = agent._call_pinned(prepared["state"], agent._answer_metadata, prepared["rows"], prepared["summary"],
+                                  prepared["context_rows"])
+
+    citations = metadata["citations"]
+    assert len(citations) == prepared["details"]["context_tokens"]["posts_included"]
+    assert [c["post_id"] for c in citations] == agent.df["post_id"].iloc[prepared["context_rows"]].tolist()
+    for n, citation in enumerate(citations, 1):
+        assert f"[POST {n}] " in prepared["context"] and citation["url"] in prepared["context"]
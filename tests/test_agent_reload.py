@@ -0,0 +1,36 @@
+"""Dataset reload: the new dataset replaces the old one as a whole"""
+
+import numpy as np
+
+from conftest import synthetic_rows, write_posts_csv
+
+
+def test_reload_refreshes_overview_counts(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    rows = synthetic_rows(400)
+    write_posts_csv(data_path, rows)
+    agent = make_agent(data_path)
+    assert agent.summary["posts"] == 400
+
+    write_posts_csv(data_path, rows[:200])
+    assert agent.reload_if_changed()
+
+    assert len(agent.df) == 200
+    assert agent.summary["posts"] == 200
+    assert agent.summary["comments"] == int(agent.comment_counts.sum())
+    overview = "\n".join(agent._render_overview(agent._summarize(np.arange(200))))
+    assert overview.startswith("DATASET OVERVIEW: 200 posts")
+
+
+def test_pinned_state_survives_reload(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    rows = synthetic_rows(300)
+    write_posts_csv(data_path, rows)
+    agent = make_agent(data_path)
+
+    with agent.pinned_state() as state:
+        write_posts_csv(data_path, rows[:100])
+        assert agent.reload_if_changed()
+        # A request in flight keeps reading the state it started with
+        assert agent.df is state.df and len(agent.df) == 300
+    assert len(agent.df) == 100
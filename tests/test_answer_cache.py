@@ -0,0 +1,35 @@
+"""/api/answer caching: answers are cached, error answers are not"""
+
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+
+
+def test_error_answer_is_not_cached(chat_api, monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        if len(calls) == 1:
+            raise RuntimeError("upstream unavailable")
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Summary.\n\nBody."))])
+
+    monkeypatch.setattr(chat_api.agent.async_client.chat.completions, "create", create)
+    monkeypatch.setattr(chat_api.limiter, "enabled", False)
+    client = TestClient(chat_api.app)
+    question = {"question": "how are competitors hiring agent talent"}
+
+    first = client.post("/api/answer", json=question).json()
+    assert first["answer"].get("error") and not first["cached"]
+
+    second = client.post("/api/answer", json=question).json()
+    assert not second["answer"].get("error") and not second["cached"]
+    assert len(calls) == 2
+
+    third = client.post("/api/answer", json=question).json()
+    assert third["cached"] and len(calls) == 2
+
+
+def test_startup_drops_answers_of_other_versions(chat_api):
+    # conftest seeds the cache file with an answer computed under another version before import
+    assert chat_api.answer_cache.time_to_live("previous-version-answer") is None
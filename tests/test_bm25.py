@@ -0,0 +1,66 @@
+"""BM25Index ranks by term rarity, frequency, field and length, and survives a save/load round trip"""
+
+import numpy as np
+
+from sage_retrieval import BM25Index, load_or_build_bm25_index
+
+FIELDS = {
+    "title": ["Layoffs at the vendor", "", "Quarterly update", "", "", ""],
+    "body": [
+        "budget review",
+        "layoffs announced in the layoffs memo",
+        "layoffs",
+        "layoffs mentioned once in a much longer post about budget planning hiring roadmap and offsites",
+        "copilot pricing",
+        "budget budget",
+    ],
+    "comments": ["", "", "", "", "", "the copilot rollout"],
+}
+
+
+def test_ranking():
+    index = BM25Index.build(FIELDS)
+
+    scores = index.score("layoffs")
+    # A title mention beats a body mention, two mentions beat one, a short post beats a long one
+    assert scores[0] > scores[2]
+    assert scores[1] > scores[2]
+    assert scores[2] > scores[3] > 0
+    assert scores[4] == scores[5] == 0
+
+    # Plurals fold onto the same term; the rarer term decides between equal matches
+    assert np.array_equal(index.score("layoff"), scores)
+    combined = index.score("copilot budget")
+    assert combined[4] > combined[0]
+    assert combined[5] > combined[4]
+
+    assert not index.score("the and of").any()
+    assert not index.score("unseen words").any()
+
+
+def test_save_load_round_trip(tmp_path):
+    index = BM25Index.build(FIELDS)
+    base = str(tmp_path / "posts")
+    assert index.save(base, "fingerprint")
+
+    loaded = BM25Index.load(base, "fingerprint")
+    assert loaded.vocabulary == index.vocabulary
+    for query in ("layoffs", "copilot budget", "pricing review"):
+        assert np.array_equal(loaded.score(query), index.score(query))
+    assert BM25Index.load(base, "other-dataset") is None
+
+
+def test_load_or_build_rebuilds_for_another_dataset(tmp_path, make_agent):
+    from conftest import synthetic_rows, write_posts_csv
+    data_path = tmp_path / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(40))
+    agent = make_agent(data_path, RETRIEVAL_MODE="bm25")
+    base, fingerprint = agent.snapshot.artifact_base, agent.snapshot.source_hash
+
+    stored = BM25Index.load(base, fingerprint)
+    assert stored is not None and stored.num_docs == 40
+    assert np.array_equal(stored.score("agent budget"), agent.bm25.score("agent budget"))
+
+    rebuilt = load_or_build_bm25_index(agent.df, agent.comments, base, "changed-dataset")
+    assert np.array_equal(rebuilt.score("agent budget"), agent.bm25.score("agent budget"))
+    assert BM25Index.load(base, fingerprint) is None
@@ -0,0 +1,62 @@
+"""ConversationStore: incremental saves, rewrites when earlier messages change"""
+
+import json
+
+from sage_conversations import ConversationStore
+
+
+def turn(i: int) -> list:
+    return [{"role": "user", "content": f"question {i}"}, {"role": "assistant", "content": f"answer {i}"}]
+
+
+def stored_rows(store: ConversationStore, conversation_id: str) -> list:
+    return store._conn.execute(
+        "SELECT seq, message FROM messages WHERE conversation_id = ? ORDER BY seq", (conversation_id,)
+    ).fetchall()
+
+
+def test_saving_a_longer_conversation_appends(tmp_path):
+    store = ConversationStore(str(tmp_path / "c.sqlite3"), legacy_file=None)
+    store.save("c1", {"title": "Hiring", "messages": turn(1)})
+    first_rows = stored_rows(store, "c1")
+    store.save("c1", {"title": "Hiring", "messages": turn(1) + turn(2)})
+
+    assert stored_rows(store, "c1")[:2] == first_rows
+    assert store.get("c1") == {"title": "Hiring", "messages": turn(1) + turn(2)}
+
+
+def test_editing_an_earlier_message_rewrites_the_conversation(tmp_path):
+    store = ConversationStore(str(tmp_path / "c.sqlite3"), legacy_file=None)
+    store.save("c1", {"messages": turn(1) + turn(2)})
+    edited = turn(1) + turn(2)
+    edited[0] = {"role": "user", "content": "question 1, rephrased"}
+    store.save("c1", {"messages": edited + turn(3)})
+
+    assert store.get("c1")["messages"] == edited + turn(3)
+    # Same length, different content is caught too
+    edited[3] = {"role": "assistant", "content": "answer 2, regenerated"}
+    store.save("c1", {"messages": edited + turn(3)})
+    assert store.get("c1")["messages"] == edited + turn(3)
+
+
+def test_truncated_conversation_is_stored_as_saved(tmp_path):
+    store = ConversationStore(str(tmp_path / "c.sqlite3"), legacy_file=None)
+    store.save("c1", {"messages": turn(1) + turn(2)})
+    store.save("c1", {"messages": turn(1)})
+    assert store.get("c1")["messages"] == turn(1)
+    store.save("c1", {"messages": turn(1) + turn(3)})
+    assert store.get("c1")["messages"] == turn(1) + turn(3)
+
+
+def test_reopen_and_legacy_import(tmp_path):
+    legacy = tmp_path / "conversations.json"
+    legacy.write_text(json.dumps({"old": {"title": "Imported", "messages": turn(1)}}))
+    path = str(tmp_path / "c.sqlite3")
+    ConversationStore(path, legacy_file=str(legacy)).save("new", {"messages": turn(2)})
+
+    reopened = ConversationStore(path, legacy_file=str(legacy))
+    assert len(reopened) == 2
+    assert reopened.get("old") == {"title": "Imported", "messages": turn(1)}
+    reopened.save("old", {"title": "Imported", "messages": turn(1) + turn(2)})
+    assert reopened.all()["old"]["messages"] == turn(1) + turn(2)
+    assert reopened.get("missing") == {}
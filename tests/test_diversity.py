@@ -0,0 +1,38 @@
+"""Diversity selection trades off the composite ranking scores, not just rank position"""
+
+import numpy as np
+
+from conftest import synthetic_rows, write_posts_csv
+from sage_retrieval import DiversitySelector
+
+
+def test_close_scores_outweigh_rank_position():
+    # Rows 0 and 1 are near-identical and scored almost alike; row 2 differs but scored nothing
+    vectors = np.array([[1, 0], [1, 0], [0, 1]], dtype=np.float32)
+    selector = DiversitySelector(vectors, codes={}, weights={}, mmr_lambda=0.7)
+    rows = np.arange(3)
+
+    assert selector.select(rows, 2).tolist() == [0, 2]
+    assert selector.select(rows, 2, np.array([1.0, 0.95, 0.0])).tolist() == [0, 1]
+
+
+def test_context_selection_gets_the_composite_scores(tmp_path, make_agent, monkeypatch):
+    data_path = tmp_path / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(300))
+    agent = make_agent(data_path, DIVERSITY_SELECTION="true")
+
+    seen = {}
+    select = agent.diversity.select
+
+    def recording_select(rows, k, relevance=None):
+        seen["rows"], seen["relevance"] = rows, relevance
+        return select(rows, k, relevance)
+
+    monkeypatch.setattr(agent.diversity, "select", recording_select)
+    with agent.pinned_state():
+        rows, scores = agent._find_all_relevant_posts("talent retention budget")
+    agent.prepare_answer("talent retention budget")
+
+    assert seen["relevance"] is not None
+    assert np.array_equal(seen["rows"], rows[:len(seen["rows"])])
+    assert np.allclose(seen["relevance"], scores[:len(seen["rows"])])
@@ -0,0 +1,52 @@
+"""QuestionRequest filter validation: bad filters are rejected with 422 before any work is done"""
+
+import pytest
+from pydantic import ValidationError
+
+
+@pytest.mark.parametrize("filters", [
+    {"subreddit": 5},
+    {"subreddit": []},
+    {"subreddit": ["salesforce", 3]},
+    {"subreddit": ""},
+    {"sentiment": {"in": "Negative"}},
+    {"since_days": "ninety"},
+    {"since_days": 0},
+    {"since_days": True},
+])
+def test_rejects_bad_filter_values(chat_api, filters):
+    with pytest.raises(ValidationError):
+        chat_api.QuestionRequest(question="what are people saying", filters=filters)
+
+
+def test_accepts_valid_filters(chat_api):
+    filters = {"subreddit": ["salesforce", "devops"], "sentiment": "Negative", "since_days": 90}
+    request = chat_api.QuestionRequest(question="what are people saying", filters=filters)
+    assert request.filters == filters
+
+
+@pytest.mark.parametrize("filters", [
+    {"date_from": "last week"},
+    {"date_to": "2025-13-45"},
+    {"date_from": 20250101},
+    {"date_from": "2025-06-01", "date_to": "2025-01-01"},
+])
+def test_rejects_bad_date_filters(chat_api, filters):
+    with pytest.raises(ValidationError):
+        chat_api.QuestionRequest(question="what are people saying", filters=filters)
+
+
+def test_accepts_date_range(chat_api):
+    filters = {"date_from": "2025-01-01", "date_to": "2025-01-01T00:00:00+00:00", "subreddit": ["salesforce"]}
+    request = chat_api.QuestionRequest(question="what are people saying", filters=filters)
+    assert request.filters == filters
+
+
+def test_inverted_date_range_is_422(chat_api):
+    from fastapi.testclient import TestClient
+    response = TestClient(chat_api.app).post("/api/answer", json={
+        "question": "what are people saying",
+        "filters": {"date_from": "2025-06-01", "date_to": "2025-01-01"},
+    })
+    assert response.status_code == 422
+    assert "date_from must not be after date_to" in response.text
@@ -0,0 +1,52 @@
+"""Near-duplicate collapsing: one copy per cluster, without losing filtered results"""
+
+import random
+
+from conftest import post_row, synthetic_rows, write_posts_csv
+
+CROSS_POST = dict(title="Agentforce rollout stalled after pilot",
+                  body="our agentforce pilot stalled because integration with the legacy cmdb took nine months")
+REPOST = dict(title="Copilot seats unused after six months",
+              body="we bought copilot seats for every engineer and usage dropped off after the first six months")
+
+
+def write_dataset(path):
+    rng = random.Random(7)
+    rows = synthetic_rows(200)
+    rows += [
+        post_row(900, rng, subreddit="salesforce", relevance_score=5.0, **CROSS_POST),
+        post_row(901, rng, subreddit="devops", relevance_score=1.0, **CROSS_POST),
+        post_row(902, rng, subreddit="agentforce", relevance_score=4.0, **REPOST),
+        post_row(903, rng, subreddit="agentforce", relevance_score=2.0, **REPOST),
+    ]
+    write_posts_csv(path, rows)
+
+
+def post_ids(agent, rows):
+    return set(agent.df["post_id"].iloc[rows])
+
+
+def test_cross_post_survives_subreddit_filter(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    write_dataset(data_path)
+    agent = make_agent(data_path)
+    question = "agentforce pilot stalled cmdb integration"
+
+    with agent.pinned_state():
+        unfiltered = post_ids(agent, agent._find_all_relevant_posts(question)[0])
+        filtered = post_ids(agent, agent._find_all_relevant_posts(question, {"subreddit": "devops"})[0])
+
+    assert "p900" in unfiltered and "p901" not in unfiltered
+    assert "p901" in filtered
+
+
+def test_also_posted_in_lists_only_other_subreddits(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    write_dataset(data_path)
+    agent = make_agent(data_path)
+    also_posted_in = dict(zip(agent.df["post_id"], agent.df["also_posted_in"]))
+
+    assert also_posted_in["p900"] == "r/devops"
+    assert also_posted_in["p901"] == "r/salesforce"
+    # A repost within the same subreddit is not "also posted" anywhere
+    assert also_posted_in["p902"] == "" and also_posted_in["p903"] == ""
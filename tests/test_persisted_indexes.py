@@ -0,0 +1,64 @@
+"""Derived arrays persisted beside the snapshot are reused for the same dataset and rebuilt when it changes"""
+
+import numpy as np
+import pandas as pd
+
+import sage_context
+import sage_retrieval
+from conftest import synthetic_rows, write_posts_csv
+from sage_context import load_or_build_token_counts
+from sage_data import load_arrays, save_arrays
+from sage_retrieval import QuestionRouter, load_or_build_router
+
+
+def test_arrays_are_keyed_on_version_and_fingerprint(tmp_path):
+    path = str(tmp_path / "posts.example.npz")
+    assert save_arrays(path, {"values": np.arange(3)}, 1, "abc")
+
+    assert load_arrays(path, 1, "abc")["values"].tolist() == [0, 1, 2]
+    assert load_arrays(path, 2, "abc") is None
+    assert load_arrays(path, 1, "other") is None
+    assert load_arrays(str(tmp_path / "missing.npz"), 1, "abc") is None
+
+
+def test_token_counts_are_reused_until_the_dataset_changes(tmp_path, monkeypatch, make_agent):
+    data_path = tmp_path / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(50))
+    agent = make_agent(data_path)
+    base = agent.snapshot.artifact_base
+
+    counted = []
+    block_token_counts = sage_context.block_token_counts
+    monkeypatch.setattr(sage_context, "block_token_counts", lambda blocks: counted.append(len(blocks)) or block_token_counts(blocks))
+
+    post_tokens, comment_tokens = load_or_build_token_counts(agent.post_blocks, agent.comment_blocks, base,
+                                                             agent.snapshot.source_hash)
+    assert counted == []
+    assert np.array_equal(post_tokens, block_token_counts(agent.post_blocks))
+    assert np.array_equal(comment_tokens, block_token_counts(agent.comment_blocks))
+
+    load_or_build_token_counts(agent.post_blocks, agent.comment_blocks, base, "changed-dataset")
+    assert counted == [50, 50]
+
+
+def test_router_is_reused_until_posts_or_history_change(tmp_path, monkeypatch):
+    posts = pd.DataFrame(synthetic_rows(120))
+    base = str(tmp_path / "posts")
+    builds = []
+    build = QuestionRouter.build.__func__
+    monkeypatch.setattr(sage_retrieval.QuestionRouter, "build",
+                        classmethod(lambda cls, *args: builds.append(1) or build(cls, *args)))
+
+    router = load_or_build_router(posts, [], base, "abc")
+    reused = load_or_build_router(posts, [], base, "abc")
+    assert len(builds) == 1
+    for question in ("budget roi pricing", "talent retention hiring", "copilot deployment security"):
+        assert reused.route(question) == router.route(question)
+    for dim, (names, matrix) in router.centroids.items():
+        assert reused.centroids[dim][0] == names
+        assert np.array_equal(reused.centroids[dim][1], matrix)
+
+    history = [{"question": "what is our roi", "ceo_question_category": "Budget/ROI"}]
+    load_or_build_router(posts, history, base, "abc")
+    load_or_build_router(posts, [], base, "changed-dataset")
+    assert len(builds) == 3
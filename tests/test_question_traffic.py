@@ -0,0 +1,23 @@
+"""QuestionTraffic: the asked-questions log behind the most-asked warm-up list"""
+
+from sage_warmup import QuestionTraffic
+
+
+def test_record_soon_writes_off_the_caller(tmp_path):
+    traffic = QuestionTraffic(str(tmp_path / "traffic.sqlite3"))
+    futures = [traffic.record_soon(question, False) for question in
+               ["Who is hiring?", "who is hiring? ", "What about budgets?"]]
+    futures.append(traffic.record_soon("Who is hiring?", True))
+    for future in futures:
+        future.result(timeout=5)
+
+    # Most asked first, then most recently asked; a question shows its latest wording
+    assert traffic.top(10, 3600) == [("who is hiring?", False, 2), ("Who is hiring?", True, 1),
+                                     ("What about budgets?", False, 1)]
+
+
+def test_file_log_uses_wal_without_full_fsync(tmp_path):
+    traffic = QuestionTraffic(str(tmp_path / "traffic.sqlite3"))
+    assert traffic._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    # 1 = NORMAL: WAL commits are not fsynced one by one
+    assert traffic._conn.execute("PRAGMA synchronous").fetchone()[0] == 1
@@ -0,0 +1,57 @@
+"""The semantic answer cache never serves a question that asks something different"""
+
+import numpy as np
+import pytest
+
+from conftest import synthetic_rows, write_posts_csv
+from sage_cache import SemanticCacheIndex
+
+MUST_MISS = [
+    ("Why is agent adoption stalling?", "Why isn't agent adoption stalling?"),
+    ("Do managers trust copilot?", "Do managers not trust copilot?"),
+    ("Why is attrition rising?", "How is attrition rising?"),
+    ("Which teams cut budget before layoffs?", "Which teams cut budget after layoffs?"),
+    ("Which competitor has the most attrition?", "Which competitor has the least attrition?"),
+    ("What drives burnout?", "When does burnout happen?"),
+]
+
+
+def cache_with(question: str, vector: np.ndarray) -> SemanticCacheIndex:
+    cache = SemanticCacheIndex(threshold=0.9)
+    cache.add("cached-key", "scope", question, vector)
+    return cache
+
+
+@pytest.mark.parametrize("cached, asked", MUST_MISS)
+def test_different_intent_misses_even_with_identical_vectors(cached, asked):
+    vector = np.array([0.6, 0.8], dtype=np.float32)
+    cache = cache_with(cached, vector)
+
+    assert cache.match(vector, "scope", asked) is None
+    assert cache.match(vector, "scope", cached)[0] == "cached-key"
+
+
+def test_paraphrase_with_same_intent_hits():
+    vector = np.array([0.6, 0.8], dtype=np.float32)
+    cache = cache_with("What are the biggest risks of agent deployment?", vector)
+
+    match = cache.match(vector, "scope", "what are the biggest risks of agent deployments")
+    assert match is not None and match[0] == "cached-key"
+
+
+def test_agent_skips_questions_with_terms_outside_the_index(tmp_path, make_agent):
+    data_path = tmp_path / "posts.csv"
+    write_posts_csv(data_path, synthetic_rows(200))
+    agent = make_agent(data_path, SEMANTIC_CACHE="true")
+
+    # Stopwords carry the difference, so the vectors alone cannot tell these apart
+    pairs = [("Why do managers upskill talent?", "Why do managers not upskill talent?"),
+             ("How do managers upskill talent?", "Why do managers upskill talent?"),
+             ("Which competitor has more layoffs?", "Which competitor has the most layoffs?")]
+    for cached, asked in pairs:
+        vector = agent.embed_question(cached)
+        assert np.allclose(vector, agent.embed_question(asked))
+        assert cache_with(cached, vector).match(agent.embed_question(asked), "scope", asked) is None
+
+    assert agent.embed_question("What about automation and hiring?") is not None
+    assert agent.embed_question("What about quantum automation and hiring?") is None
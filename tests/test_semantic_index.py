@@ -0,0 +1,50 @@
+"""SemanticIndex search: exact below IVF_MIN_DOCS, and IVF recall against exact search"""
+
+import random
+
+import numpy as np
+
+from sage_retrieval import IVF_MIN_DOCS, SemanticIndex
+
+
+def topical_fields(num_docs: int, num_topics: int = 40, seed: int = 3) -> dict:
+    """Posts drawn from overlapping topics so the latent space has real structure"""
+    rng = random.Random(seed)
+    topics = [[f"term{t}x{w}" for w in range(30)] for t in range(num_topics)]
+    shared = [f"common{w}" for w in range(50)]
+    bodies = []
+    for _ in range(num_docs):
+        topic = topics[rng.randrange(num_topics)]
+        neighbour = topics[rng.randrange(num_topics)]
+        bodies.append(" ".join(rng.choices(topic, k=12) + rng.choices(neighbour, k=4) + rng.choices(shared, k=6)))
+    return {"title": [""] * num_docs, "body": bodies, "comments": [""] * num_docs}
+
+
+def exact_rows(index: SemanticIndex, query: str, top_k: int) -> np.ndarray:
+    similarities = index.vectors @ index.embed([query])[0]
+    return np.argsort(-similarities, kind='stable')[:top_k]
+
+
+def test_small_indexes_are_searched_exactly():
+    fields = topical_fields(5000)
+    index = SemanticIndex.build(fields, dimensions=32)
+
+    assert index.num_docs < IVF_MIN_DOCS
+    assert index.centroids is None
+    for query in fields["body"][:20]:
+        rows, _ = index.search(query, top_k=100)
+        assert set(rows) == set(exact_rows(index, query, 100))
+
+
+def test_ivf_recall_against_exact_search():
+    fields = topical_fields(3000)
+    index = SemanticIndex.build(fields, dimensions=32)
+    index._build_ivf(min_docs=0)
+    assert index.centroids is not None
+
+    top_k = 50
+    recalls = []
+    for query in fields["body"][:50]:
+        rows, _ = index.search(query, top_k=top_k)
+        recalls.append(len(set(rows) & set(exact_rows(index, query, top_k))) / top_k)
+    assert np.mean(recalls) >= 0.95
@@ -0,0 +1,64 @@
+"""SingleFlight: shared work per key, cancelled with its last waiter"""
+
+import asyncio
+
+from sage_singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_work():
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do("k", work) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert [result for result, _ in results] == ["answer"] * 3
+    assert [shared for _, shared in results] == [False, True, True]
+    assert len(runs) == 1 and len(flights) == 0
+
+
+def test_caller_after_last_waiter_left_starts_fresh():
+    flights = SingleFlight()
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.05)
+        return len(runs)
+
+    async def scenario():
+        first = asyncio.ensure_future(flights.do("k", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.sleep(0)
+        # The first task is cancelled but its done callback has not run yet
+        assert "k" not in flights
+        return await flights.do("k", work)
+
+    result, shared = asyncio.run(scenario())
+    assert (result, shared) == (2, False)
+    assert len(runs) == 2
+
+
+def test_joiner_does_not_inherit_a_cancelled_task():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    async def scenario():
+        stale = asyncio.ensure_future(work())
+        stale.cancel()
+        await asyncio.sleep(0)
+        # A cancelled task still registered (its callback pending) is not joined
+        flights._tasks["k"] = stale
+        return await flights.do("k", work)
+
+    assert asyncio.run(scenario()) == ("answer", False)
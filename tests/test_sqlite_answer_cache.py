@@ -0,0 +1,94 @@
+"""SQLiteAnswerCache: eviction, expiry, stale reads, versions and persistence"""
+
+import asyncio
+
+import pytest
+
+import sage_cache
+from sage_cache import SQLiteAnswerCache
+
+
+class Clock:
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sage_cache.time, "time", clock)
+    return clock
+
+
+def answer(text: str) -> dict:
+    return {"full_answer": text, "posts_analyzed": 3}
+
+
+def test_least_recently_used_rows_are_evicted(tmp_path, clock):
+    cache = SQLiteAnswerCache(str(tmp_path / "a.sqlite3"), maxsize=2, memory_size=1)
+    cache.set("a", answer("a"))
+    clock.now += 1
+    cache.set("b", answer("b"))
+    clock.now += 1
+    assert cache.get("a") == answer("a")  # a is now more recent than b
+    clock.now += 1
+    cache.set("c", answer("c"))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == answer("a") and cache.get("c") == answer("c")
+    assert len(cache) == 2
+
+
+def test_expired_answers_are_stale_within_grace_then_gone(tmp_path, clock):
+    cache = SQLiteAnswerCache(str(tmp_path / "a.sqlite3"), ttl=60, grace=600)
+    cache.set("q", answer("fresh"))
+    assert cache.time_to_live("q") == pytest.approx(60)
+
+    clock.now += 61
+    assert cache.get("q") is None  # the LRU front expires with the row
+    assert cache.get_stale("q") == answer("fresh")
+    assert cache.time_to_live("q") < 0
+
+    clock.now += 600
+    assert cache.get_stale("q") is None
+    cache.set("other", answer("other"))  # writes purge rows past the grace window
+    assert cache.time_to_live("q") is None
+
+
+def test_invalidate_other_versions(tmp_path, clock):
+    cache = SQLiteAnswerCache(str(tmp_path / "a.sqlite3"))
+    cache.set("old", answer("old"), "v1")
+    cache.set("new", answer("new"), "v2")
+    cache.set("unversioned", answer("unversioned"))
+
+    assert sorted(cache.invalidate_other_versions("v2")) == ["old", "unversioned"]
+    assert cache.get("old") is None and cache.get("new") == answer("new")
+
+
+def test_reopened_file_keeps_answers_and_versions(tmp_path, clock):
+    path = str(tmp_path / "a.sqlite3")
+    SQLiteAnswerCache(path).set("q", answer("kept"), "v1")
+
+    reopened = SQLiteAnswerCache(path)
+    assert reopened.get("q") == answer("kept")
+    assert reopened.memory_hits == 0  # served from disk, not a shared front
+    assert reopened.invalidate_other_versions("v1") == []
+
+
+def test_async_variants_match_sync(tmp_path, clock):
+    cache = SQLiteAnswerCache(str(tmp_path / "a.sqlite3"), ttl=60)
+
+    async def scenario():
+        await cache.set_async("q", answer("async"), "v1")
+        fresh = await cache.get_async("q")
+        ttl = await cache.time_to_live_async("q")
+        clock.now += 61
+        return fresh, ttl, await cache.get_async("q"), await cache.get_stale_async("q")
+
+    fresh, ttl, expired, stale = asyncio.run(scenario())
+    assert fresh == answer("async") and ttl == pytest.approx(60)
+    assert expired is None and stale == answer("async")
+    assert cache.stats()["hits"] == 1 and cache.stats()["stale_hits"] == 1
@@ -0,0 +1,77 @@
+"""Stale-while-revalidate: capped background refreshes that share in-flight work"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+from sage_cache import StaleRevalidator
+
+
+def test_one_refresh_per_key_and_cap():
+    revalidator = StaleRevalidator(max_concurrent=2)
+    runs = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def refresh(key):
+            runs.append(key)
+            await gate.wait()
+
+        assert revalidator.schedule("a", lambda: refresh("a"))
+        assert not revalidator.schedule("a", lambda: refresh("a"))
+        assert revalidator.schedule("b", lambda: refresh("b"))
+        # At the cap: skipped, the stale answer keeps being served
+        assert not revalidator.schedule("c", lambda: refresh("c"))
+        await asyncio.sleep(0)
+        assert len(revalidator) == 2
+        gate.set()
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert runs == ["a", "b"]
+    assert len(revalidator) == 0
+    assert revalidator.stats() == {"in_progress": 0, "max_concurrent": 2, "started": 2,
+                                   "completed": 2, "failed": 0, "skipped_at_cap": 1}
+
+
+def test_failed_refresh_is_counted_and_key_freed():
+    revalidator = StaleRevalidator()
+
+    async def fail():
+        raise RuntimeError("model unavailable")
+
+    async def scenario():
+        revalidator.schedule("a", fail)
+        await asyncio.sleep(0.01)
+        # The key is free again, so the next stale serve retries
+        return revalidator.schedule("a", fail)
+
+    assert asyncio.run(scenario())
+    assert revalidator.failed >= 1 and revalidator.completed == 0
+
+
+def test_refresh_joins_in_flight_request(chat_api, monkeypatch):
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Summary.\n\nBody."))])
+
+    monkeypatch.setattr(chat_api.agent.async_client.chat.completions, "create", create)
+    request = chat_api.QuestionRequest(question="where is agent adoption adding noise")
+    version = chat_api.agent.cache_version
+    cache_key = chat_api.get_cache_key(request.question, request.estimates_ok, version=version)
+
+    async def scenario():
+        job = chat_api.answer_job(request, cache_key, version, time.monotonic() + 30)
+        user = asyncio.ensure_future(chat_api.answer_flights.do(cache_key, job))
+        await asyncio.sleep(0.05)
+        refreshed = await chat_api.refresh_answer(request, cache_key, version)
+        return refreshed, await user
+
+    refreshed, (answer, shared) = asyncio.run(scenario())
+    assert refreshed is answer and not shared
+    assert len(calls) == 1
+    assert chat_api.answer_cache.get(cache_key) is not None
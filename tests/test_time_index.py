@@ -0,0 +1,20 @@
+"""TimeIndex freshness is taken at render time, so a materialized summary does not go stale"""
+
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+from sage_retrieval import TimeIndex
+
+
+def test_fresh_share_follows_the_clock():
+    now = datetime(2025, 10, 24, tzinfo=timezone.utc)
+    created = pd.Series([now - timedelta(days=d) for d in (1, 30, 100, 400)] + [None])
+    index = TimeIndex(created)
+    rows = np.arange(len(created))
+
+    assert index.fresh_share(rows, now=now) == 0.5
+    assert index.fresh_share(rows, now=now + timedelta(days=61)) == 0.25
+    assert index.fresh_share(rows[[4]], now=now) == 0.0
+    assert index.stats(rows)["dated_posts"] == 4
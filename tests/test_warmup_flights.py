@@ -0,0 +1,54 @@
+"""Cache warm-up and live requests share one in-flight computation per question"""
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+
+def slow_model(calls):
+    async def create(**kwargs):
+        calls.append(kwargs)
+        await asyncio.sleep(0.2)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="Summary.\n\nBody."))])
+    return create
+
+
+def user_request(chat_api, question):
+    request = chat_api.QuestionRequest(question=question)
+    version = chat_api.agent.cache_version
+    cache_key = chat_api.get_cache_key(request.question, request.estimates_ok, version=version)
+    deadline = time.monotonic() + 30
+    return chat_api.answer_flights.do(cache_key, chat_api.answer_job(request, cache_key, version, deadline))
+
+
+def test_warmup_joins_user_request(chat_api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_api.agent.async_client.chat.completions, "create", slow_model(calls))
+    question = "what budget are teams setting aside for agents"
+
+    async def scenario():
+        user = asyncio.ensure_future(user_request(chat_api, question))
+        await asyncio.sleep(0.05)
+        spent = await chat_api.warm_question(question, False)
+        return spent, await user
+
+    spent, (answer, shared) = asyncio.run(scenario())
+    assert spent is None and not shared
+    assert len(calls) == 1 and not answer.get("error")
+
+
+def test_user_joins_warmup(chat_api, monkeypatch):
+    calls = []
+    monkeypatch.setattr(chat_api.agent.async_client.chat.completions, "create", slow_model(calls))
+    question = "which competitors are hiring away salesforce admins"
+
+    async def scenario():
+        warm = asyncio.ensure_future(chat_api.warm_question(question, False))
+        await asyncio.sleep(0.05)
+        assert not chat_api.warmer.busy()
+        user = await user_request(chat_api, question)
+        return await warm, user
+
+    spent, (answer, shared) = asyncio.run(scenario())
+    assert shared and spent > 0
+    assert len(calls) == 1 and not answer.get("error")